@@ -1,20 +1,34 @@
 import os
+import shutil
 import time
 import uuid
 import logging
+import click
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, send_file, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_migrate import Migrate
 from sqlalchemy import func
-from pikepdf import Pdf
-from flask_socketio import SocketIO, emit
-from app.models import db, User, Upload
+from flask_socketio import SocketIO, emit, join_room
+from app.models import (
+    db, User, Upload, UserPremiumRollup, DailyPremiumRollup, rebuild_premium_rollups, save_policy_records,
+    find_policy_duplicate, iter_policy_keys,
+)
+from app.artifacts import ArtifactStore, RetentionSweeper, SWEEP_INTERVAL_SECONDS
 from app.preprocessing import bulk_process_to_excel
-from app.preprocessing import process_pdf, bulk_process_to_excel, save_data_to_excel
+from app.preprocessing import process_pdf, bulk_process_to_excel, save_data_to_excel, resume_bulk_process
+from app.jobs import JobManager
+from app.cache import get_extraction_cache
+from app.preprocessing import PIPELINE_VERSION
+from app.output_writers import FILE_EXTENSIONS, OUTPUT_FORMAT
+from app.ingestion import UploadIngestor, MAX_UPLOAD_BATCH_BYTES
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from app.progress import PROGRESS_MAX_RATE, ProgressThrottle
+from app.validation import revalidate_output
+from app.duplicates import DuplicateRegistry, set_duplicate_registry
 
 
 
@@ -59,20 +73,44 @@ def load_user(user_id):
 app.config['UPLOAD_FOLDER'] = 'uploaded_pdfs'
 app.config['OUTPUT_FOLDER'] = os.path.abspath('output_data')
 app.config['ALLOWED_EXTENSIONS'] = {'pdf'}
+# Reject oversized requests before any part is read (per-file limits are enforced while streaming)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BATCH_BYTES + 1024 * 1024
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 4))
+# Most Socket.IO progress events per second for one job
+app.config['PROGRESS_MAX_RATE'] = PROGRESS_MAX_RATE
+# Format of consolidated output files: xlsx, csv or parquet
+app.config['OUTPUT_FORMAT'] = OUTPUT_FORMAT
+# Seconds between retention sweeps of old outputs and orphaned temp folders; 0 disables the sweeper
+app.config['ARTIFACT_SWEEP_INTERVAL'] = SWEEP_INTERVAL_SECONDS
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+artifact_store = ArtifactStore(app.config['OUTPUT_FOLDER'], app.config['UPLOAD_FOLDER'])
+
+
+def lookup_policy_duplicate(keys, period):
+    with app.app_context():
+        return find_policy_duplicate(keys, period)
+
+
+def load_policy_keys(after_id):
+    with app.app_context():
+        yield from iter_policy_keys(after_id)
+
+
+# Policies already stored (by this or any other process), checked by process_pdf before each document reaches the LLM
+duplicate_registry = DuplicateRegistry(lookup=lookup_policy_duplicate, load=load_policy_keys)
+set_duplicate_registry(duplicate_registry)
 
 # Helper Functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def is_valid_pdf(file_path):
-    try:
-        with Pdf.open(file_path):
-            return True
-    except Exception as e:
-        logger.error(f"Invalid PDF: {e}")
-        return False
+def ingest_upload(ingestor, file, filename):
+    """Stream one uploaded part to disk, hashing and preflighting it on the way."""
+    ingested = ingestor.ingest(file.stream, filename)
+    if not ingested.is_valid:
+        logger.error(f"Rejected upload {filename}: {ingested.error}")
+    return ingested
 
 # Routes
 @app.route('/')
@@ -138,89 +176,278 @@ dashboard_data = {
 }
 
 
+def user_room(user_id):
+    return f"user:{user_id}"
+
+
+def job_room(job_id):
+    return f"job:{job_id}"
+
+
+@socketio.on('connect')
+def socket_connect(auth=None):
+    """Each signed-in client joins its user's room; nothing is broadcast to everyone."""
+    if not current_user.is_authenticated:
+        return False
+    join_room(user_room(current_user.id))
+
+
+@socketio.on('watch_job')
+def socket_watch_job(data):
+    """Join a job's room (own jobs, or any job for admins) and get its current progress."""
+    job = get_job_for_current_user((data or {}).get('job_id'))
+    if job is None:
+        return
+    join_room(job_room(job.id))
+    # Every file's status, without taking the pending changes from the room's next update
+    emit("upload_status", job_progress_payload(job, full=True))
+
+
+def job_progress_payload(job, full=False):
+    payload = job.full_snapshot() if full else job.progress_snapshot()
+    # Older clients read a single file/status pair
+    latest = payload["files"][-1] if payload["files"] else {"file_name": "N/A", "status": job.status}
+    payload.update(latest)
+    if job.status == "completed":
+        with app.test_request_context():
+            payload["link"] = url_for('download_file', filename=job.output_file_name)
+    return payload
+
+
+def send_job_progress(job_id):
+    job = job_manager.get(job_id)
+    if job is not None:
+        socketio.emit("upload_status", job_progress_payload(job), to=[job_room(job.id), user_room(job.user_id)])
+
+
+progress_throttle = ProgressThrottle(send_job_progress, app.config['PROGRESS_MAX_RATE'])
+
+
+def emit_job_progress(job, file_name, status):
+    """Coalesced "upload_status" events for a job, sent to its room and its owner's room."""
+    progress_throttle.update(job.id, final=job.finished_at is not None)
+
+
+def save_job_records(job, records):
+    """Store a finished job's records, with their Upload rows, in one transaction."""
+    with app.app_context():
+        saved = save_policy_records(records, job.user_id)
+    # Stored now, so the database answers for these keys
+    duplicate_registry.release(records)
+    print(f"Saved {saved} policy records for job {job.id}")
+
+
+def register_job_output(job):
+    """Track a finished job's output in the artifact store so it can be served and expired."""
+    with app.app_context():
+        artifact_store.register(job.output_path, job.user_id, job.id)
+
+
+job_manager = JobManager(
+    max_workers=app.config['JOB_WORKERS'], on_progress=emit_job_progress, on_records=save_job_records,
+    on_complete=register_job_output,
+)
+retention_sweeper = RetentionSweeper(
+    artifact_store, app, app.config['ARTIFACT_SWEEP_INTERVAL'], active_dirs=job_manager.active_cleanup_dirs
+)
+
+
+@app.before_request
+def start_retention_sweeper():
+    # Started with the first request rather than at import, so CLI commands and tests never sweep
+    if app.config['ARTIFACT_SWEEP_INTERVAL'] > 0:
+        retention_sweeper.start()
+
+
+def get_job_for_current_user(job_id):
+    job = job_manager.get(job_id)
+    if job is None or (job.user_id != current_user.id and current_user.role != 'admin'):
+        return None
+    return job
+
+
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
-    temp_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(uuid.uuid4()))
-    os.makedirs(temp_folder, exist_ok=True)
-
     if request.method == 'POST':
         if 'files' not in request.files or not request.files.getlist('files'):
             flash('No files selected. Please try again.', 'danger')
             return redirect(request.url)
 
+        # Created only for an actual upload; the job removes it when done
+        temp_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(uuid.uuid4()))
+        os.makedirs(temp_folder, exist_ok=True)
+
         files = request.files.getlist('files')
         valid_files = []
-        output_file = None
+        content_hashes = []
+        ingestor = UploadIngestor(temp_folder)
         session_id = str(uuid.uuid4())  # Unique identifier for the session
-        output_file_name = f'consolidated_data_{session_id}.xlsx'
+        output_file_name = f'consolidated_data_{session_id}{FILE_EXTENSIONS[app.config["OUTPUT_FORMAT"]]}'
         total_files = len(files)
         processed_files = 0
 
         for file in files:
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                file_path = os.path.join(temp_folder, filename)
-                file.save(file_path)
+                ingested = ingest_upload(ingestor, file, filename)
 
-                if is_valid_pdf(file_path):
-                    valid_files.append(file_path)
+                if ingested.is_valid:
+                    valid_files.append(ingested.path)
+                    content_hashes.append(ingested.content_hash)
                     processed_files += 1
 
-                    # Emit progress update
-                    socketio.emit(
-                        "upload_status",
-                        {
-                            "file_name": filename,
-                            "status": "Uploaded",
-                            "processed_files": processed_files,
-                            "total_files": total_files,
-                        },
-                        namespace="/"
-                    )
-                else:
-                    os.remove(file_path)
-
-        if valid_files:
-            # Consolidate extracted data into an Excel file
-            output_file = os.path.join(app.config['OUTPUT_FOLDER'], output_file_name)
-            bulk_process_to_excel(temp_folder, output_file, current_user.id)  # Updated function
-
-            # Clean up the temporary folder
-            for file in os.listdir(temp_folder):
-                os.remove(os.path.join(temp_folder, file))
-            os.rmdir(temp_folder)
-
-        # Emit the download link or failure message
-        if output_file and os.path.exists(output_file):
-            socketio.emit(
-                "upload_status",
-                {
-                    "file_name": output_file_name,
-                    "status": "Processed Successfully",
-                    "link": url_for('download_file', filename=output_file_name),
-                },
-                namespace="/"
-            )
-        else:
+        if not valid_files:
+            shutil.rmtree(temp_folder, ignore_errors=True)
             socketio.emit(
                 "upload_status",
                 {"file_name": "N/A", "status": "Processing Failed"},
-                namespace="/"
+                to=user_room(current_user.id)
             )
+            return jsonify({'error': 'No valid PDF files were uploaded.'}), 400
+
+        socketio.emit(
+            "upload_status",
+            {"file_name": f"{processed_files} of {total_files} files", "status": "Uploaded"},
+            to=user_room(current_user.id)
+        )
+
+        # Hand the batch to the background workers and answer immediately
+        output_file = os.path.join(app.config['OUTPUT_FOLDER'], output_file_name)
+        job = job_manager.submit(
+            valid_files, output_file, current_user.id, cleanup_dir=temp_folder, content_hashes=content_hashes
+        )
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('job_status', job_id=job.id),
+            'results_url': url_for('job_results', job_id=job.id),
+        }), 202
 
     return render_template('upload.html')
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    job = get_job_for_current_user(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+
+    data = job.to_dict()
+    data['download_url'] = url_for('download_file', filename=job.output_file_name) if job.status == 'completed' else None
+    return jsonify(data)
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+@login_required
+def job_results(job_id):
+    job = get_job_for_current_user(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+
+    results = [
+        result or {"file_name": os.path.basename(path), "status": "pending", "data": None}
+        for path, result in zip(job.files, job.results)
+    ]
+    return jsonify({'job_id': job.id, 'status': job.status, 'results': results})
+
 @app.route('/download/<filename>')
 @login_required
 def download_file(filename):
-    
-    file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+    artifact = artifact_store.get(filename, current_user)
+    if artifact is not None:
+        return artifact_store.send(artifact)
     flash("File not found!", "danger")
     return redirect(url_for('upload'))
 
+@app.route('/admin/cache', methods=['GET'])
+@login_required
+def cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied. Admins only.'}), 403
+
+    cache = get_extraction_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'current_version': PIPELINE_VERSION, **cache.stats()})
+
+@app.route('/admin/cache/invalidate', methods=['POST'])
+@login_required
+def invalidate_cache():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied. Admins only.'}), 403
+
+    payload = request.get_json(silent=True) or request.form
+    version = payload.get('version')
+    if not version:
+        return jsonify({'error': 'A version to invalidate is required.'}), 400
+
+    cache = get_extraction_cache()
+    removed = cache.invalidate_version(version) if cache else 0
+    logger.info(f"Invalidated {removed} cached extractions for version {version}")
+    return jsonify({'version': version, 'removed': removed})
+
+@app.route('/metrics')
+def metrics():
+    """Pipeline metrics in the Prometheus text format, for scraping."""
+    return Response(render_metrics(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+
+def premium_totals():
+    """All-time premium and commission, read from the per-user rollups."""
+    totals = db.session.query(
+        func.sum(UserPremiumRollup.total_premium),
+        func.sum(UserPremiumRollup.total_commission)
+    ).one()
+    return totals[0] or 0, totals[1] or 0
+
+
+def daily_premium_total(day=None):
+    """Premium uploaded on `day` (today, UTC, by default), read from the daily rollup."""
+    rollup = db.session.get(DailyPremiumRollup, day or datetime.utcnow().date())
+    return rollup.total_premium if rollup else 0
+
+
+def user_premium_summary():
+    """Per-user upload counts and premiums for users with at least one upload."""
+    return db.session.query(
+        User.username,
+        UserPremiumRollup.uploads.label('uploads'),
+        UserPremiumRollup.total_premium.label('total_premium'),
+        UserPremiumRollup.total_commission.label('total_commission'),
+        UserPremiumRollup.net_premium.label('net_premium')
+    ).join(UserPremiumRollup, UserPremiumRollup.user_id == User.id).filter(UserPremiumRollup.uploads > 0).all()
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the dashboard rollup tables from the upload table."""
+    users, days = rebuild_premium_rollups()
+    print(f"Rebuilt premium rollups for {users} users and {days} days")
+
+
+@app.cli.command('sweep-artifacts')
+def sweep_artifacts_command():
+    """Apply the output retention rules now."""
+    retention_sweeper.run_once()
+
+
+@app.cli.command('resume-batch')
+@click.argument('journal_path')
+def resume_batch_command(journal_path):
+    """Finish an interrupted bulk batch from its journal (<output>.journal.jsonl)."""
+    resume_bulk_process(journal_path, save_records=save_policy_records)
+
+
+@app.cli.command('revalidate-output')
+@click.argument('path')
+@click.option('--output', 'output_path', help='where to write the validated records (default <name>.validated<ext>)')
+@click.option('--report', 'report_path', help='where to write the per-record report (default <name>.validation.csv)')
+def revalidate_output_command(path, output_path, report_path):
+    """Re-run premium and registration validation over a consolidated output file."""
+    report = revalidate_output(path, output_path, report_path)
+    print(f"{int((report['corrected'] != '').sum())} of {len(report)} records corrected")
+
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
@@ -228,17 +455,16 @@ def dashboard():
         flash('Access denied. Admins only.', 'danger')
         return redirect(url_for('upload'))
 
-    # Total Premium and Commission Calculations
-    total_premium_all_time = db.session.query(func.sum(Upload.total_premium)).scalar() or 0
-    total_commission_all_time = db.session.query(func.sum(Upload.commission)).scalar() or 0
+    # Total Premium and Commission Calculations, summed over the per-user rollups
+    total_premium_all_time, total_commission_all_time = premium_totals()
 
     # User-wise Summary With Outer Join
     user_summary = db.session.query(
         User.username,
-        func.count(Upload.id).label('uploads'),
-        func.sum(Upload.total_premium).label('total_premium'),
-        func.sum(Upload.commission).label('total_commission')
-    ).outerjoin(Upload).group_by(User.id).all()
+        func.coalesce(UserPremiumRollup.uploads, 0).label('uploads'),
+        UserPremiumRollup.total_premium.label('total_premium'),
+        UserPremiumRollup.total_commission.label('total_commission')
+    ).outerjoin(UserPremiumRollup, UserPremiumRollup.user_id == User.id).all()
 
     # Debugging Outputs
     print(f"DEBUG: Total Premium (All Time): {total_premium_all_time}")
@@ -257,23 +483,14 @@ def dashboard():
 @login_required
 def get_dashboard_data():
     # Calculate total premium and total commission all time
-    total_premium_all_time = db.session.query(func.sum(Upload.total_premium)).scalar() or 0
-    total_commission_all_time = db.session.query(func.sum(Upload.commission)).scalar() or 0
+    total_premium_all_time, total_commission_all_time = premium_totals()
 
     # Calculate daily premium and daily commission (for current day)
-    daily_premium = db.session.query(func.sum(Upload.total_premium)).filter(
-        func.date(Upload.upload_date) == func.date(datetime.utcnow())
-    ).scalar() or 0
+    daily_premium = daily_premium_total()
     daily_commission = daily_premium * 0.05  # Example: assuming 5% commission rate
 
     # Fetch user-wise data (summary for table and chart)
-    user_summary = db.session.query(
-        User.username,
-        func.count(Upload.id).label('uploads'),
-        func.sum(Upload.total_premium).label('total_premium'),
-        func.sum(Upload.commission).label('total_commission'),
-        func.sum(Upload.total_premium - Upload.commission).label('net_premium')
-    ).join(Upload).group_by(User.id).all()
+    user_summary = user_premium_summary()
 
     # Prepare user data for frontend
     user_data = [
@@ -301,7 +518,7 @@ def get_dashboard_data():
 @login_required
 def api_all_time_premium():
     try:
-        all_time_premium = db.session.query(func.sum(Upload.total_premium)).scalar() or 0
+        all_time_premium, _ = premium_totals()
         return jsonify({'all_time_premium': float(all_time_premium)})
     except Exception as e:
         return jsonify({'error': 'An error occurred while fetching data.', 'details': str(e)}), 500
@@ -310,11 +527,7 @@ def api_all_time_premium():
 @login_required
 def api_daily_premium():
     try:
-        daily_premium = db.session.query(
-            func.sum(Upload.total_premium)
-        ).filter(
-            func.date(Upload.upload_date) == func.date(func.now())
-        ).scalar() or 0
+        daily_premium = daily_premium_total()
         return jsonify({'daily_premium': float(daily_premium)})
     except Exception as e:
         return jsonify({'error': 'An error occurred while fetching data.', 'details': str(e)}), 500
@@ -322,20 +535,14 @@ def api_daily_premium():
 @app.route('/api/user_uploads', methods=['GET'])
 @login_required
 def user_uploads_data():
-    user_summary = db.session.query(
-        User.username,
-        func.count(Upload.id).label('uploads'),
-        func.sum(Upload.total_premium).label('total_premium'),
-        func.sum(Upload.commission).label('commission'),
-        func.sum(Upload.total_premium - Upload.commission).label('net_premium')
-    ).join(Upload).group_by(User.username).all()
+    user_summary = user_premium_summary()
 
     response_data = [
         {
             "username": row.username or "Unknown User",
             "uploads": row.uploads or 0,
             "total_premium": row.total_premium or 0,
-            "commission": row.commission or 0,
+            "commission": row.total_commission or 0,
             "net_premium": row.net_premium or 0
         }
         for row in user_summary
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import send_file
+
+from . import metrics
+from .models import OutputArtifact, db
+
+# Outputs not downloaded for this long are deleted
+ARTIFACT_RETENTION_DAYS = float(os.getenv("ARTIFACT_RETENTION_DAYS", 7))
+# Upload temp folders older than this are orphans (their job would have removed them)
+TEMP_DIR_RETENTION_HOURS = float(os.getenv("TEMP_DIR_RETENTION_HOURS", 24))
+SWEEP_INTERVAL_SECONDS = float(os.getenv("ARTIFACT_SWEEP_INTERVAL_SECONDS", 3600))
+
+
+def file_etag(path, chunk_size=1024 * 1024):
+    """Strong ETag for a file: the SHA-256 of its bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def disk_usage(directory):
+    """(bytes, files) under `directory`."""
+    total = count = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+                count += 1
+            except OSError:
+                continue  # Removed while walking
+    return total, count
+
+
+class ArtifactStore:
+    """
+    Output files tracked per user and job in the output_artifact table.
+    Downloads are limited to the owner (and admins) and served with an ETag,
+    Last-Modified and byte-range support. sweep() deletes outputs nobody has
+    downloaded within `retention`, untracked leftovers in the output folder
+    and orphaned upload temp folders. Needs an application context.
+    """
+
+    def __init__(self, output_dir, upload_dir, retention=None, temp_retention=None):
+        self.output_dir = output_dir
+        self.upload_dir = upload_dir
+        self.retention = retention or timedelta(days=ARTIFACT_RETENTION_DAYS)
+        self.temp_retention = temp_retention or timedelta(hours=TEMP_DIR_RETENTION_HOURS)
+
+    def path_for(self, artifact):
+        return os.path.join(self.output_dir, artifact.filename)
+
+    def register(self, path, user_id, job_id=None):
+        """Track a finished output file; registering the same file again refreshes it."""
+        filename = os.path.basename(path)
+        artifact = OutputArtifact.query.filter_by(filename=filename).first()
+        if artifact is None:
+            artifact = OutputArtifact(filename=filename)
+            db.session.add(artifact)
+        now = datetime.utcnow()
+        artifact.user_id = user_id
+        artifact.job_id = job_id
+        artifact.size = os.path.getsize(path)
+        artifact.etag = file_etag(path)
+        artifact.created_at = now
+        artifact.last_accessed_at = now
+        db.session.commit()
+        return artifact
+
+    def get(self, filename, user):
+        """The artifact called `filename` if `user` may download it and it is still on disk."""
+        artifact = OutputArtifact.query.filter_by(filename=filename).first()
+        if artifact is None or (artifact.user_id != user.id and user.role != 'admin'):
+            return None
+        if not os.path.exists(self.path_for(artifact)):
+            return None
+        return artifact
+
+    def send(self, artifact):
+        """
+        Response for a download: answers If-None-Match/If-Modified-Since with
+        304 and Range requests with 206, and resets the retention clock.
+        """
+        artifact.last_accessed_at = datetime.utcnow()
+        db.session.commit()
+        return send_file(
+            self.path_for(artifact), as_attachment=True, conditional=True,
+            etag=artifact.etag, last_modified=artifact.created_at,
+        )
+
+    def sweep(self, active_dirs=(), now=None):
+        """Apply the retention rules once; returns how many items of each kind were removed."""
+        now = now or datetime.utcnow()
+        removed = {"artifacts": 0, "untracked_outputs": 0, "temp_dirs": 0}
+
+        expired = OutputArtifact.query.filter(OutputArtifact.last_accessed_at < now - self.retention).all()
+        for artifact in expired:
+            path = self.path_for(artifact)
+            if os.path.exists(path):
+                os.remove(path)
+            db.session.delete(artifact)
+            removed["artifacts"] += 1
+        db.session.commit()
+
+        tracked = {filename for (filename,) in db.session.query(OutputArtifact.filename)}
+        output_cutoff = (now - self.retention).timestamp()
+        for entry in self._entries(self.output_dir):
+            # Journals, outputs of failed jobs and files from before the store existed
+            if entry.name not in tracked and entry.is_file() and entry.stat().st_mtime < output_cutoff:
+                os.remove(entry.path)
+                removed["untracked_outputs"] += 1
+
+        active = {os.path.abspath(directory) for directory in active_dirs if directory}
+        temp_cutoff = (now - self.temp_retention).timestamp()
+        for entry in self._entries(self.upload_dir):
+            if os.path.abspath(entry.path) in active or entry.stat().st_mtime >= temp_cutoff:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+            removed["temp_dirs"] += 1
+
+        for kind, amount in removed.items():
+            if amount:
+                metrics.SWEPT.inc(amount, kind=kind)
+        self.update_disk_metrics()
+        return removed
+
+    @staticmethod
+    def _entries(directory):
+        if not os.path.isdir(directory):
+            return []
+        with os.scandir(directory) as entries:
+            return list(entries)
+
+    def update_disk_metrics(self):
+        for area, directory in (("outputs", self.output_dir), ("uploads", self.upload_dir)):
+            size, count = disk_usage(directory)
+            metrics.DISK_BYTES.set(size, area=area)
+            metrics.DISK_FILES.set(count, area=area)
+
+
+class RetentionSweeper:
+    """Run `store.sweep()` every `interval` seconds on a daemon thread, inside `app`'s context."""
+
+    def __init__(self, store, app, interval=SWEEP_INTERVAL_SECONDS, active_dirs=None):
+        self.store = store
+        self.app = app
+        self.interval = interval
+        self.active_dirs = active_dirs or (lambda: ())
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        began = time.perf_counter()
+        with self.app.app_context():
+            try:
+                removed = self.store.sweep(self.active_dirs())
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error sweeping stored outputs: {e}")
+                return None
+        print(f"Retention sweep removed {removed} in {time.perf_counter() - began:.2f}s")
+        return removed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
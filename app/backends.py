@@ -0,0 +1,187 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+# Backend used for extraction: "openai", "local" (any OpenAI-compatible HTTP server) or "rules" (offline)
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "openai")
+# Backend for latency-sensitive single-file uploads; empty means the default backend
+INTERACTIVE_BACKEND = os.getenv("INTERACTIVE_BACKEND", "")
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:8000/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local-model")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "")
+LOCAL_LLM_TIMEOUT = float(os.getenv("LOCAL_LLM_TIMEOUT", 30))
+LOCAL_LLM_MAX_CONCURRENCY = int(os.getenv("LOCAL_LLM_MAX_CONCURRENCY", 2))
+
+# Bump when the label tables or value patterns in rule_extraction.py change, so cached results are recomputed.
+# Kept here because EXTRACTION_VERSION reads it while field_extraction, which rule_extraction imports, loads
+RULES_VERSION = "rules-3"
+
+
+class BackendHTTPError(Exception):
+    """Non-2xx reply from an HTTP backend; `http_status` lets the retry logic classify it."""
+
+    def __init__(self, http_status, message):
+        super().__init__(f"HTTP {http_status}: {message}")
+        self.http_status = http_status
+
+
+class ExtractionBackend:
+    """
+    Base class for extraction backends.
+    Chat backends answer prompts through chat(); backends that are not
+    language models (supports_chat = False) extract fields directly.
+    Each backend caps its own in-flight requests at `max_concurrency`.
+    """
+
+    name = "base"
+    supports_chat = True
+    # Whether requests count against the shared provider rate limits
+    rate_limited = False
+
+    def __init__(self, model="", timeout=60.0, max_concurrency=4):
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    @property
+    def version(self):
+        """Identifies what produced a result, for cache keys."""
+        return f"{self.name}:{self.model}"
+
+    def chat(self, prompt, max_tokens=None):
+        """Send one user prompt; returns (reply text, usage dict)."""
+        with self._slots:
+            return self._chat(prompt, max_tokens)
+
+    def _chat(self, prompt, max_tokens):
+        raise NotImplementedError
+
+    def extract(self, raw_text, fields=None):
+        raise NotImplementedError(f"{self.name} backend only answers prompts")
+
+
+class OpenAIBackend(ExtractionBackend):
+    """The OpenAI API through the openai client (0.x), with the key passed per request."""
+
+    name = "openai"
+    rate_limited = True
+
+    def __init__(self, api_key=None, model=OPENAI_MODEL, timeout=OPENAI_TIMEOUT, max_concurrency=OPENAI_MAX_CONCURRENCY):
+        super().__init__(model, timeout, max_concurrency)
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+
+    def _chat(self, prompt, max_tokens):
+        # The client keeps a pooled requests session per thread
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            api_key=self.api_key,
+            request_timeout=self.timeout,
+        )
+        return response["choices"][0]["message"]["content"].strip(), response.get("usage") or {}
+
+
+class OpenAICompatibleBackend(ExtractionBackend):
+    """
+    Any server exposing /chat/completions in the OpenAI format (vLLM,
+    llama.cpp, Ollama...). Uses its own pooled HTTP session sized to
+    `max_concurrency`.
+    """
+
+    name = "local"
+
+    def __init__(self, base_url=LOCAL_LLM_BASE_URL, model=LOCAL_LLM_MODEL, api_key=LOCAL_LLM_API_KEY,
+                 timeout=LOCAL_LLM_TIMEOUT, max_concurrency=LOCAL_LLM_MAX_CONCURRENCY):
+        super().__init__(model, timeout, max_concurrency)
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_concurrency))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _chat(self, prompt, max_tokens):
+        payload = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "temperature": 0}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        response = self.session.post(f"{self.base_url}/chat/completions", json=payload, timeout=self.timeout)
+        if response.status_code >= 400:
+            raise BackendHTTPError(response.status_code, response.text[:200])
+        body = response.json()
+        return body["choices"][0]["message"]["content"].strip(), body.get("usage") or {}
+
+
+class RulesBackend(ExtractionBackend):
+    """
+    Offline stand-in that reads fields from known labels only (see
+    rule_extraction.py). No network, no model; fields it cannot read are "N/A".
+    """
+
+    name = "rules"
+    supports_chat = False
+
+    def __init__(self):
+        super().__init__(model="", timeout=0, max_concurrency=os.cpu_count() or 1)
+
+    @property
+    def version(self):
+        return f"{self.name}:{RULES_VERSION}"
+
+    def extract(self, raw_text, fields=None):
+        # Imported here: rule_extraction depends on field_extraction, which depends on this module
+        from .rule_extraction import DERIVED_FIELDS, extract_with_rules
+        from .field_extraction import FIELD_SCHEMA
+
+        with self._slots:
+            data = extract_with_rules(raw_text)
+        wanted = [field for field in FIELD_SCHEMA if field not in DERIVED_FIELDS and (fields is None or field in fields)]
+        return {field: data.get(field, "N/A") for field in wanted}
+
+
+BACKENDS = {"openai": OpenAIBackend, "local": OpenAICompatibleBackend, "rules": RulesBackend}
+
+_instances = {}
+_instances_lock = threading.Lock()
+_override = threading.local()
+
+
+def get_backend(name=None):
+    """
+    The backend called `name`, or the one selected for the current thread by
+    use_backend(), or EXTRACTION_BACKEND. Instances are shared process-wide.
+    """
+    name = name or getattr(_override, "name", None) or EXTRACTION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend: {name}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+def backend_override():
+    """Name of the backend chosen with use_backend() on this thread, if any."""
+    return getattr(_override, "name", None)
+
+
+@contextmanager
+def use_backend(name):
+    """Route extraction calls made on this thread to backend `name` (no-op for an empty name)."""
+    previous = getattr(_override, "name", None)
+    _override.name = name or previous
+    try:
+        yield
+    finally:
+        _override.name = previous
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", os.path.join("cache", "extraction_cache.db"))
+CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_TTL_SECONDS = int(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", 90 * 24 * 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdf_text (
+    content_hash TEXT PRIMARY KEY,
+    raw_text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extraction_result (
+    content_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (content_hash, version)
+);
+CREATE INDEX IF NOT EXISTS ix_extraction_result_version ON extraction_result (version);
+CREATE TABLE IF NOT EXISTS ocr_page (
+    page_hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+_TABLES = ("pdf_text", "extraction_result", "ocr_page")
+# Least recently used entries read per table at a time while evicting
+EVICTION_BATCH = 64
+
+# Running byte total of all tables, kept by triggers so no write has to sum the tables
+_SIZE_SCHEMA = "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);\n" + "".join(
+    f"""
+CREATE INDEX IF NOT EXISTS ix_{table}_created_at ON {table} (created_at);
+CREATE INDEX IF NOT EXISTS ix_{table}_last_access ON {table} (last_access);
+CREATE TRIGGER IF NOT EXISTS {table}_size_insert AFTER INSERT ON {table}
+BEGIN UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS {table}_size_update AFTER UPDATE OF size ON {table}
+BEGIN UPDATE cache_size SET total = total - OLD.size + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS {table}_size_delete AFTER DELETE ON {table}
+BEGIN UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END;
+"""
+    for table in _TABLES
+)
+
+
+def hash_pdf(pdf_path, chunk_size=1024 * 1024):
+    """SHA-256 of the PDF bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache for the expensive extraction stages.
+    Raw text is keyed by the PDF hash alone; structured results are keyed by the
+    PDF hash plus the prompt/model version, so a prompt change only invalidates
+    the LLM results. OCR text is keyed per page (see ocr.page_hash), so a
+    scanned page is only recognized once whichever PDF it turns up in.
+    Entries expire after `ttl_seconds` and the least recently used ones are
+    evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, path, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._counters = {
+            "text_hits": 0, "text_misses": 0,
+            "result_hits": 0, "result_misses": 0,
+            "ocr_hits": 0, "ocr_misses": 0,
+            "evictions": 0,
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            conn.executescript(_SIZE_SCHEMA)
+            # Seed the running total once, also for caches created before it was kept
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, "
+                + " + ".join(f"(SELECT COALESCE(SUM(size), 0) FROM {table})" for table in _TABLES)
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, name):
+        self._counters[name] += 1
+
+    def _get(self, table, where, params, column, counter):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {column}, created_at FROM {table} WHERE {where}", params
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self._count(f"{counter}_misses")
+                return None
+            conn.execute(f"UPDATE {table} SET last_access = ? WHERE {where}", (now, *params))
+            self._count(f"{counter}_hits")
+            return row[0]
+
+    def get_text(self, content_hash):
+        return self._get("pdf_text", "content_hash = ?", (content_hash,), "raw_text", "text")
+
+    def get_result(self, content_hash, version):
+        result = self._get(
+            "extraction_result", "content_hash = ? AND version = ?", (content_hash, version), "result", "result"
+        )
+        return json.loads(result) if result is not None else None
+
+    def get_ocr(self, page_hash):
+        return self._get("ocr_page", "page_hash = ?", (page_hash,), "text", "ocr")
+
+    def put_ocr(self, page_hash, text):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ocr_page VALUES (?, ?, ?, ?, ?) ON CONFLICT (page_hash) DO UPDATE SET "
+                "text = excluded.text, size = excluded.size, created_at = excluded.created_at, last_access = excluded.last_access",
+                (page_hash, text, len(text.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def put_text(self, content_hash, raw_text):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO pdf_text VALUES (?, ?, ?, ?, ?) ON CONFLICT (content_hash) DO UPDATE SET "
+                "raw_text = excluded.raw_text, size = excluded.size, created_at = excluded.created_at, "
+                "last_access = excluded.last_access",
+                (content_hash, raw_text, len(raw_text.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def put_result(self, content_hash, version, result):
+        payload = json.dumps(result, default=str)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO extraction_result VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (content_hash, version) DO UPDATE SET "
+                "result = excluded.result, size = excluded.size, created_at = excluded.created_at, "
+                "last_access = excluded.last_access",
+                (content_hash, version, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        """
+        Drop expired entries, then least recently used ones until under
+        `max_bytes`, reading EVICTION_BATCH of the oldest rows per table at a
+        time through the last_access indexes.
+        """
+        cutoff = now - self.ttl_seconds
+        evicted = 0
+        for table in _TABLES:
+            evicted += conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (cutoff,)).rowcount
+
+        total = self._total_bytes(conn)
+        while total > self.max_bytes:
+            oldest = sorted(
+                (last_access, table, rowid, size)
+                for table in _TABLES
+                for rowid, size, last_access in conn.execute(
+                    f"SELECT rowid, size, last_access FROM {table} ORDER BY last_access LIMIT ?", (EVICTION_BATCH,)
+                )
+            )
+            if not oldest:
+                break
+            # The first EVICTION_BATCH merged rows are the oldest overall; later ones may not be, so read again
+            for _, table, rowid, size in oldest[:EVICTION_BATCH]:
+                if total <= self.max_bytes:
+                    break
+                conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+                total -= size
+                evicted += 1
+        self._counters["evictions"] += evicted
+
+    @staticmethod
+    def _total_bytes(conn):
+        return conn.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def invalidate_version(self, version):
+        """Remove every structured result produced with `version`; returns the number removed."""
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM extraction_result WHERE version = ?", (version,)).rowcount
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            versions = dict(conn.execute(
+                "SELECT version, COUNT(*) FROM extraction_result GROUP BY version"
+            ).fetchall())
+            return {
+                **self._counters,
+                "text_entries": conn.execute("SELECT COUNT(*) FROM pdf_text").fetchone()[0],
+                "result_entries": sum(versions.values()),
+                "ocr_entries": conn.execute("SELECT COUNT(*) FROM ocr_page").fetchone()[0],
+                "results_by_version": versions,
+                "total_bytes": self._total_bytes(conn),
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """The process-wide cache, created on first use; None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(CACHE_PATH)
+        return _cache
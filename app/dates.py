@@ -0,0 +1,203 @@
+import os
+import re
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from . import metrics
+
+# Rewrite the policy dates as ISO and derive YEAR/MONTH/DATE from them instead of asking the LLM
+NORMALIZE_DATES = os.getenv("NORMALIZE_DATES", "0") == "1"
+
+DATE_FIELDS = ["RISK_START_DATE", "OD_EXPIRE_DATE", "RENEWAL_DATE", "POLICY_ISSUE_DAY"]
+# Filled from the normalized dates; MONTH is written the way the MIS sheets have it ("DEC")
+DERIVED_DATE_FIELDS = ["YEAR", "MONTH", "DATE"]
+
+_MONTHS = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*"
+# Dates as schedules print them: 02/12/2024, 04-Dec-2024, 4 Dec, 2024, Dec 4, 2024
+DATE_PATTERN = (
+    r"\d{1,2}[/-]\d{1,2}[/-](?:\d{4}|\d{2}(?!\d))"
+    rf"|\d{{1,2}}[- ]{_MONTHS}[-, ]+(?:\d{{4}}|\d{{2}}(?!\d))"
+    rf"|{_MONTHS}\s+\d{{1,2}},\s*\d{{4}}"
+)
+DATE_FORMATS = [
+    "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y", "%d-%b-%Y", "%d %b, %Y", "%d %b %Y", "%b %d, %Y",
+    "%Y-%m-%d", "%d-%b-%y", "%d-%B-%Y", "%d %B %Y", "%d %B, %Y", "%B %d, %Y",
+]
+# The date inside a value such as "04-Dec-2024 00:00 hrs" or "2024-12-02 00:00:00"
+_DATE_TEXT = re.compile(r"\d{4}-\d{1,2}-\d{1,2}|" + DATE_PATTERN, re.IGNORECASE)
+
+
+def date_text(value):
+    """The date part of `value` with whitespace collapsed, or None when it holds no date."""
+    if value is None:
+        return None
+    match = _DATE_TEXT.search(str(value))
+    return re.sub(r"\s+", " ", match.group(0)) if match else None
+
+
+def parse_date(value):
+    """A date in one of the formats schedules print, as a datetime; None when it is in none of them."""
+    text = date_text(value)
+    if text is None:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def date_shape(text):
+    """Layout of a date string: digits as 9 and letters as a, e.g. "99-aaa-9999"."""
+    return re.sub(r"[A-Za-z]", "a", re.sub(r"\d", "9", text))
+
+
+class DateNormalizer:
+    """
+    Parse dates with the format that last worked for the same insurer and
+    date shape, so each template's format is worked out once and then reused
+    for every record after it. Only a miss falls back to trying every known
+    format. Safe to share between threads.
+    """
+
+    def __init__(self, formats=DATE_FORMATS):
+        self.formats = list(formats)
+        self._formats = {}  # (insurer, shape) -> format
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text, insurer):
+        return (" ".join(str(insurer or "").upper().split()), date_shape(text))
+
+    def _detect(self, key, text):
+        for date_format in self.formats:
+            try:
+                parsed = datetime.strptime(text, date_format)
+            except ValueError:
+                continue
+            with self._lock:
+                self._formats[key] = date_format
+            metrics.DATE_PARSES.inc(result="detected")
+            return parsed
+        metrics.DATE_PARSES.inc(result="failed")
+        return None
+
+    def parse(self, value, insurer=None):
+        """The date in `value` as a datetime.date, or None."""
+        text = date_text(value)
+        if text is None:
+            return None
+        key = self._key(text, insurer)
+        date_format = self._formats.get(key)
+        if date_format is not None:
+            try:
+                parsed = datetime.strptime(text, date_format)
+                metrics.DATE_PARSES.inc(result="cached")
+                return parsed.date()
+            except ValueError:
+                pass
+        parsed = self._detect(key, text)
+        return parsed.date() if parsed else None
+
+    def parse_many(self, values, insurers=None):
+        """
+        Parse a batch of values at once: values sharing an insurer and shape
+        go through pd.to_datetime with their cached format in one call, and
+        only those it rejects are parsed one by one. Returns dates or None, in order.
+        """
+        texts = [date_text(value) for value in values]
+        insurers = list(insurers) if insurers is not None else [None] * len(texts)
+        groups = {}
+        for index, (text, insurer) in enumerate(zip(texts, insurers)):
+            if text is not None:
+                groups.setdefault(self._key(text, insurer), []).append(index)
+
+        results = [None] * len(texts)
+        for key, indexes in groups.items():
+            if key not in self._formats:
+                # The first value that parses settles the format for the rest of the group
+                for position, index in enumerate(indexes):
+                    parsed = self._detect(key, texts[index])
+                    if parsed is not None:
+                        results[index] = parsed.date()
+                        indexes = indexes[position + 1:]
+                        break
+                else:
+                    continue
+            parsed = pd.to_datetime([texts[index] for index in indexes], format=self._formats[key], errors="coerce")
+            hits = 0
+            for index, timestamp in zip(indexes, parsed):
+                if pd.isna(timestamp):
+                    results[index] = self.parse(texts[index], insurers[index])
+                else:
+                    results[index] = timestamp.date()
+                    hits += 1
+            if hits:
+                metrics.DATE_PARSES.inc(hits, result="cached")
+        return results
+
+
+_normalizer = DateNormalizer()
+
+
+def get_date_normalizer():
+    """The process-wide normalizer, so every worker shares the formats learned so far."""
+    return _normalizer
+
+
+def _derive(data, dates):
+    if not dates.get("RENEWAL_DATE") and dates.get("OD_EXPIRE_DATE"):
+        dates["RENEWAL_DATE"] = dates["OD_EXPIRE_DATE"]
+        data["RENEWAL_DATE"] = dates["RENEWAL_DATE"].isoformat()
+    booked = dates.get("POLICY_ISSUE_DAY") or dates.get("RISK_START_DATE")
+    if booked:
+        data["YEAR"] = str(booked.year)
+        data["MONTH"] = booked.strftime("%b").upper()
+        data["DATE"] = booked.isoformat()
+
+
+def normalize_dates(data, normalizer=None):
+    """
+    Rewrite the policy dates of one record as ISO strings, fill a missing
+    RENEWAL_DATE from OD_EXPIRE_DATE and derive YEAR, MONTH and DATE from the
+    issue date (the risk start date when there is none). Values with no
+    recognizable date are left as they are.
+    """
+    normalizer = normalizer or get_date_normalizer()
+    insurer = data.get("INSURANCE_COMPANY_NAME")
+    dates = {}
+    for field in DATE_FIELDS:
+        parsed = normalizer.parse(data.get(field), insurer)
+        if parsed is not None:
+            dates[field] = parsed
+            data[field] = parsed.isoformat()
+    _derive(data, dates)
+    return data
+
+
+def normalize_dates_frame(frame, normalizer=None):
+    """normalize_dates() for a whole DataFrame of records, one parse_many() call per date column."""
+    normalizer = normalizer or get_date_normalizer()
+    frame = frame.copy()
+    insurers = frame["INSURANCE_COMPANY_NAME"] if "INSURANCE_COMPANY_NAME" in frame else None
+    parsed = {}
+    for field in DATE_FIELDS:
+        if field in frame:
+            parsed[field] = normalizer.parse_many(frame[field].tolist(), insurers)
+            iso = [value.isoformat() if value else None for value in parsed[field]]
+            frame[field] = [new if new is not None else old for new, old in zip(iso, frame[field])]
+
+    derived = []
+    for position in range(len(frame)):
+        row, dates = {}, {field: values[position] for field, values in parsed.items() if values[position]}
+        _derive(row, dates)
+        derived.append(row)
+    for field in ["RENEWAL_DATE"] + DERIVED_DATE_FIELDS:
+        values = [row.get(field) for row in derived]
+        if any(value is not None for value in values):
+            current = frame[field] if field in frame else [None] * len(frame)
+            frame[field] = [new if new is not None else old for new, old in zip(values, current)]
+    return frame
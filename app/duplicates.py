@@ -0,0 +1,243 @@
+import hashlib
+import math
+import os
+import threading
+import time
+
+from . import metrics
+from .dates import parse_date
+
+# What to do with a document whose policy number, or chassis or engine number for the
+# same policy period, was seen before: "flag" processes it but marks it and keeps it
+# out of the totals, "skip" also skips its LLM call and output row, "off" does not check
+DUPLICATE_POLICIES = os.getenv("DUPLICATE_POLICIES", "flag").lower()
+DUPLICATE_KEY_FIELDS = ["POLICY_NO", "CHASIS_NUMBER", "ENGINE_NUMBER"]
+# A vehicle is insured again every year, so these only match within the same policy period
+VEHICLE_KEY_FIELDS = {"CHASIS_NUMBER", "ENGINE_NUMBER"}
+PERIOD_FIELDS = ["RISK_START_DATE", "OD_EXPIRE_DATE"]
+# Keys the Bloom filter is sized for, and its false-positive rate at that size
+DUPLICATE_BLOOM_CAPACITY = int(os.getenv("DUPLICATE_BLOOM_CAPACITY", 1_000_000))
+DUPLICATE_BLOOM_ERROR_RATE = float(os.getenv("DUPLICATE_BLOOM_ERROR_RATE", 0.001))
+# How often keys stored by other processes are added to the filter; a duplicate stored
+# elsewhere within this window is only caught if its keys are already in the filter
+DUPLICATE_REFRESH_SECONDS = float(os.getenv("DUPLICATE_REFRESH_SECONDS", 5))
+# Shorter values ("NEW", "0") are placeholders, not identifiers
+MIN_KEY_LENGTH = 6
+_MISSING = {"", "N/A", "NOT FOUND", "NA", "NONE"}
+
+
+def normalize_key(value):
+    """Identifier as compared: upper-case letters and digits only, so "OG-25-1316" matches "og 25 1316"."""
+    return "".join(char for char in str(value).upper() if char.isalnum())
+
+
+def policy_keys(record):
+    """(field, normalized value) for each identifying field `record` has."""
+    keys = []
+    for field in DUPLICATE_KEY_FIELDS:
+        value = record.get(field)
+        if _is_missing(value):
+            continue
+        key = normalize_key(value)
+        if len(key) >= MIN_KEY_LENGTH:
+            keys.append((field, key))
+    return keys
+
+
+def _is_missing(value):
+    return value is None or str(value).strip().upper() in _MISSING
+
+
+def policy_period(record):
+    """(start, expiry) of the policy, as ISO dates where they parse; None for a date the record lacks."""
+    period = []
+    for field in PERIOD_FIELDS:
+        value = record.get(field)
+        if _is_missing(value):
+            period.append(None)
+            continue
+        parsed = parse_date(str(value))
+        period.append(parsed.date().isoformat() if parsed else normalize_key(value))
+    return tuple(period)
+
+
+def confirms_duplicate(field, period, other_period):
+    """Whether a match on `field` is the same policy: always for a policy number, for a vehicle only in the same period."""
+    if field not in VEHICLE_KEY_FIELDS:
+        return True
+    return any(value is not None and value == other for value, other in zip(period, other_period))
+
+
+def is_skipped_duplicate(record):
+    """Whether `record` is a duplicate that is left out of the output (DUPLICATE_POLICIES=skip)."""
+    return DUPLICATE_POLICIES == "skip" and bool(record and record.get("DUPLICATE_OF"))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, with double hashing from one BLAKE2b digest."""
+
+    def __init__(self, capacity=DUPLICATE_BLOOM_CAPACITY, error_rate=DUPLICATE_BLOOM_ERROR_RATE):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * step) % self.size for index in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _bloom_key(field, key):
+    return f"{field}:{key}"
+
+
+class DuplicateRegistry:
+    """
+    Policy, chassis and engine numbers of every processed record. A Bloom
+    filter holding every stored key turns away new keys without a database
+    query; `load(after_id)` yields the stored keys as (id, field, value) past
+    `after_id`, and is called again every DUPLICATE_REFRESH_SECONDS so keys
+    stored by other processes (other workers, the CLI) join the filter. A
+    possible match is confirmed against keys claimed in this process and not
+    stored yet, then with `lookup(keys, period)`, which returns (field, value,
+    description) of a stored record holding one of them, or None. Chassis and
+    engine numbers only match a record of the same policy_period(), so a
+    renewal of the same vehicle is not a duplicate. Safe to share between
+    threads; the database is never queried under the lock.
+    """
+
+    def __init__(self, lookup=None, load=None, capacity=DUPLICATE_BLOOM_CAPACITY, error_rate=DUPLICATE_BLOOM_ERROR_RATE,
+                 refresh_seconds=DUPLICATE_REFRESH_SECONDS):
+        self.lookup = lookup
+        self.load = load
+        self.refresh_seconds = refresh_seconds
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._claimed = {}  # (field, key) -> [(owner, description, period)]
+        self._loaded_id = 0
+        self._loaded_at = None
+        # Without every stored key in the filter, a negative proves nothing
+        self._bloom_complete = lookup is None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _refresh(self):
+        """Add the keys stored since the last load, when that was more than refresh_seconds ago."""
+        if self.load is None:
+            return
+        with self._load_lock:
+            now = time.monotonic()
+            if self._loaded_at is not None and now - self._loaded_at < self.refresh_seconds:
+                return
+            self._loaded_at = now
+            try:
+                rows = list(self.load(self._loaded_id))
+            except Exception as e:
+                self._bloom_complete = False
+                print(f"Error loading stored policy keys; checking every record against the database: {e}")
+                return
+            with self._lock:
+                for key_id, field, key in rows:
+                    self._bloom.add(_bloom_key(field, key))
+                    self._loaded_id = max(self._loaded_id, key_id)
+                self._bloom_complete = True
+        if rows:
+            print(f"Loaded {len(rows)} stored policy keys into the duplicate filter")
+
+    def _claimed_by_other(self, keys, owner, period):
+        for key in keys:
+            for claimed_owner, description, claimed_period in self._claimed.get(key, ()):
+                if claimed_owner != owner and confirms_duplicate(key[0], period, claimed_period):
+                    return (*key, description)
+        return None
+
+    def _checked(self, key, owner, period):
+        """Whether `owner` already checked `key` for this period; a recheck with a new period looks it up again."""
+        return any(claimed[0] == owner and claimed[2] == period for claimed in self._claimed.get(key, ()))
+
+    def _register(self, keys, owner, description, period):
+        for key in keys:
+            self._bloom.add(_bloom_key(*key))
+            # A recheck after the LLM may know the period the rules did not
+            claims = [claimed for claimed in self._claimed.get(key, ()) if claimed[0] != owner]
+            self._claimed[key] = claims + [(owner, description, period)]
+
+    def claim(self, record, owner, description):
+        """
+        Check `record`'s keys and, when none was seen before, register them to
+        `owner` (any token unique to this processing run). Returns the
+        earlier record as "description (FIELD value)", or None for a new record.
+        Keys `owner` claimed earlier never count as duplicates of itself.
+        """
+        keys = policy_keys(record)
+        if not keys:
+            return None
+        period = policy_period(record)
+        self._refresh()
+        with self._lock:
+            candidates = [key for key in keys if _bloom_key(*key) in self._bloom]
+            duplicate = self._claimed_by_other(candidates, owner, period)
+            to_look_up = [key for key in (candidates if self._bloom_complete else keys) if not self._checked(key, owner, period)]
+            if duplicate is None and (self.lookup is None or not to_look_up):
+                self._register(keys, owner, description, period)
+
+        if duplicate is None and self.lookup is not None and to_look_up:
+            try:
+                duplicate = self.lookup(to_look_up, period)
+            except Exception as e:
+                print(f"Error looking up duplicate policies: {e}")
+            with self._lock:
+                # Another run may have claimed one of the keys while the database answered
+                duplicate = duplicate or self._claimed_by_other(keys, owner, period)
+                if duplicate is None:
+                    self._register(keys, owner, description, period)
+
+        metrics.DUPLICATE_CHECKS.inc(result="duplicate" if duplicate else "false_positive" if candidates else "new")
+        if duplicate is None:
+            return None
+        field, key, earlier = duplicate
+        return f"{earlier} ({field} {key})"
+
+    def forget(self, owner):
+        """Drop the claims of `owner`, whose record failed and will not be stored."""
+        with self._lock:
+            for key in list(self._claimed):
+                self._drop_claims(key, lambda claimed: claimed[0] == owner)
+
+    def release(self, records):
+        """Forget the claims of records now stored; the database answers for them from here on."""
+        with self._lock:
+            for record in records:
+                period = policy_period(record)
+                for key in policy_keys(record):
+                    self._drop_claims(key, lambda claimed: claimed[2] == period)
+
+    def _drop_claims(self, key, matches):
+        remaining = [claimed for claimed in self._claimed.get(key, ()) if not matches(claimed)]
+        if remaining:
+            self._claimed[key] = remaining
+        else:
+            self._claimed.pop(key, None)
+
+
+_registry = None
+
+
+def set_duplicate_registry(registry):
+    """Install the registry process_pdf checks (the app installs one backed by the database)."""
+    global _registry
+    _registry = registry
+
+
+def get_duplicate_registry():
+    """The installed registry, or None when duplicate detection is off or not set up."""
+    if DUPLICATE_POLICIES == "off":
+        return None
+    return _registry
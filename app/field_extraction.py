@@ -1,88 +1,186 @@
-import openai
+import hashlib
 import json
 import os
-from .utils import clean_numeric_field
+from .utils import clean_numeric_field, count_tokens
+from .rate_limit import RateLimiter, call_with_retries
+from .backends import get_backend
+from .label_index import LabelIndex, normalize_label
+from . import metrics
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Model of the configured backend (see backends.py); used for token counting
+LLM_MODEL = get_backend().model or "gpt-3.5-turbo"
 
-def extract_with_ai(raw_text):
-    """
-    Extract structured data using OpenAI API.
-    This function uses context and variations to ensure accurate field mapping.
-    """
-    prompt_template = """
+# Shared by every thread that calls a rate-limited backend, so concurrent batches stay under the account limits
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30.0))
+LLM_COMPLETION_TOKENS = 1000
+rate_limiter = RateLimiter(
+    requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", 0)),
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", 0)),
+)
+
+
+# Output schema, in workbook column order
+FIELD_SCHEMA = [
+    "S_No", "YEAR", "MONTH", "DATE", "INSURANCE_COMPANY_NAME", "Broker_Name", "IMD_CODE",
+    "LOB", "PACKAGE_LIABILITY", "FUEL_TYPE", "REN_ROLL_NEW_USED", "CUSTOMER_NAME", "MOB_NO",
+    "LOCATION", "REG_NUMBER", "VEHICLE_MAKE", "VEHICLE_MODEL", "CC_GVW", "BIKE_SCOOTER",
+    "YEAR_OF_MANUFACTURE", "ENGINE_NUMBER", "CHASIS_NUMBER", "POLICY_NO", "IDV_SUM_INSURED",
+    "NCB", "RISK_START_DATE", "OD_EXPIRE_DATE", "RENEWAL_DATE",
+    "OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM",
+    "POLICY_ISSUE_DAY",
+]
+
+PROMPT_TEMPLATE = """
     Extract the following structured data as JSON from the text:
     {{
-        "S_No": "string",
-        "YEAR": "string",
-        "MONTH": "string",
-        "DATE": "string",
-        "INSURANCE_COMPANY_NAME": "string",
-        "Broker_Name": "string",
-        "IMD_CODE": "string",
-        "LOB": "string",
-        "PACKAGE_LIABILITY": "string",
-        "FUEL_TYPE": "string",
-        "REN_ROLL_NEW_USED": "string",
-        "CUSTOMER_NAME": "string",
-        "MOB_NO": "string",
-        "LOCATION": "string",
-        "REG_NUMBER": "string",
-        "VEHICLE_MAKE": "string",
-        "VEHICLE_MODEL": "string",
-        "CC_GVW": "string",
-        "BIKE_SCOOTER": "string",
-        "YEAR_OF_MANUFACTURE": "string",
-        "ENGINE_NUMBER": "string",
-        "CHASIS_NUMBER": "string",
-        "POLICY_NO": "string",
-        "IDV_SUM_INSURED": "string",
-        "NCB": "string",
-        "RISK_START_DATE": "string",
-        "OD_EXPIRE_DATE": "string",
-        "RENEWAL_DATE": "string",
-        "OD_PREMIUM": "string",
-        "TP_ONLY_PREMIUM": "string",
-        "NET_PREMIUM": "string",
-        "TOTAL_PREMIUM": "string",
-        "POLICY_ISSUE_DAY": "string"
+{schema}
     }}
     Use the following mapping rules:
-    - Variations for `OD_PREMIUM`: {od_variations}
-    - Variations for `TP_ONLY_PREMIUM`: {tp_variations}
-    - Variations for `NET_PREMIUM`: {net_variations}
-    - Variations for `TOTAL_PREMIUM`: {total_variations}
-    - Variations for `POLICY_ISSUE_DAY`: {policy_issue_variations}
-    - Ensure `OD_PREMIUM` = "Total Own Damage Premium (A)" + "Total Add-On Premium (C)".
-    - Ensure `NET_PREMIUM` = `OD_PREMIUM` + `TP_ONLY_PREMIUM`.
-    - Ensure `RENEWAL_DATE` = `OD_EXPIRE_DATE`.
-    - Map `REN_ROLL_NEW_USED` to "New" or "Old" based on context.
+{rules}
     For missing fields, return "N/A".
     Here is the extracted text:
     {raw_text}
     """
+
+# Several documents in one request; the model answers with one object per document id
+BATCH_PROMPT_TEMPLATE = """
+    Extract the following structured data as JSON from each document below:
+    {{
+{schema}
+    }}
+    Use the following mapping rules:
+{rules}
+    For missing fields, return "N/A".
+    Return a JSON array with exactly one object per document. Each object must
+    contain "document_id" set to the document's id, followed by the fields above.
+    Never mix values between documents.
+    Here are the documents:
+{documents}
+    """
+BATCH_DOCUMENT_TEMPLATE = """    === Document {document_id} ===
+    {raw_text}
+"""
+
+# Label variations the prompt asks the model to map onto the premium and issue-date fields
+FIELD_VARIATIONS = {
+    "od_variations": "Total Own Damage Premium (A), Own Damage Premium, Damage Premium, Total OD Premium – A, Net Own Damage Premium(a), OD Total (Rounded Off)",
+    "tp_variations": "Total Liability Premium (B), Total Liability Premium, Third Party Premium, Liability Premium, Liability Premium(b), Total Premium Payable, Total Act Premium, Total Act Premium-B, TP Total (Rounded Off)",
+    "net_variations": "Net Premium (A+B+C), Net Policy Premium, Total Net Premium, Net Premium (A+B), Net Premium, Total Premium (A+B+C+A1), Total Premium(Net Premium)(A+B), Total Premium (Net Premium) (A+B), Package premium (A+B), Total Package Premium(A+B), Gross Premium",
+    "total_variations": "Policy Premium, Total Premium, Premium Amount, Total (Rounded Off), Total Policy Premium, Total, Total Amount, Final Premium, Net Payable, Final Premium",
+    "policy_issue_variations": "Date of Issue, Receipt Date, Policy Issued On"
+}
+
+# Field each variation list belongs to
+VARIATION_FIELDS = {
+    "od_variations": "OD_PREMIUM",
+    "tp_variations": "TP_ONLY_PREMIUM",
+    "net_variations": "NET_PREMIUM",
+    "total_variations": "TOTAL_PREMIUM",
+    "policy_issue_variations": "POLICY_ISSUE_DAY",
+}
+
+# Mapping rules as (fields the rule is about, rule text); a rule is only sent when one of its fields is requested
+MAPPING_RULES = [
+    *[([field], f"Variations for `{field}`: {{{key}}}") for key, field in VARIATION_FIELDS.items()],
+    (["OD_PREMIUM"], 'Ensure `OD_PREMIUM` = "Total Own Damage Premium (A)" + "Total Add-On Premium (C)".'),
+    (["NET_PREMIUM"], "Ensure `NET_PREMIUM` = `OD_PREMIUM` + `TP_ONLY_PREMIUM`."),
+    (["RENEWAL_DATE"], "Ensure `RENEWAL_DATE` = `OD_EXPIRE_DATE`."),
+    (["REN_ROLL_NEW_USED"], 'Map `REN_ROLL_NEW_USED` to "New" or "Old" based on context.'),
+]
+
+# Changes whenever the model or prompt changes, so cached extractions from older prompts are not reused
+EXTRACTION_VERSION = f"{get_backend().version}:" + hashlib.sha256(
+    json.dumps(
+        [PROMPT_TEMPLATE, BATCH_PROMPT_TEMPLATE, FIELD_SCHEMA, FIELD_VARIATIONS, MAPPING_RULES], sort_keys=True
+    ).encode("utf-8")
+).hexdigest()[:12]
+
+
+def _schema_and_rules(fields=None):
+    """Schema lines and mapping rules for `fields` (the full schema by default)."""
+    fields = [field for field in FIELD_SCHEMA if fields is None or field in fields]
+    schema = ",\n".join(f'        "{field}": "string"' for field in fields)
+    rules = "\n".join(
+        "    - " + rule.format(**FIELD_VARIATIONS)
+        for rule_fields, rule in MAPPING_RULES
+        if any(field in fields for field in rule_fields)
+    )
+    return schema, rules
+
+
+def build_prompt(raw_text, fields=None):
+    """
+    Build the extraction prompt for `fields` (the full schema by default).
+    A reduced field list only carries the mapping rules that mention those fields.
+    """
+    schema, rules = _schema_and_rules(fields)
+    return PROMPT_TEMPLATE.format(schema=schema, rules=rules, raw_text=raw_text)
+
+
+def build_batch_prompt(documents, fields=None):
+    """One prompt for several (document_id, raw_text) pairs, sharing a single schema and rule block."""
+    schema, rules = _schema_and_rules(fields)
+    blocks = "".join(
+        BATCH_DOCUMENT_TEMPLATE.format(document_id=document_id, raw_text=raw_text)
+        for document_id, raw_text in documents
+    )
+    return BATCH_PROMPT_TEMPLATE.format(schema=schema, rules=rules, documents=blocks)
+
+
+def complete_prompt(prompt, completion_tokens=LLM_COMPLETION_TOKENS, backend=None):
+    """Send `prompt` to a chat backend (the configured one by default) and return the reply text."""
+    backend = backend or get_backend()
+
+    # Wait for rate limit capacity and retry 429/5xx responses
+    def call_backend():
+        if backend.rate_limited:
+            rate_limiter.acquire(count_tokens(prompt, LLM_MODEL) + completion_tokens)
+        return backend.chat(prompt, completion_tokens)
+
+    def on_retry(error, attempt):
+        metrics.LLM_RETRIES.inc()
+        metrics.count("llm_retries")
+
     try:
-        # Define variations for key fields
-        variations = {
-            "od_variations": "Total Own Damage Premium (A), Own Damage Premium, Damage Premium, Total OD Premium – A, Net Own Damage Premium(a), OD Total (Rounded Off)",
-            "tp_variations": "Total Liability Premium (B), Total Liability Premium, Third Party Premium, Liability Premium, Liability Premium(b), Total Premium Payable, Total Act Premium, Total Act Premium-B, TP Total (Rounded Off)",
-            "net_variations": "Net Premium (A+B+C), Net Policy Premium, Total Net Premium, Net Premium (A+B), Net Premium, Total Premium (A+B+C+A1), Total Premium(Net Premium)(A+B), Total Premium (Net Premium) (A+B), Package premium (A+B), Total Package Premium(A+B), Gross Premium",
-            "total_variations": "Policy Premium, Total Premium, Premium Amount, Total (Rounded Off), Total Policy Premium, Total, Total Amount, Final Premium, Net Payable, Final Premium",
-            "policy_issue_variations": "Date of Issue, Receipt Date, Policy Issued On"
-        }
-
-        # Format the prompt
-        prompt = prompt_template.format(raw_text=raw_text, **variations)
-
-        # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
+        content, usage = call_with_retries(
+            call_backend,
+            max_retries=LLM_MAX_RETRIES,
+            base_delay=LLM_BACKOFF_BASE,
+            max_delay=LLM_BACKOFF_MAX,
+            on_retry=on_retry,
         )
+    except Exception:
+        metrics.LLM_REQUESTS.inc(outcome="error")
+        raise
+
+    # Prefer the token counts the API reports; estimate them when it does not
+    prompt_tokens = usage.get("prompt_tokens") or count_tokens(prompt, LLM_MODEL)
+    completion_tokens = usage.get("completion_tokens") or count_tokens(content, LLM_MODEL)
+    metrics.LLM_REQUESTS.inc(outcome="success")
+    metrics.LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+    metrics.LLM_TOKENS.inc(completion_tokens, kind="completion")
+    metrics.count("prompt_tokens", prompt_tokens)
+    metrics.count("completion_tokens", completion_tokens)
+    return content
+
+
+def extract_with_ai(raw_text, fields=None):
+    """
+    Extract structured data with the configured backend (OpenAI by default).
+    This function uses context and variations to ensure accurate field mapping.
+    Pass `fields` to ask only for those fields with a reduced prompt.
+    """
+    try:
+        backend = get_backend()
+        if not backend.supports_chat:
+            return backend.extract(raw_text, fields)
+
+        # Format the prompt and call the model
+        response_content = complete_prompt(build_prompt(raw_text, fields), backend=backend)
 
         # Parse the response
-        response_content = response["choices"][0]["message"]["content"].strip()
         data = json.loads(response_content)
         print("Debug: Extracted structured data:", data)
         return data
@@ -92,82 +190,156 @@ def extract_with_ai(raw_text):
         return {"error": str(e)}
 
 
+def parse_batch_response(response_content, document_ids):
+    """
+    Split a batched reply into {document_id: record}.
+    Raises ValueError when the reply is not a JSON array of objects; objects
+    with unknown or repeated ids are dropped, so callers can retry just the
+    documents that are missing from the result.
+    """
+    try:
+        records = json.loads(response_content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Batched response is not valid JSON: {e}")
+    if isinstance(records, dict) and isinstance(records.get("documents"), list):
+        records = records["documents"]
+    if not isinstance(records, list):
+        raise ValueError("Batched response is not a JSON array")
+
+    expected = {str(document_id) for document_id in document_ids}
+    results = {}
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError("Batched response contains a non-object entry")
+        document_id = str(record.pop("document_id", ""))
+        if document_id not in expected or document_id in results:
+            print(f"Warning: Dropping batched record with unexpected document_id {document_id!r}")
+            continue
+        results[document_id] = record
+    return results
+
+
+def extract_batch_with_ai(documents, fields=None):
+    """
+    Extract several (document_id, raw_text) pairs with one request.
+    Returns {document_id: record} with a record for every document: those the
+    batched reply does not cover (or a malformed reply) fall back to
+    extract_with_ai() one document at a time.
+    """
+    document_ids = [str(document_id) for document_id, _ in documents]
+    results = {}
+    try:
+        backend = get_backend()
+        if not backend.supports_chat:
+            return {str(document_id): backend.extract(raw_text, fields) for document_id, raw_text in documents}
+
+        prompt = build_batch_prompt(documents, fields)
+        response_content = complete_prompt(prompt, LLM_COMPLETION_TOKENS * len(documents), backend)
+        results = parse_batch_response(response_content, document_ids)
+        print(f"Debug: Batched extraction returned {len(results)} of {len(documents)} documents")
+    except Exception as e:
+        print(f"Error in extract_batch_with_ai, falling back to per-document calls: {e}")
+
+    for document_id, raw_text in documents:
+        if str(document_id) not in results:
+            results[str(document_id)] = extract_with_ai(raw_text, fields)
+    return results
+
+
+# Label variations found in policy schedules, mapped to their standardized keys
+FIELD_MAPPING = {
+    # IMD_CODE Variations
+    "Agent License Code": "IMD_CODE",
+    "IMD Code": "IMD_CODE",
+    "Broker License Code": "IMD_CODE",
+    "Partner Code": "IMD_CODE",
+    "Agency Code": "IMD_CODE",
+    "Broker Code": "IMD_CODE",
+    "Code": "IMD_CODE",
+    "Sales Channel Code": "IMD_CODE",
+    "Intermediary Code": "IMD_CODE",
+
+    # OD_PREMIUM Variations
+    "Total Own Damage Premium (A)": "OD_PREMIUM",
+    "Own Damage Premium": "OD_PREMIUM",
+    "Damage Premium": "OD_PREMIUM",
+    "Total OD Premium – A": "OD_PREMIUM",
+    "Net Own Damage Premium(a)": "OD_PREMIUM",
+    "OD Total (Rounded Off)": "OD_PREMIUM",
+
+    # TP_ONLY_PREMIUM Variations
+    "Total Liability Premium (B)": "TP_ONLY_PREMIUM",
+    "Total Liability Premium": "TP_ONLY_PREMIUM",
+    "Third Party Premium": "TP_ONLY_PREMIUM",
+    "Liability Premium": "TP_ONLY_PREMIUM",
+    "Liability Premium(b)": "TP_ONLY_PREMIUM",
+    "Total Premium Payable": "TP_ONLY_PREMIUM",
+    "Total Act Premium": "TP_ONLY_PREMIUM",
+    "Total Act Premium-B": "TP_ONLY_PREMIUM",
+    "TP Total (Rounded Off)": "TP_ONLY_PREMIUM",
+
+    # NET_PREMIUM Variations
+    "Net Premium (A+B+C)": "NET_PREMIUM",
+    "Net Policy Premium": "NET_PREMIUM",
+    "Total Net Premium": "NET_PREMIUM",
+    "Net Premium (A+B)": "NET_PREMIUM",
+    "Net Premium": "NET_PREMIUM",
+    "Total Premium (A+B+C+A1)": "NET_PREMIUM",
+    "Total Premium(Net Premium)(A+B)": "NET_PREMIUM",
+    "Total Premium (Net Premium) (A+B)": "NET_PREMIUM",
+    "Package premium (A+B)": "NET_PREMIUM",
+    "Total Package Premium(A+B)": "NET_PREMIUM",
+    "Gross Premium": "NET_PREMIUM",
+
+    # TOTAL_PREMIUM Variations
+    "Policy Premium": "TOTAL_PREMIUM",
+    "Total Premium": "TOTAL_PREMIUM",
+    "Premium Amount": "TOTAL_PREMIUM",
+    "Total (Rounded Off)": "TOTAL_PREMIUM",
+    "Total Policy Premium": "TOTAL_PREMIUM",
+    "Total": "TOTAL_PREMIUM",
+    "Total Amount": "TOTAL_PREMIUM",
+    "Final Premium": "TOTAL_PREMIUM",
+    "Net Payable": "TOTAL_PREMIUM",
+
+    # Broker Name Variations
+    "Agent Name": "Broker_Name",
+    "Partner Name": "Broker_Name",
+    "Agency Name": "Broker_Name",
+    "Agent/Intermediary Name": "Broker_Name",
+    "Intermediary Name": "Broker_Name",
+    "Broker Name": "Broker_Name",
+    "Channel": "Broker_Name",
+
+    # POLICY_ISSUE_DAY Variations
+    "Date of Issue": "POLICY_ISSUE_DAY",
+    "Receipt Date": "POLICY_ISSUE_DAY",
+    "Policy Issued On": "POLICY_ISSUE_DAY",
+}
+
+
+# Response keys the model may use for each field: the label variations and the schema keys themselves
+FIELD_KEY_INDEX = LabelIndex({**FIELD_MAPPING, **{field: field for field in FIELD_SCHEMA}})
+# Values that leave a schema key free to be filled from a label-style key
+_MISSING_VALUES = {"", "N/A", "NOT FOUND"}
+
+
 def map_field_variations(data):
     """
     Map field name variations to standardized keys.
-    This function ensures consistent field names across extracted data.
+    Keys are matched regardless of case, spacing and dashes. When several keys
+    map to one field the longest label wins, and a field the model already
+    filled under its schema key is kept.
     """
-    field_mapping = {
-        # IMD_CODE Variations
-        "Agent License Code": "IMD_CODE",
-        "IMD Code": "IMD_CODE",
-        "Broker License Code": "IMD_CODE",
-        "Partner Code": "IMD_CODE",
-        "Agency Code": "IMD_CODE",
-        "Broker Code": "IMD_CODE",
-        "Code": "IMD_CODE",
-        "Sales Channel Code": "IMD_CODE",
-        "Intermediary Code": "IMD_CODE",
-
-        # OD_PREMIUM Variations
-        "Total Own Damage Premium (A)": "OD_PREMIUM",
-        "Own Damage Premium": "OD_PREMIUM",
-        "Damage Premium": "OD_PREMIUM",
-        "Total OD Premium – A": "OD_PREMIUM",
-        "Net Own Damage Premium(a)": "OD_PREMIUM",
-        "OD Total (Rounded Off)": "OD_PREMIUM",
-
-        # TP_ONLY_PREMIUM Variations
-        "Total Liability Premium (B)": "TP_ONLY_PREMIUM",
-        "Total Liability Premium": "TP_ONLY_PREMIUM",
-        "Third Party Premium": "TP_ONLY_PREMIUM",
-        "Liability Premium": "TP_ONLY_PREMIUM",
-        "Liability Premium(b)": "TP_ONLY_PREMIUM",
-        "Total Premium Payable": "TP_ONLY_PREMIUM",
-        "Total Act Premium": "TP_ONLY_PREMIUM",
-        "Total Act Premium-B": "TP_ONLY_PREMIUM",
-        "TP Total (Rounded Off)": "TP_ONLY_PREMIUM",
-
-        # NET_PREMIUM Variations
-        "Net Premium (A+B+C)": "NET_PREMIUM",
-        "Net Policy Premium": "NET_PREMIUM",
-        "Total Net Premium": "NET_PREMIUM",
-        "Net Premium (A+B)": "NET_PREMIUM",
-        "Net Premium": "NET_PREMIUM",
-        "Total Premium (A+B+C+A1)": "NET_PREMIUM",
-        "Total Premium(Net Premium)(A+B)": "NET_PREMIUM",
-        "Total Premium (Net Premium) (A+B)": "NET_PREMIUM",
-        "Package premium (A+B)": "NET_PREMIUM",
-        "Total Package Premium(A+B)": "NET_PREMIUM",
-        "Gross Premium": "NET_PREMIUM",
-
-        # TOTAL_PREMIUM Variations
-        "Policy Premium": "TOTAL_PREMIUM",
-        "Total Premium": "TOTAL_PREMIUM",
-        "Premium Amount": "TOTAL_PREMIUM",
-        "Total (Rounded Off)": "TOTAL_PREMIUM",
-        "Total Policy Premium": "TOTAL_PREMIUM",
-        "Total": "TOTAL_PREMIUM",
-        "Total Amount": "TOTAL_PREMIUM",
-        "Final Premium": "TOTAL_PREMIUM",
-        "Net Payable": "TOTAL_PREMIUM",
-
-        # Broker Name Variations
-        "Agent Name": "Broker_Name",
-        "Partner Name": "Broker_Name",
-        "Agency Name": "Broker_Name",
-        "Agent/Intermediary Name": "Broker_Name",
-        "Intermediary Name": "Broker_Name",
-        "Broker Name": "Broker_Name",
-        "Channel": "Broker_Name",
-
-        # POLICY_ISSUE_DAY Variations
-        "Date of Issue": "POLICY_ISSUE_DAY",
-        "Receipt Date": "POLICY_ISSUE_DAY",
-        "Policy Issued On": "POLICY_ISSUE_DAY",
-    }
-
-    for key, new_key in field_mapping.items():
-        if key in data:
-            data[new_key] = data.pop(key)
+    renames = {}
+    for key in list(data):
+        field = FIELD_KEY_INDEX.get(key)
+        if field is None or key == field:
+            continue
+        value = data.pop(key)
+        if field not in renames or len(normalize_label(key)) > len(normalize_label(renames[field][0])):
+            renames[field] = (key, value)
+    for field, (_, value) in renames.items():
+        if str(data.get(field) or "").strip().upper() in _MISSING_VALUES:
+            data[field] = value
     return data
\ No newline at end of file
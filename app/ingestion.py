@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_FILE_BYTES = int(float(os.getenv("MAX_UPLOAD_FILE_MB", 50)) * 1024 * 1024)
+MAX_UPLOAD_BATCH_BYTES = int(float(os.getenv("MAX_UPLOAD_BATCH_MB", 500)) * 1024 * 1024)
+
+# The header may follow a little junk; the trailer sits in the last kilobyte or so
+PREFLIGHT_HEAD_BYTES = 1024
+PREFLIGHT_TAIL_BYTES = 2048
+_HEADER = re.compile(rb"%PDF-[12]\.\d")
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+
+
+class IngestedFile:
+    """An uploaded part written to disk, with its SHA-256 and whether it passed the preflight."""
+
+    def __init__(self, filename, path, size=0, content_hash=None, error=None):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        self.error = error
+
+    @property
+    def is_valid(self):
+        return self.error is None
+
+
+def preflight_pdf(head, tail, size):
+    """
+    Cheap structural check on the first and last bytes of a file: a %PDF header,
+    and a trailer whose startxref offset points inside the file. Returns the
+    reason the file was rejected, or None. Pages are only parsed at extraction.
+    """
+    if not _HEADER.search(head):
+        return "missing %PDF header"
+    matches = list(_STARTXREF.finditer(tail))
+    if not matches:
+        return "missing startxref/%%EOF trailer"
+    if int(matches[-1].group(1)) >= size:
+        return "startxref points past the end of the file"
+    return None
+
+
+def stream_to_disk(stream, path, max_bytes=MAX_UPLOAD_FILE_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Copy `stream` to `path` in chunks, hashing and keeping the head and tail
+    for the preflight in the same pass. Stops and deletes the partial file as
+    soon as `max_bytes` is exceeded. Returns (size, sha256, head, tail, error).
+    """
+    digest = hashlib.sha256()
+    head = b""
+    tail = b""
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+            if len(head) < PREFLIGHT_HEAD_BYTES:
+                head += chunk[:PREFLIGHT_HEAD_BYTES - len(head)]
+            tail = (tail + chunk)[-PREFLIGHT_TAIL_BYTES:]
+
+    if size > max_bytes:
+        os.remove(path)
+        return size, None, head, tail, f"larger than {max_bytes // (1024 * 1024)} MB"
+    return size, digest.hexdigest(), head, tail, None
+
+
+class UploadIngestor:
+    """
+    Write the parts of one upload request into `dest_dir`, enforcing the
+    per-file and per-batch size limits. Each part is read once: the copy to
+    disk, the content hash and the PDF preflight all come from the same pass.
+    """
+
+    def __init__(self, dest_dir, max_file_bytes=MAX_UPLOAD_FILE_BYTES, max_batch_bytes=MAX_UPLOAD_BATCH_BYTES):
+        self.dest_dir = dest_dir
+        self.max_file_bytes = max_file_bytes
+        self.max_batch_bytes = max_batch_bytes
+        self.total_bytes = 0
+
+    def ingest(self, stream, filename):
+        path = os.path.join(self.dest_dir, filename)
+        remaining = self.max_batch_bytes - self.total_bytes
+        if remaining <= 0:
+            return IngestedFile(filename, path, error="upload batch size limit reached")
+
+        limit = min(self.max_file_bytes, remaining)
+        size, content_hash, head, tail, error = stream_to_disk(stream, path, limit)
+        if error:
+            if limit < self.max_file_bytes:
+                error = "upload batch size limit reached"
+            return IngestedFile(filename, path, size, error=error)
+
+        error = preflight_pdf(head, tail, size)
+        if error:
+            os.remove(path)
+            return IngestedFile(filename, path, size, content_hash, error)
+
+        self.total_bytes += size
+        return IngestedFile(filename, path, size, content_hash)
@@ -0,0 +1,276 @@
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from .backends import INTERACTIVE_BACKEND, use_backend
+from .duplicates import is_skipped_duplicate
+from .output_writers import open_output_writer
+from .preprocessing import process_pdf
+
+# How long a finished job, with its per-file results, stays queryable before it is dropped from memory
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 3600))
+
+
+class Job:
+    """A bulk upload tracked from the moment it is queued until its workbook is written."""
+
+    def __init__(self, job_id, user_id, files, output_path, cleanup_dir=None, content_hashes=None):
+        self.id = job_id
+        self.user_id = user_id
+        self.files = list(files)
+        # SHA-256 of each file when it was computed at upload time, so it is not read again
+        self.content_hashes = list(content_hashes) if content_hashes else [None] * len(self.files)
+        self.output_path = output_path
+        self.cleanup_dir = cleanup_dir
+        self.status = "queued"
+        self.results = [None] * len(self.files)
+        self.processed_files = 0
+        # Latest status of each file and how many files reached each stage, for progress events
+        self.file_status = {}
+        self.stage_counts = {}
+        self._changed_files = []
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        # Rows are written in S_No order as soon as every earlier file has finished
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._next_row = 0
+
+    @property
+    def total_files(self):
+        return len(self.files)
+
+    @property
+    def duplicate_files(self):
+        """Files found to duplicate an earlier policy, with the record each duplicates."""
+        return [
+            {"file_name": result["file_name"], "duplicate_of": result["duplicate_of"]}
+            for result in self.results
+            if result and result.get("duplicate_of")
+        ]
+
+    @property
+    def output_file_name(self):
+        return os.path.basename(self.output_path)
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def record_progress(self, file_name, status):
+        with self._lock:
+            self.file_status[file_name] = status
+            self.stage_counts[status] = self.stage_counts.get(status, 0) + 1
+            if file_name not in self._changed_files:
+                self._changed_files.append(file_name)
+
+    def _snapshot(self, names):
+        return {
+            "job_id": self.id,
+            "job_status": self.status,
+            "processed_files": self.processed_files,
+            "total_files": self.total_files,
+            "stages": dict(self.stage_counts),
+            "files": [{"file_name": name, "status": self.file_status[name]} for name in names],
+        }
+
+    def progress_snapshot(self):
+        """Counts, stage totals and the files whose status changed since the previous snapshot."""
+        with self._lock:
+            changed, self._changed_files = self._changed_files, []
+            return self._snapshot(changed)
+
+    def full_snapshot(self):
+        """Counts, stage totals and every file's latest status; leaves the pending changes for progress_snapshot()."""
+        with self._lock:
+            return self._snapshot(list(self.file_status))
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "processed_files": self.processed_files,
+            "total_files": self.total_files,
+            "output_file": self.output_file_name if self.status == "completed" else None,
+            "error": self.error,
+            "duplicate_files": self.duplicate_files,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    """
+    Run bulk uploads in the background.
+    Every file of a job is handed to a shared worker pool as its own task, so a
+    large batch never holds an HTTP worker and several jobs can progress at once.
+    Rows are streamed into the output file in S_No order while the job runs,
+    and the last file to finish closes it and hands the records to `on_records`
+    (e.g. to store them in the database). `on_progress(job, file_name, status)`
+    hears about each file's stages ("Text Extracted", "Fields Extracted",
+    "Duplicate", "Processed"/"Skipped"/"Failed", "Written") and the job's final status.
+    Files skipped as duplicates (DUPLICATE_POLICIES=skip) get no output row.
+    `on_complete(job)` runs once a job has written its output successfully.
+    Finished jobs are forgotten `retention_seconds` after they finish.
+    """
+
+    def __init__(self, max_workers=4, on_progress=None, on_records=None, on_complete=None,
+                 retention_seconds=JOB_RETENTION_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self.retention_seconds = retention_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.on_progress = on_progress
+        self.on_records = on_records
+        self.on_complete = on_complete
+
+    def submit(self, files, output_path, user_id=None, cleanup_dir=None, content_hashes=None):
+        """Queue `files` for extraction and return the new Job immediately."""
+        job = Job(str(uuid.uuid4()), user_id, files, output_path, cleanup_dir, content_hashes)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job.id] = job
+
+        if not job.files:
+            self._finalize(job)
+            return job
+
+        for index in range(job.total_files):
+            self._executor.submit(self._process_file, job, index)
+        return job
+
+    def get(self, job_id):
+        """The job, or None when it is unknown or was forgotten after finishing."""
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def _evict_expired(self):
+        # Called with self._lock held
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def active_cleanup_dirs(self):
+        """Temp folders still in use by unfinished jobs."""
+        with self._lock:
+            return [job.cleanup_dir for job in self._jobs.values() if job.cleanup_dir and job.finished_at is None]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _notify(self, job, file_name, status):
+        job.record_progress(file_name, status)
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(job, file_name, status)
+        except Exception as e:
+            print(f"Error sending progress for job {job.id}: {e}")
+
+    def _process_file(self, job, index):
+        pdf_path = job.files[index]
+        file_name = os.path.basename(pdf_path)
+        with job._lock:
+            if job.status == "queued":
+                job.status = "running"
+
+        # A single-file upload is someone waiting on the page; send it to the low-latency backend
+        backend = INTERACTIVE_BACKEND if job.total_files == 1 else None
+        try:
+            with use_backend(backend):
+                structured_data = process_pdf(
+                    pdf_path, job.user_id, content_hash=job.content_hashes[index],
+                    on_stage=lambda stage: self._notify(job, file_name, stage),
+                )
+        except Exception as e:
+            print(f"Error processing {pdf_path} in job {job.id}: {e}")
+            structured_data = None
+
+        if is_skipped_duplicate(structured_data):
+            result = {"file_name": file_name, "status": "duplicate", "data": None}
+        elif structured_data:
+            structured_data["S_No"] = index + 1
+            structured_data["source_file"] = file_name
+            result = {"file_name": file_name, "status": "processed", "data": structured_data}
+        else:
+            result = {"file_name": file_name, "status": "failed", "data": None}
+        if structured_data and structured_data.get("DUPLICATE_OF"):
+            result["duplicate_of"] = structured_data["DUPLICATE_OF"]
+
+        with job._lock:
+            job.results[index] = result
+            job.processed_files += 1
+            is_last = job.processed_files == job.total_files
+
+        self._notify(job, file_name, {"processed": "Processed", "duplicate": "Skipped"}.get(result["status"], "Failed"))
+
+        try:
+            self._write_ready_rows(job)
+        except Exception as e:
+            print(f"Error writing output for job {job.id}: {e}")
+            job.error = job.error or str(e)
+
+        if is_last:
+            self._finalize(job)
+
+    def _write_ready_rows(self, job):
+        """Write every finished result whose predecessors have all been written."""
+        with job._write_lock:
+            while job._next_row < job.total_files:
+                with job._lock:
+                    result = job.results[job._next_row]
+                if result is None:
+                    return
+                if result["data"]:
+                    if job._writer is None:
+                        job._writer = open_output_writer(job.output_path)
+                    job._writer.write(result["data"])
+                    self._notify(job, result["file_name"], "Written")
+                job._next_row += 1
+
+    def _finalize(self, job):
+        """Close the consolidated output file and release the temp folder."""
+        try:
+            with job._write_lock:
+                writer, job._writer = job._writer, None
+            if writer is not None:
+                writer.close()
+
+            records = [result["data"] for result in job.results if result and result["data"]]
+            if records and self.on_records is not None:
+                try:
+                    self.on_records(job, records)
+                except Exception as e:
+                    print(f"Error saving records for job {job.id}: {e}")
+
+            if job.error is None and writer is not None and os.path.exists(job.output_path):
+                if self.on_complete is not None:
+                    try:
+                        self.on_complete(job)
+                    except Exception as e:
+                        print(f"Error handling completed job {job.id}: {e}")
+                job.status = "completed"
+            else:
+                job.status = "failed"
+                if job.error is None and job.results and all(result and result["status"] == "duplicate" for result in job.results):
+                    job.error = "Every file duplicates a policy already processed."
+                job.error = job.error or "No valid data extracted from PDFs."
+        except Exception as e:
+            print(f"ERROR finalizing job {job.id}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            if job.cleanup_dir:
+                shutil.rmtree(job.cleanup_dir, ignore_errors=True)
+            job.finished_at = datetime.utcnow()
+            job._done.set()
+
+        self._notify(job, job.output_file_name, "Processed Successfully" if job.status == "completed" else "Processing Failed")
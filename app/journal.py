@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+# Keep a journal next to each bulk output so an interrupted batch can be resumed
+BULK_JOURNAL = os.getenv("BULK_JOURNAL", "1") == "1"
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+
+def journal_path_for(output_path):
+    return output_path + JOURNAL_SUFFIX
+
+
+class BatchJournal:
+    """
+    Append-only JSONL record of one bulk batch. The first line describes the
+    batch (input folder, output path, user); then one line per finished file
+    with its record, one line per batch of records handed to the database, and
+    a final line once the output is complete. Every line is flushed and
+    fsynced before the call returns, so a crash loses at most the file in flight.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.batch = None
+        self.files = {}  # file_name -> {"index", "file_name", "status", "data"}
+        self.saved = set()  # indexes of records already handed to save_records
+        self.finished = False
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, path, input_folder, output_path, user_id, file_names, existing_rows=0):
+        """
+        Begin a new journal at `path`, replacing any previous one. `existing_rows`
+        is how many rows the output already held from earlier batches.
+        """
+        journal = cls(path)
+        journal._file = open(path, "w", encoding="utf-8")
+        journal.batch = {
+            "type": "batch",
+            "input_folder": input_folder,
+            "output_path": output_path,
+            "user_id": user_id,
+            "files": list(file_names),
+            "output_existed": os.path.exists(output_path),
+            "existing_rows": existing_rows,
+            "started_at": datetime.utcnow().isoformat(),
+        }
+        journal._append(journal.batch)
+        return journal
+
+    @classmethod
+    def open(cls, path):
+        """Load an existing journal and reopen it for appending."""
+        journal = cls(path)
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Only the last line can be torn, by a crash in the middle of a write
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                journal._apply(entry)
+                valid_bytes += len(line)
+        if journal.batch is None:
+            raise ValueError(f"{path} is not a batch journal")
+        # Cut off a torn line so new entries start on a line of their own
+        if os.path.getsize(path) > valid_bytes:
+            os.truncate(path, valid_bytes)
+        journal._file = open(path, "a", encoding="utf-8")
+        return journal
+
+    def _apply(self, entry):
+        kind = entry.get("type")
+        if kind == "batch":
+            self.batch = entry
+        elif kind == "file":
+            self.files[entry["file_name"]] = entry
+        elif kind == "saved":
+            self.saved.update(entry["indexes"])
+        elif kind == "finished":
+            self.finished = True
+
+    def _append(self, entry):
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(entry)
+
+    def record_file(self, index, file_name, data):
+        """Record one file's outcome; `data` is None when it failed."""
+        self._append({
+            "type": "file",
+            "index": index,
+            "file_name": file_name,
+            "status": "processed" if data else "failed",
+            "data": data,
+        })
+
+    def record_saved(self, records):
+        self._append({"type": "saved", "indexes": [record["S_No"] for record in records]})
+
+    def record_finished(self):
+        self._append({"type": "finished", "finished_at": datetime.utcnow().isoformat()})
+
+    def completed(self):
+        """Files that need no more work, by name. Failed files are tried again on resume."""
+        return {name: entry for name, entry in self.files.items() if entry["status"] == "processed"}
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,123 @@
+from collections import deque
+
+# Dash variants printed in schedules ("Total OD Premium – A"), matched as a plain hyphen
+_DASHES = str.maketrans({"–": "-", "—": "-", "‐": "-", "‑": "-", "−": "-"})
+
+
+def _fold(char):
+    """Normalized form of one character: '' for spacing, lowercase otherwise."""
+    if char.isspace() or char == "_":
+        return ""
+    return char.translate(_DASHES).lower()
+
+
+def normalize_label(label):
+    """
+    Key a label is matched on: lowercase, with whitespace and underscores
+    dropped and dashes unified, so "Net Own Damage Premium(a)", "NET OWN
+    DAMAGE PREMIUM (A)" and "Net_Own_Damage_Premium(A)" are one label.
+    """
+    return "".join(_fold(char) for char in str(label))
+
+
+def _is_letter(char):
+    return char.isascii() and char.isalpha()
+
+
+class LabelIndex:
+    """
+    Known labels compiled once into an exact lookup on normalized keys and
+    an Aho-Corasick automaton over the same keys. get() maps a key such as an
+    LLM response field to its value; scan() finds every label in a text in one
+    pass. Labels that normalize alike keep the value given last.
+    """
+
+    def __init__(self, labels):
+        self.fields = {}
+        for label, field in labels.items():
+            key = normalize_label(label)
+            if key:
+                self.fields[key] = field
+
+        # Node 0 is the root; each node has its transitions, failure link and
+        # the keys ending there (its own and those reached via failure links)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for key in self.fields:
+            node = 0
+            for char in key:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = child
+            self._output[node].append(key)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __contains__(self, label):
+        return normalize_label(label) in self.fields
+
+    def get(self, label, default=None):
+        return self.fields.get(normalize_label(label), default)
+
+    def matches(self, text):
+        """
+        Every occurrence of every label in `text` as (start, end, key), where a
+        label neither starts right after nor ends right before an ASCII letter.
+        Overlapping occurrences are all returned.
+        """
+        found = []
+        goto, fail, output = self._goto, self._fail, self._output
+        positions = []  # Offset in `text` of each normalized character fed to the automaton
+        node = 0
+        for index, char in enumerate(text):
+            for folded in _fold(char):
+                positions.append(index)
+                while node and folded not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(folded, 0)
+                for key in output[node]:
+                    start = positions[len(positions) - len(key)]
+                    end = index + 1
+                    if start and _is_letter(text[start - 1]):
+                        continue
+                    if end < len(text) and _is_letter(text[end]):
+                        continue
+                    found.append((start, end, key))
+        return found
+
+    def scan(self, text):
+        """
+        Labels in `text` as (start, end, field), in document order and never
+        overlapping: the leftmost label wins, and of those starting at the same
+        place the longest, so "Total Premium" is found rather than "Total".
+        """
+        return [(start, end, self.fields[key]) for start, end, key in select_longest(self.matches(text))]
+
+
+def select_longest(matches):
+    """Leftmost-longest, non-overlapping subset of (start, end, ...) matches, in order."""
+    selected = []
+    last_end = 0
+    for match in sorted(matches, key=lambda match: (match[0], -match[1])):
+        if match[0] >= last_end:
+            selected.append(match)
+            last_end = match[1]
+    return selected
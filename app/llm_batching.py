@@ -0,0 +1,118 @@
+import os
+import threading
+from concurrent.futures import Future
+
+from .field_extraction import LLM_MODEL, build_prompt, extract_batch_with_ai, extract_with_ai
+from .utils import count_tokens
+
+# Prompt tokens one batched request may carry, and how many documents it may hold
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", 8000))
+LLM_BATCH_MAX_DOCUMENTS = int(os.getenv("LLM_BATCH_MAX_DOCUMENTS", 6))
+# How long the first queued document waits for others before its batch is sent anyway
+LLM_BATCH_WAIT_SECONDS = float(os.getenv("LLM_BATCH_WAIT_SECONDS", 2.0))
+
+
+class LLMBatcher:
+    """
+    Pack documents that arrive from concurrent workers into shared LLM requests.
+    A batch is sent as soon as adding another document would exceed
+    `token_budget` or `max_documents`, or when its first document has waited
+    `wait_seconds`. Documents too large to share a request go out on their own.
+    """
+
+    def __init__(self, token_budget=LLM_BATCH_TOKEN_BUDGET, max_documents=LLM_BATCH_MAX_DOCUMENTS,
+                 wait_seconds=LLM_BATCH_WAIT_SECONDS):
+        self.token_budget = token_budget
+        self.max_documents = max_documents
+        self.wait_seconds = wait_seconds
+        self._pending = []  # (document_id, raw_text, fields, tokens, future)
+        self._pending_tokens = 0
+        self._next_id = 0
+        self._timer = None
+        self._lock = threading.Lock()
+        # The fixed schema/rule part of the prompt is paid once per batch, not per document
+        self._overhead = count_tokens(build_prompt(""), LLM_MODEL)
+
+    def extract(self, raw_text, fields=None):
+        """Extract one document, possibly together with others; blocks until its record is ready."""
+        tokens = count_tokens(raw_text, LLM_MODEL)
+        if self.max_documents <= 1 or self._overhead + tokens > self.token_budget:
+            return extract_with_ai(raw_text, fields)
+
+        future = Future()
+        ready = []
+        with self._lock:
+            if self._pending and self._overhead + self._pending_tokens + tokens > self.token_budget:
+                ready.append(self._take_pending())
+
+            self._next_id += 1
+            self._pending.append((f"doc{self._next_id}", raw_text, fields, tokens, future))
+            self._pending_tokens += tokens
+
+            if len(self._pending) >= self.max_documents:
+                ready.append(self._take_pending())
+            elif len(self._pending) == 1:
+                self._timer = threading.Timer(self.wait_seconds, self._flush_on_timeout)
+                self._timer.daemon = True
+                self._timer.start()
+
+        for batch in ready:
+            self._run(batch)
+        return future.result()
+
+    def flush(self):
+        """Send whatever is queued right away."""
+        with self._lock:
+            batch = self._take_pending()
+        self._run(batch)
+
+    def _flush_on_timeout(self):
+        with self._lock:
+            if threading.current_thread() is not self._timer:
+                return  # The batch this timer belonged to has already gone out
+            batch = self._take_pending()
+        self._run(batch)
+
+    def _take_pending(self):
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _run(self, batch):
+        if not batch:
+            return
+        try:
+            if len(batch) == 1:
+                _, raw_text, fields, _, future = batch[0]
+                future.set_result(extract_with_ai(raw_text, fields))
+                return
+
+            # One field list for the whole request: everything any document still needs
+            requested = set()
+            for _, _, fields, _, _ in batch:
+                requested.update(fields if fields is not None else [None])
+            fields = None if None in requested else sorted(requested)
+
+            results = extract_batch_with_ai([(document_id, raw_text) for document_id, raw_text, _, _, _ in batch], fields)
+            for document_id, _, _, _, future in batch:
+                future.set_result(results[document_id])
+        except Exception as e:
+            print(f"Error in batched extraction: {e}")
+            for _, _, _, _, future in batch:
+                if not future.done():
+                    future.set_result({"error": str(e)})
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_llm_batcher():
+    """The process-wide batcher, created on first use."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = LLMBatcher()
+        return _batcher
@@ -1,5 +1,9 @@
 import re
 
+# Label alternatives used by the regex extractors below
+POLICY_NUMBER_LABELS = ["Policy(?:Ref)?(?:\\s*No\\.?)?", "Policy Numer", "Policy cum Certificate Number", "Policy/Certificate No"]
+CUSTOMER_NAME_LABELS = ["Insured", "Customer Name", "Proposer Name"]
+
 def refine_extracted_value(key, value):
     """Refine extracted values based on key-specific logic."""
     if key == "Policy Number":
@@ -16,8 +20,8 @@ def normalize_and_map_text(raw_text, key_value_data):
 
     # Define regex patterns for fields
     fields = {
-        "Policy Number": r"(Policy(?:Ref)?(?:\s*No\.?)?|Policy Numer|Policy cum Certificate Number|Policy/Certificate No)\s*[:\-]?\s*(.+?)(?=\s+[A-Za-z]*:|$)",
-        "Customer Name": r"(Insured|Customer Name|Proposer Name)\s*[:\-]?\s*(.+?)(?=\s+[A-Za-z]*:|$)",
+        "Policy Number": r"(" + "|".join(POLICY_NUMBER_LABELS) + r")\s*[:\-]?\s*(.+?)(?=\s+[A-Za-z]*:|$)",
+        "Customer Name": r"(" + "|".join(CUSTOMER_NAME_LABELS) + r")\s*[:\-]?\s*(.+?)(?=\s+[A-Za-z]*:|$)",
     }
 
     # Extract with regex
@@ -0,0 +1,248 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans from sub-millisecond mapping up to multi-minute OCR/LLM waits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down (sizes, queue lengths), optionally split by labels."""
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout (_bucket, _sum, _count)."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        return series[2] if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - began, **labels)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(line for metric in metrics for line in metric.collect()) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram(
+    "pdf_stage_seconds", "Time spent in each pipeline stage per document.", ["stage"]
+)
+DOCUMENT_SECONDS = Histogram(
+    "pdf_document_seconds", "End-to-end processing time per document.", ["outcome"]
+)
+DOCUMENTS = Counter("pdf_documents_total", "Documents processed, by outcome.", ["outcome"])
+PAGES = Counter("pdf_pages_total", "PDF pages whose text was extracted.")
+PAGES_SKIPPED = Counter("pdf_pages_skipped_total", "PDF pages left unparsed by lazy extraction.")
+OCR_PAGES = Counter("ocr_pages_total", "Image-only pages given OCR text, by source.", ["result"])
+OCR_PAGE_SECONDS = Histogram("ocr_page_seconds", "OCR time per page, rendering included.")
+CACHE_LOOKUPS = Counter("extraction_cache_lookups_total", "Extraction cache lookups.", ["kind", "result"])
+LLM_REQUESTS = Counter("llm_requests_total", "LLM requests, by outcome.", ["outcome"])
+LLM_RETRIES = Counter("llm_retries_total", "LLM calls retried after a retryable error.")
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens sent to and received from the LLM.", ["kind"])
+DISK_BYTES = Gauge("storage_disk_bytes", "Bytes on disk, by storage area.", ["area"])
+DISK_FILES = Gauge("storage_files", "Files on disk, by storage area.", ["area"])
+SWEPT = Counter("storage_swept_total", "Items removed by the retention sweeper, by kind.", ["kind"])
+DUPLICATE_CHECKS = Counter("duplicate_checks_total", "Records checked against the duplicate registry, by outcome.", ["result"])
+DATE_PARSES = Counter("date_parses_total", "Dates normalized, by whether the format came from the cache.", ["result"])
+
+
+class DocumentTiming:
+    """Stage timings and counts for one document, logged as a single JSON line when it finishes."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.counts = {}
+        self.began = time.perf_counter()
+
+    def add_stage(self, stage, seconds):
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds, 4)
+
+    def add_count(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+
+_current = threading.local()
+
+
+def current_document():
+    return getattr(_current, "document", None)
+
+
+@contextmanager
+def stage_span(stage):
+    """Time a pipeline stage into the stage histogram and the current document's timing record."""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - began
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        document = current_document()
+        if document is not None:
+            document.add_stage(stage, seconds)
+
+
+def count(name, amount=1):
+    """Add to a per-document count (pages, tokens, retries...) of the current document's record."""
+    document = current_document()
+    if document is not None:
+        document.add_count(name, amount)
+
+
+@contextmanager
+def document_span(name):
+    """
+    Track one document on this thread. Stage spans and counts recorded inside
+    land in its timing record, which is logged as JSON on exit. Set
+    `.outcome` on the yielded record to classify it (defaults to "processed").
+    """
+    previous = current_document()
+    document = DocumentTiming(name)
+    document.outcome = "processed"
+    _current.document = document
+    try:
+        yield document
+    except Exception:
+        document.outcome = "failed"
+        raise
+    finally:
+        _current.document = previous
+        total = time.perf_counter() - document.began
+        DOCUMENT_SECONDS.observe(total, outcome=document.outcome)
+        DOCUMENTS.inc(outcome=document.outcome)
+        logger.info(json.dumps({
+            "event": "document_timing",
+            "document": document.name,
+            "outcome": document.outcome,
+            "total_seconds": round(total, 4),
+            "stages": document.stages,
+            "counts": document.counts,
+        }))
+
+
+def render_metrics():
+    return REGISTRY.render()
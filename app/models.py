@@ -1,6 +1,12 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import ForeignKey, event
+from sqlalchemy.orm import Session, relationship
+from .duplicates import confirms_duplicate, policy_keys, policy_period
+from .utils import clean_numeric_field
+
+# Share of the total premium booked as commission
+COMMISSION_RATE = 0.4
 
 db = SQLAlchemy()
 
@@ -37,15 +43,22 @@ class User(db.Model):
 class Upload(db.Model):
     __tablename__ = 'upload'  # Explicit table name
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     filename = db.Column(db.String(255), nullable=False)
     total_premium = db.Column(db.Float, nullable=True)
     net_premium = db.Column(db.Float, nullable=True)
     commission = db.Column(db.Float, nullable=True)
-    upload_date = db.Column(db.DateTime, default=db.func.current_timestamp())
+    upload_date = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+
+    __table_args__ = (
+        db.Index('ix_upload_user_id_upload_date', 'user_id', 'upload_date'),
+    )
+
+    # Extracted policy data behind this upload
+    policy_records = relationship('PolicyRecord', backref='upload', lazy=True, cascade="all, delete-orphan")
 
     # Commission and Net Premium Calculations
-    def calculate_commission(self, rate=0.4):
+    def calculate_commission(self, rate=COMMISSION_RATE):
         """
         Calculate commission based on the total premium.
         Default rate is 40% (0.4).
@@ -73,4 +86,332 @@ class Upload(db.Model):
         self.calculate_commission()  # Ensure commission is calculated
         self.calculate_net_premium()  # Ensure net premium is calculated
         db.session.add(self)
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+
+
+# Extracted Policy Model
+class PolicyRecord(db.Model):
+    """One extracted policy schedule; columns follow the extraction schema, lower-cased."""
+    __tablename__ = 'policy_record'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    upload_id = db.Column(db.Integer, db.ForeignKey('upload.id', ondelete='CASCADE'), nullable=False, index=True)
+    source_file = db.Column(db.String(255), nullable=True)
+    s_no = db.Column(db.Integer, nullable=True)
+    year = db.Column(db.String(20), nullable=True)
+    month = db.Column(db.String(20), nullable=True)
+    date = db.Column(db.String(20), nullable=True)
+    insurance_company_name = db.Column(db.String(255), nullable=True)
+    broker_name = db.Column(db.String(255), nullable=True)
+    imd_code = db.Column(db.String(100), nullable=True)
+    lob = db.Column(db.String(100), nullable=True)
+    package_liability = db.Column(db.String(100), nullable=True)
+    fuel_type = db.Column(db.String(50), nullable=True)
+    ren_roll_new_used = db.Column(db.String(50), nullable=True)
+    customer_name = db.Column(db.String(255), nullable=True)
+    mob_no = db.Column(db.String(50), nullable=True)
+    location = db.Column(db.String(255), nullable=True)
+    reg_number = db.Column(db.String(50), nullable=True)
+    vehicle_make = db.Column(db.String(100), nullable=True)
+    vehicle_model = db.Column(db.String(255), nullable=True)
+    cc_gvw = db.Column(db.String(50), nullable=True)
+    bike_scooter = db.Column(db.String(50), nullable=True)
+    year_of_manufacture = db.Column(db.String(20), nullable=True)
+    engine_number = db.Column(db.String(100), nullable=True)
+    chasis_number = db.Column(db.String(100), nullable=True)
+    policy_no = db.Column(db.String(100), nullable=True, index=True)
+    idv_sum_insured = db.Column(db.Float, nullable=True)
+    ncb = db.Column(db.String(20), nullable=True)
+    risk_start_date = db.Column(db.String(20), nullable=True)
+    od_expire_date = db.Column(db.String(20), nullable=True)
+    renewal_date = db.Column(db.String(20), nullable=True)
+    od_premium = db.Column(db.Float, nullable=True)
+    tp_only_premium = db.Column(db.Float, nullable=True)
+    net_premium = db.Column(db.Float, nullable=True)
+    total_premium = db.Column(db.Float, nullable=True)
+    policy_issue_day = db.Column(db.String(20), nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+
+# Normalized policy, chassis and engine numbers of stored policies (see duplicates.py)
+class PolicyKey(db.Model):
+    __tablename__ = 'policy_key'
+    id = db.Column(db.Integer, primary_key=True)
+    policy_record_id = db.Column(db.Integer, db.ForeignKey('policy_record.id', ondelete='CASCADE'), nullable=False, index=True)
+    field = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(100), nullable=False)
+    __table_args__ = (db.Index('ix_policy_key_field_value', 'field', 'value'),)
+
+
+POLICY_NUMERIC_FIELDS = {"IDV_SUM_INSURED", "OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM"}
+_POLICY_TEXT_LIMIT = 255
+
+
+def _policy_value(field, value, length=_POLICY_TEXT_LIMIT):
+    if value is None or value == "N/A" or value == "":
+        return None
+    if field == "S_No":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if field in POLICY_NUMERIC_FIELDS:
+        return clean_numeric_field(value)
+    return str(value)[:length]
+
+
+def policy_record_values(record):
+    """Column values for one extracted record; "N/A" is stored as NULL and premiums as numbers."""
+    values = {}
+    for field, value in record.items():
+        column = field.lower()
+        if column in PolicyRecord.__table__.c and column not in ('id', 'user_id', 'upload_id', 'created_at'):
+            length = getattr(PolicyRecord.__table__.c[column].type, 'length', None) or _POLICY_TEXT_LIMIT
+            values[column] = _policy_value(field, value, length)
+    return values
+
+
+def save_policy_records(records, user_id, commission_rate=COMMISSION_RATE):
+    """
+    Store extracted records as one Upload and one PolicyRecord each.
+    All rows go out as two bulk INSERTs and a single commit; commission and net
+    premium are worked out here for the whole batch instead of per object.
+    Bulk inserts skip the flush hook, so the rollups are updated directly.
+    Each record's identifiers go into policy_key; records flagged as
+    duplicates (DUPLICATE_OF) are not stored, so no policy counts twice.
+    Returns the number of records saved.
+    """
+    records = [record for record in records if record and not record.get('DUPLICATE_OF')]
+    if not records:
+        return 0
+
+    now = datetime.utcnow()
+    policy_rows = [policy_record_values(record) for record in records]
+    upload_rows = []
+    for record, policy_row in zip(records, policy_rows):
+        total_premium = policy_row.get('total_premium')
+        commission = total_premium * commission_rate if total_premium is not None else 0.0
+        upload_rows.append({
+            'user_id': user_id,
+            'filename': (record.get('source_file') or 'unknown.pdf')[:_POLICY_TEXT_LIMIT],
+            'total_premium': total_premium,
+            'commission': commission,
+            'net_premium': total_premium - commission if total_premium is not None else 0.0,
+            'upload_date': now,
+        })
+
+    try:
+        upload_ids = db.session.scalars(
+            db.insert(Upload).returning(Upload.id, sort_by_parameter_order=True), upload_rows
+        ).all()
+        for upload_id, policy_row in zip(upload_ids, policy_rows):
+            policy_row.update(user_id=user_id, upload_id=upload_id)
+        policy_ids = db.session.scalars(
+            db.insert(PolicyRecord).returning(PolicyRecord.id, sort_by_parameter_order=True), policy_rows
+        ).all()
+        key_rows = [
+            {'policy_record_id': policy_id, 'field': field, 'value': value[:100]}
+            for policy_id, record in zip(policy_ids, records)
+            for field, value in policy_keys(record)
+        ]
+        if key_rows:
+            db.session.execute(db.insert(PolicyKey), key_rows)
+
+        user_deltas, daily_deltas = {}, {}
+        for row in upload_rows:
+            user_key, day, values = _contribution(row['user_id'], row['upload_date'], row['total_premium'], row['commission'])
+            _add(user_deltas, user_key, values, 1)
+            _add(daily_deltas, day, values, 1)
+        connection = db.session.connection()
+        _apply_deltas(connection, UserPremiumRollup, 'user_id', user_deltas)
+        _apply_deltas(connection, DailyPremiumRollup, 'day', daily_deltas)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(records)
+
+
+def find_policy_duplicate(keys, period=(None, None)):
+    """
+    The earliest stored policy holding one of `keys` ((field, normalized
+    value) pairs) as (field, value, description), or None. A chassis or
+    engine number only counts for a policy of the same `period` (see
+    duplicates.policy_period); other years' policies of the vehicle are renewals.
+    """
+    conditions = [db.and_(PolicyKey.field == field, PolicyKey.value == value) for field, value in keys]
+    rows = db.session.execute(
+        db.select(PolicyKey.field, PolicyKey.value, PolicyRecord.source_file, PolicyRecord.created_at,
+                  PolicyRecord.risk_start_date, PolicyRecord.od_expire_date)
+        .join(PolicyRecord, PolicyRecord.id == PolicyKey.policy_record_id)
+        .where(db.or_(*conditions))
+        .order_by(PolicyKey.id)
+    )
+    for row in rows:
+        stored_period = policy_period({"RISK_START_DATE": row.risk_start_date, "OD_EXPIRE_DATE": row.od_expire_date})
+        if confirms_duplicate(row.field, period, stored_period):
+            stored = f" stored {row.created_at:%Y-%m-%d}" if row.created_at else ""
+            return row.field, row.value, f"{row.source_file or 'policy'}{stored}"
+    return None
+
+
+def iter_policy_keys(after_id=0):
+    """Stored keys as (id, field, value) past `after_id`, in id order and streamed, for the duplicate filter."""
+    rows = db.session.execute(
+        db.select(PolicyKey.id, PolicyKey.field, PolicyKey.value)
+        .where(PolicyKey.id > after_id)
+        .order_by(PolicyKey.id)
+        .execution_options(yield_per=10000)
+    )
+    for key_id, field, value in rows:
+        yield key_id, field, value
+
+
+# Dashboard rollups, kept in step with Upload by the flush hook below
+class UserPremiumRollup(db.Model):
+    __tablename__ = 'user_premium_rollup'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    total_premium = db.Column(db.Float, nullable=False, default=0.0)
+    total_commission = db.Column(db.Float, nullable=False, default=0.0)
+    net_premium = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class DailyPremiumRollup(db.Model):
+    __tablename__ = 'daily_premium_rollup'
+    day = db.Column(db.Date, primary_key=True)
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    total_premium = db.Column(db.Float, nullable=False, default=0.0)
+    total_commission = db.Column(db.Float, nullable=False, default=0.0)
+    net_premium = db.Column(db.Float, nullable=False, default=0.0)
+
+
+_ROLLUP_COLUMNS = ('uploads', 'total_premium', 'total_commission', 'net_premium')
+
+
+def _contribution(user_id, upload_date, total_premium, commission):
+    """What one upload adds to its user and day rollups; nulls count as nothing, as in SUM()."""
+    values = {
+        'uploads': 1,
+        'total_premium': total_premium or 0.0,
+        'total_commission': commission or 0.0,
+        # Matches SUM(total_premium - commission), which skips rows where either is null
+        'net_premium': total_premium - commission if total_premium is not None and commission is not None else 0.0,
+    }
+    return user_id, upload_date.date() if upload_date else None, values
+
+
+def _stored_values(session, upload):
+    """The upload's user/date/premium as currently stored, before the pending changes are flushed."""
+    table = Upload.__table__
+    row = session.connection().execute(
+        db.select(table.c.user_id, table.c.upload_date, table.c.total_premium, table.c.commission)
+        .where(table.c.id == upload.id)
+    ).first()
+    return _contribution(*row) if row else None
+
+
+def _add(deltas, key, values, sign):
+    totals = deltas.setdefault(key, dict.fromkeys(_ROLLUP_COLUMNS, 0))
+    for column in _ROLLUP_COLUMNS:
+        totals[column] += sign * values[column]
+
+
+def _apply_deltas(connection, model, key_column, deltas):
+    table = model.__table__
+    for key, values in deltas.items():
+        if key is None or not any(values.values()):
+            continue
+        result = connection.execute(
+            table.update()
+            .where(table.c[key_column] == key)
+            .values({column: table.c[column] + values[column] for column in _ROLLUP_COLUMNS})
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values({key_column: key, **values}))
+
+
+@event.listens_for(Session, 'before_flush')
+def update_premium_rollups(session, flush_context, instances):
+    """Apply Upload inserts, updates and deletes to the rollup tables in the same transaction."""
+    user_deltas, daily_deltas = {}, {}
+
+    for upload in session.new:
+        if isinstance(upload, Upload):
+            # Set the date here rather than in SQL so the daily rollup knows it before the insert
+            if upload.upload_date is None:
+                upload.upload_date = datetime.utcnow()
+            user_id, day, values = _contribution(upload.user_id, upload.upload_date, upload.total_premium, upload.commission)
+            _add(user_deltas, user_id, values, 1)
+            _add(daily_deltas, day, values, 1)
+
+    changed = [upload for upload in session.dirty if isinstance(upload, Upload) and session.is_modified(upload)]
+    removed = [upload for upload in session.deleted if isinstance(upload, Upload)]
+    for upload in changed + removed:
+        stored = _stored_values(session, upload)
+        if stored:
+            user_id, day, values = stored
+            _add(user_deltas, user_id, values, -1)
+            _add(daily_deltas, day, values, -1)
+    for upload in changed:
+        user_id, day, values = _contribution(upload.user_id, upload.upload_date, upload.total_premium, upload.commission)
+        _add(user_deltas, user_id, values, 1)
+        _add(daily_deltas, day, values, 1)
+
+    if user_deltas or daily_deltas:
+        connection = session.connection()
+        _apply_deltas(connection, UserPremiumRollup, 'user_id', user_deltas)
+        _apply_deltas(connection, DailyPremiumRollup, 'day', daily_deltas)
+
+
+def rebuild_premium_rollups():
+    """Recompute both rollup tables from scratch with one GROUP BY over Upload each."""
+    net = db.func.sum(Upload.total_premium - Upload.commission)
+    db.session.query(UserPremiumRollup).delete()
+    db.session.query(DailyPremiumRollup).delete()
+
+    per_user = db.session.query(
+        Upload.user_id,
+        db.func.count(Upload.id),
+        db.func.sum(Upload.total_premium),
+        db.func.sum(Upload.commission),
+        net,
+    ).group_by(Upload.user_id).all()
+    per_day = db.session.query(
+        db.func.date(Upload.upload_date),
+        db.func.count(Upload.id),
+        db.func.sum(Upload.total_premium),
+        db.func.sum(Upload.commission),
+        net,
+    ).group_by(db.func.date(Upload.upload_date)).all()
+
+    for user_id, uploads, total_premium, commission, net_premium in per_user:
+        db.session.execute(UserPremiumRollup.__table__.insert().values(
+            user_id=user_id, uploads=uploads, total_premium=total_premium or 0.0,
+            total_commission=commission or 0.0, net_premium=net_premium or 0.0,
+        ))
+    for day, uploads, total_premium, commission, net_premium in per_day:
+        if day is None:
+            continue
+        db.session.execute(DailyPremiumRollup.__table__.insert().values(
+            day=datetime.strptime(str(day), '%Y-%m-%d').date() if isinstance(day, str) else day,
+            uploads=uploads, total_premium=total_premium or 0.0,
+            total_commission=commission or 0.0, net_premium=net_premium or 0.0,
+        ))
+    db.session.commit()
+    return len(per_user), len(per_day)
+
+
+
+# Output files produced for users (see artifacts.py)
+class OutputArtifact(db.Model):
+    __tablename__ = 'output_artifact'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    job_id = db.Column(db.String(36), nullable=True, index=True)
+    filename = db.Column(db.String(255), nullable=False, unique=True)
+    size = db.Column(db.Integer, nullable=False)
+    etag = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from pikepdf import Array, Pdf
+
+from . import metrics
+
+try:
+    import pytesseract
+except ImportError:  # OCR is optional; scanned pages then stay empty
+    pytesseract = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# OCR pages that have no text layer but carry images (scans)
+OCR_ENABLED = os.getenv("OCR", "1") == "1"
+# Tesseract is CPU-bound; keep it from starving text extraction and the web workers
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", 120))
+# Part of every page hash, so changing the OCR settings re-recognizes cached pages
+OCR_VERSION = f"tesseract:{OCR_LANG}:{OCR_DPI}"
+
+
+def ocr_available():
+    """Whether OCR is enabled and both pytesseract and the tesseract binary are installed."""
+    if not OCR_ENABLED or pytesseract is None or pdfium is None:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+def _stream_bytes(obj):
+    streams = list(obj) if isinstance(obj, Array) else [obj]
+    return [stream.read_raw_bytes() for stream in streams if stream is not None]
+
+
+def page_hash(page):
+    """
+    SHA-256 of a pikepdf page's content streams and image data, plus the OCR
+    settings: the same scanned page hashes the same in any PDF it appears in.
+    """
+    digest = hashlib.sha256(OCR_VERSION.encode())
+    for data in _stream_bytes(page.obj.get("/Contents")):
+        digest.update(data)
+    images = page.get_images()
+    for name in sorted(images):
+        digest.update(str(name).encode())
+        digest.update(images[name].read_raw_bytes())
+    return digest.hexdigest()
+
+
+def image_only_pages(pdf_path, pages):
+    """
+    Page numbers, among `pages` ((page_number, text, ...) tuples), with no text
+    layer but at least one image, mapped to their page hash. Pages with text
+    are never returned.
+    """
+    empty = [page[0] for page in pages if not page[1].strip()]
+    if not empty:
+        return {}
+    found = {}
+    with Pdf.open(pdf_path) as pdf:
+        for page_number in empty:
+            page = pdf.pages[page_number - 1]
+            if len(page.get_images()):
+                found[page_number] = page_hash(page)
+    return found
+
+
+def ocr_page(pdf_path, page_number, dpi=OCR_DPI, lang=OCR_LANG):
+    """Render one page and run tesseract on it; runs inside a worker process. Returns (text, seconds)."""
+    began = time.perf_counter()
+    document = pdfium.PdfDocument(pdf_path)
+    try:
+        page = document[page_number - 1]
+        image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+        page.close()
+    finally:
+        document.close()
+    text = pytesseract.image_to_string(image, lang=lang)
+    return text, time.perf_counter() - began
+
+
+class OCRPool:
+    """
+    A bounded pool of worker processes for OCR. A page that runs past
+    `timeout` comes back empty. Its worker is killed and replaced once no
+    other document still has pages on the pool, so one document's timeout
+    never throws away another's pages in flight.
+    """
+
+    def __init__(self, max_workers=OCR_WORKERS, timeout=OCR_PAGE_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._callers = 0  # ocr() calls with pages on the current executor
+        self._stuck = False  # A page timed out; recycle once the callers are done
+        self._lock = threading.Lock()
+
+    def _acquire_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._callers = 0
+                self._stuck = False
+            self._callers += 1
+            return self._executor
+
+    def _release_executor(self, executor, timed_out):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._callers -= 1
+            self._stuck = self._stuck or timed_out
+            if not self._stuck or self._callers:
+                return
+            self._executor = None
+        print("Recycling OCR workers after a timeout")
+        self._recycle(executor)
+
+    @staticmethod
+    def _recycle(executor):
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def ocr(self, pdf_path, page_numbers):
+        """OCR several pages of one PDF in parallel; returns {page_number: (text, seconds)}."""
+        executor = self._acquire_executor()
+        pending = ()
+        try:
+            futures = {executor.submit(ocr_page, pdf_path, page_number): page_number for page_number in page_numbers}
+            done, pending = wait(futures, timeout=self.timeout * max(1, -(-len(futures) // self.max_workers)))
+            results = {}
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"Error running OCR on page {futures[future]} of {pdf_path}: {e}")
+            if pending:
+                print(f"Warning: OCR timed out for {len(pending)} pages of {pdf_path}")
+                for future in pending:
+                    future.cancel()
+            return results
+        finally:
+            self._release_executor(executor, bool(pending))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """The process-wide OCR pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRPool()
+        return _pool
+
+
+def ocr_scanned_pages(pdf_path, pages, cache=None, pool=None):
+    """
+    Replace the text of image-only pages in `pages` ((page_number, text,
+    seconds) tuples) with OCR text. Pages already recognized are served from
+    `cache` by page hash; the rest go to the OCR pool. Returns (pages in the
+    same order, complete); `complete` is False when a scanned page could not
+    be recognized (timeout or error), so the text is not cached as final.
+    """
+    if not ocr_available():
+        return pages, True
+    try:
+        scanned = image_only_pages(pdf_path, pages)
+    except Exception as e:
+        print(f"Error looking for scanned pages in {pdf_path}: {e}")
+        return pages, False
+    if not scanned:
+        return pages, True
+
+    texts = {}
+    for page_number, digest in scanned.items():
+        text = cache.get_ocr(digest) if cache else None
+        if text is not None:
+            metrics.OCR_PAGES.inc(result="cache_hit")
+            texts[page_number] = text
+
+    to_ocr = [page_number for page_number in scanned if page_number not in texts]
+    if to_ocr:
+        with metrics.stage_span("ocr"):
+            results = (pool or get_ocr_pool()).ocr(pdf_path, to_ocr)
+        for page_number, (text, seconds) in sorted(results.items()):
+            print(f"OCR {os.path.basename(pdf_path)} page {page_number}: {len(text)} chars in {seconds:.2f}s")
+            metrics.OCR_PAGES.inc(result="ocr")
+            metrics.OCR_PAGE_SECONDS.observe(seconds)
+            metrics.count("ocr_pages")
+            texts[page_number] = text
+            if cache:
+                cache.put_ocr(scanned[page_number], text)
+
+    filled = [(page[0], texts.get(page[0], page[1]), *page[2:]) for page in pages]
+    return filled, all(page_number in texts for page_number in scanned)
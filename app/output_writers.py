@@ -0,0 +1,277 @@
+import csv
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from .field_extraction import FIELD_SCHEMA
+from .metrics import stage_span
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+# Output format for consolidated files: xlsx, csv or parquet
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "xlsx").lower()
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", 1000))
+
+# Column schema shared by every output format
+OUTPUT_COLUMNS = FIELD_SCHEMA + ["source_file", "DUPLICATE_OF"]
+FILE_EXTENSIONS = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet"}
+
+
+def _cell(value):
+    """Scalars go out as they are; anything the sinks cannot store is written as text."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def to_row(record, columns=OUTPUT_COLUMNS):
+    """One record as a list in `columns` order; fields the record lacks are "N/A"."""
+    return [_cell(record.get(column, "N/A")) for column in columns]
+
+
+class OutputWriter:
+    """
+    Base class for the output sinks.
+    Records are written one at a time as they are produced; nothing written
+    earlier is held in memory or read back.
+    """
+
+    def __init__(self, path, columns=OUTPUT_COLUMNS):
+        self.path = path
+        self.columns = list(columns)
+        self.rows_written = 0
+
+    def _follow_header(self, header):
+        """Write rows in the column order of the file being appended to, which may predate the current columns."""
+        header = [column for column in header if column is not None]
+        if header and header != self.columns:
+            print(f"Appending to {self.path} in its own column order; columns not in it are left out: "
+                  f"{[column for column in self.columns if column not in header]}")
+            self.columns = header
+
+    def write(self, record):
+        with stage_span("output_write"):
+            self._write_row(to_row(record, self.columns))
+        self.rows_written += 1
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def _write_row(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvWriter(OutputWriter):
+    """Appends to the CSV file, following its header; the header is only written when the file is new."""
+
+    def __init__(self, path, columns=OUTPUT_COLUMNS):
+        super().__init__(path, columns)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not is_new:
+            with open(path, newline="", encoding="utf-8") as existing:
+                self._follow_header(next(csv.reader(existing), []))
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._file)
+        if is_new:
+            self._csv.writerow(self.columns)
+
+    def _write_row(self, row):
+        self._csv.writerow(row)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class XlsxWriter(OutputWriter):
+    """
+    Streams rows into a write-only openpyxl workbook, so memory stays flat
+    however many rows are written. The workbook is built in a temporary file
+    and moved into place on close. XLSX cannot be appended to in place: rows
+    of an existing workbook are streamed across from a read-only copy first,
+    and new rows follow its header.
+    """
+
+    def __init__(self, path, columns=OUTPUT_COLUMNS):
+        super().__init__(path, columns)
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet()
+        self._closed = False
+
+        if os.path.exists(path):
+            existing = load_workbook(path, read_only=True)
+            try:
+                for index, row in enumerate(existing.active.iter_rows(values_only=True)):
+                    if index == 0:
+                        self._follow_header(list(row))
+                    self._sheet.append(list(row))
+            finally:
+                existing.close()
+        else:
+            self._sheet.append(self.columns)
+
+    def _write_row(self, row):
+        self._sheet.append(row)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with stage_span("output_close"):
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=directory)
+        os.close(fd)
+        try:
+            self._workbook.save(temp_path)
+            shutil.move(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class ParquetWriter(OutputWriter):
+    """
+    Writes Parquet row groups of `row_group_size` rows, so at most one group is
+    buffered. Every column is stored as a string, the same way the extracted
+    values arrive. An existing file is replaced rather than appended to.
+    """
+
+    def __init__(self, path, columns=OUTPUT_COLUMNS, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        if pq is None:
+            raise RuntimeError("Parquet output requires pyarrow to be installed")
+        super().__init__(path, columns)
+        self.row_group_size = row_group_size
+        self._schema = pa.schema([(column, pa.string()) for column in self.columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._buffer = []
+
+    def _write_row(self, row):
+        self._buffer.append(["" if value is None else str(value) for value in row])
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = list(zip(*self._buffer))
+        self._writer.write_table(pa.Table.from_arrays([pa.array(values, pa.string()) for values in columns], schema=self._schema))
+        self._buffer = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._writer = None
+
+
+WRITERS = {"xlsx": XlsxWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def output_format_for(path, default=OUTPUT_FORMAT):
+    """The sink format for `path`, taken from its extension when it has a known one."""
+    extension = os.path.splitext(path)[1].lower()
+    for output_format, known_extension in FILE_EXTENSIONS.items():
+        if extension == known_extension:
+            return output_format
+    return default
+
+
+def open_output_writer(path, output_format=None, columns=OUTPUT_COLUMNS):
+    """Open the writer for `path`; the format defaults to the file extension, then OUTPUT_FORMAT."""
+    output_format = (output_format or output_format_for(path)).lower()
+    if output_format not in WRITERS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return WRITERS[output_format](path, columns)
+
+
+def count_kept_rows(path, output_format=None):
+    """
+    Data rows of an existing output that a new batch writes after. Parquet
+    outputs are replaced rather than appended to, so none of their rows are kept.
+    """
+    output_format = (output_format or output_format_for(path)).lower()
+    if not os.path.exists(path) or os.path.getsize(path) == 0 or output_format == "parquet":
+        return 0
+    if output_format == "csv":
+        with open(path, newline="", encoding="utf-8") as existing:
+            return max(0, sum(1 for _ in csv.reader(existing)) - 1)
+    existing = load_workbook(path, read_only=True)
+    try:
+        return max(0, sum(1 for _ in existing.active.iter_rows(values_only=True)) - 1)
+    finally:
+        existing.close()
+
+
+def truncate_output(path, rows, output_format=None):
+    """Cut an output back to its header and first `rows` data rows; with no rows to keep the file is removed."""
+    output_format = (output_format or output_format_for(path)).lower()
+    if not os.path.exists(path):
+        return
+    if rows <= 0 or output_format == "parquet":
+        os.remove(path)
+        return
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(suffix=FILE_EXTENSIONS.get(output_format, ""), dir=directory)
+    os.close(fd)
+    try:
+        if output_format == "csv":
+            with open(path, newline="", encoding="utf-8") as existing, \
+                    open(temp_path, "w", newline="", encoding="utf-8") as kept:
+                writer = csv.writer(kept)
+                for index, row in enumerate(csv.reader(existing)):
+                    if index > rows:
+                        break
+                    writer.writerow(row)
+        else:
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet()
+            existing = load_workbook(path, read_only=True)
+            try:
+                for index, row in enumerate(existing.active.iter_rows(values_only=True)):
+                    if index > rows:
+                        break
+                    sheet.append(list(row))
+            finally:
+                existing.close()
+            workbook.save(temp_path)
+        shutil.move(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_output(path, output_format=None):
+    """Load an output file back into a DataFrame; "N/A" and blank cells stay text rather than NaN."""
+    output_format = (output_format or output_format_for(path)).lower()
+    if output_format == "xlsx":
+        frame = pd.read_excel(path, dtype=object, keep_default_na=False)
+    elif output_format == "csv":
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    elif output_format == "parquet":
+        frame = pd.read_parquet(path)
+    else:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return frame.astype(object).where(frame.notna(), None)
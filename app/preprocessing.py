@@ -1,21 +1,127 @@
 import os
-import pdfplumber
+import uuid
 import pandas as pd
-from .field_extraction import extract_with_ai, map_field_variations
+from concurrent.futures import ThreadPoolExecutor
+from .field_extraction import extract_with_ai, map_field_variations, EXTRACTION_VERSION, FIELD_SCHEMA
+from .cache import get_extraction_cache, hash_pdf
+from .text_extraction import extract_leading_pages, get_text_extraction_pool
+from .text_engines import TEXT_ENGINE, iter_page_texts
+from .ocr import OCR_VERSION, ocr_available, ocr_scanned_pages
+from .journal import BULK_JOURNAL, BatchJournal, journal_path_for
+from .rule_extraction import DERIVED_FIELDS, extract_with_rules, missing_fields, needs_llm, required_fields_located, RULES_VERSION
+from .prompt_budget import prune_for_prompt, PROMPT_TOKEN_BUDGET
+from .output_writers import count_kept_rows, open_output_writer, output_format_for, truncate_output
+from .records import ExtractedRecord
+from .validation import registration_type
+from .dates import NORMALIZE_DATES, normalize_dates
+from .duplicates import DUPLICATE_POLICIES, get_duplicate_registry, is_skipped_duplicate
+from .llm_batching import get_llm_batcher
+from . import metrics
+from .backends import EXTRACTION_BACKEND, backend_override
 from .utils import clean_numeric_field
 
-
-def extract_text_with_pdfplumber(pdf_path):
-    """Extract raw text from a PDF using pdfplumber."""
+# Maximum number of PDFs extracted (and LLM requests in flight) at once during bulk processing
+MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", 4))
+# Extract text on worker processes (see text_extraction.py) rather than the calling thread
+USE_TEXT_PROCESS_POOL = os.getenv("TEXT_PROCESS_POOL", "1") == "1"
+# Read pages one at a time and stop once the required fields are located or LAZY_PAGES_MAX pages are read
+USE_LAZY_PAGES = os.getenv("LAZY_PAGES", "0") == "1"
+# Page cap for lazy extraction; schedule fields sit on the first pages, wordings follow (0 = no cap)
+LAZY_PAGES_MAX = int(os.getenv("LAZY_PAGES_MAX", 4))
+# Read known label/value pairs before calling the LLM, and only ask it for what is left
+USE_RULE_EXTRACTION = os.getenv("RULE_EXTRACTION", "1") == "1"
+# Send the LLM only the relevant lines of the raw text, within a token budget (see prompt_budget.py)
+USE_PROMPT_PRUNING = os.getenv("PROMPT_PRUNING", "1") == "1"
+# Pack documents from concurrent workers into shared LLM requests (see llm_batching.py)
+USE_LLM_BATCHING = os.getenv("LLM_BATCHING", "0") == "1"
+# Records handed to `save_records` at a time during bulk processing
+RECORD_BATCH_SIZE = int(os.getenv("RECORD_BATCH_SIZE", 500))
+# Validate records as typed ExtractedRecords: premiums come out as numbers and dates as ISO strings
+USE_TYPED_RECORDS = os.getenv("TYPED_RECORDS", "0") == "1"
+# Cache key for structured results: prompt/model version plus the rule tables, pruning budget, page cap, text engine, OCR and record options when in use
+PIPELINE_VERSION = EXTRACTION_VERSION
+if USE_RULE_EXTRACTION:
+    PIPELINE_VERSION += f"+{RULES_VERSION}"
+if USE_PROMPT_PRUNING:
+    PIPELINE_VERSION += f"+prune{PROMPT_TOKEN_BUDGET}"
+if USE_LAZY_PAGES:
+    PIPELINE_VERSION += f"+lazy{LAZY_PAGES_MAX}"
+if TEXT_ENGINE != "pdfplumber":
+    PIPELINE_VERSION += f"+{TEXT_ENGINE}"
+if ocr_available():
+    PIPELINE_VERSION += f"+{OCR_VERSION}"
+if USE_TYPED_RECORDS:
+    PIPELINE_VERSION += "+typed"
+if NORMALIZE_DATES:
+    PIPELINE_VERSION += "+isodates"
+
+
+def extract_text_with_engine(pdf_path, engine=None):
+    """Extract raw text from a PDF with a text engine (TEXT_ENGINE by default, see text_engines.py)."""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = "".join([page.extract_text() for page in pdf.pages])
-        return text
+        pages = list(iter_page_texts(pdf_path, engine=engine))
+        metrics.PAGES.inc(len(pages))
+        metrics.count("pages", len(pages))
+        return "".join(text for _, text, _ in pages)
     except Exception as e:
         print(f"Error extracting text from {pdf_path}: {e}")
         return ""
 
 
+def extract_text_with_pdfplumber(pdf_path):
+    """Extract raw text from a PDF using pdfplumber."""
+    return extract_text_with_engine(pdf_path, "pdfplumber")
+
+
+def _finish_extraction(pdf_path, result):
+    """
+    Log and count a TextExtractionResult, OCR its image-only pages, and return
+    (text, complete, interrupted). `interrupted` is True when extraction failed
+    or timed out or a scanned page could not be recognized, so the text is
+    missing pages by accident; `complete` is False then and also when pages
+    were skipped on purpose.
+    """
+    print(result.summary())
+    metrics.PAGES.inc(len(result.pages))
+    metrics.count("pages", len(result.pages))
+    if result.pages_skipped:
+        metrics.PAGES_SKIPPED.inc(result.pages_skipped)
+        metrics.count("pages_skipped", result.pages_skipped)
+    if result.error and not result.timed_out:
+        print(f"Error extracting text from {pdf_path}: {result.error}")
+    pages, ocr_complete = ocr_scanned_pages(pdf_path, result.pages, get_extraction_cache())
+    interrupted = bool(result.error or result.timed_out) or not ocr_complete
+    return "".join(page[1] for page in pages), not interrupted and result.pages_skipped == 0, interrupted
+
+
+def extract_text(pdf_path):
+    """
+    Extract raw text on the shared process pool, or inline when the pool is
+    disabled. Returns (text, complete, interrupted) as _finish_extraction does;
+    after a timeout or an error `text` holds the pages that finished and
+    nothing extracted from it is cached.
+    """
+    if USE_TEXT_PROCESS_POOL:
+        result = get_text_extraction_pool().extract(pdf_path)
+    else:
+        result = extract_leading_pages(pdf_path)
+    return _finish_extraction(pdf_path, result)
+
+
+def extract_leading_text(pdf_path):
+    """
+    Extract pages lazily, stopping once the required fields are located or
+    LAZY_PAGES_MAX pages are read. Returns (text, complete, interrupted);
+    `complete` is False when pages were skipped, so partial text is not cached
+    as the full text.
+    """
+    if USE_TEXT_PROCESS_POOL:
+        result = get_text_extraction_pool().extract_leading(pdf_path, required_fields_located, LAZY_PAGES_MAX)
+    else:
+        result = extract_leading_pages(pdf_path, required_fields_located, LAZY_PAGES_MAX)
+    return _finish_extraction(pdf_path, result)
+
+
 def validate_and_calculate_premiums(data):
     """
     Validate and calculate premiums:
@@ -89,18 +195,12 @@ def validate_and_standardize_dates(data):
 
 def standardize_vehicle_registration(data):
     """
-    Standardize `REN_ROLL_NEW_USED` based on the registration type.
+    Standardize `REN_ROLL_NEW_USED` to New or Old; values that name neither are left as they are.
     """
     try:
-        value = data.get("REN_ROLL_NEW_USED", "").strip().lower()
-
-        # Simplify the value based on logical mapping
-        if "new" in value:
-            data["REN_ROLL_NEW_USED"] = "New"
-        elif "old" in value or "used" in value:
-            data["REN_ROLL_NEW_USED"] = "Old"
-        else:
-            data["REN_ROLL_NEW_USED"] = "Unknown"
+        registration = registration_type(data.get("REN_ROLL_NEW_USED"))
+        if registration:
+            data["REN_ROLL_NEW_USED"] = registration
 
     except Exception as e:
         print(f"Error standardizing vehicle registration: {e}")
@@ -108,91 +208,312 @@ def standardize_vehicle_registration(data):
     return data
 
 
-def process_pdf(pdf_path, user_id=None):
-    """Process a PDF and extract structured data."""
-    try:
-        # Extract raw text from the PDF
-        raw_text = extract_text_with_pdfplumber(pdf_path)
+def _prompt_text(raw_text, name):
+    return prune_for_prompt(raw_text, name) if USE_PROMPT_PRUNING else raw_text
 
-        # Extract structured data
-        structured_data = extract_with_ai(raw_text)
 
-        # Map field variations
-        structured_data = map_field_variations(structured_data)
+def _ask_llm(raw_text, name, fields=None):
+    prompt_text = _prompt_text(raw_text, name)
+    # Batches are shared between threads, so a per-thread backend choice bypasses them
+    if USE_LLM_BATCHING and not backend_override():
+        return get_llm_batcher().extract(prompt_text, fields)
+    return extract_with_ai(prompt_text, fields=fields)
 
-        # Validate and calculate premiums
-        structured_data = validate_and_calculate_premiums(structured_data)
 
-        # Validate and calculate package/liability
-        structured_data = validate_and_calculate_package_liability(structured_data)
+def extract_structured_data(raw_text, name="", check_duplicate=None):
+    """
+    Extract the schema fields from raw text.
+    Fields readable straight from known labels skip the LLM; the LLM is only
+    called, with a reduced prompt, when a required field is still missing.
+    A document with no text at all (e.g. an unreadable scan) skips the LLM.
+    `check_duplicate(rule_data)` returns the earlier record the rule fields
+    identify, or None; with DUPLICATE_POLICIES=skip a duplicate skips the LLM
+    too. A duplicate's result names the earlier record in DUPLICATE_OF.
+    """
+    if not raw_text.strip():
+        print(f"No text extracted from {name}; skipping LLM")
+        return {field: "N/A" for field in FIELD_SCHEMA if field not in DERIVED_FIELDS}
+
+    if not USE_RULE_EXTRACTION:
+        with metrics.stage_span("llm"):
+            return _ask_llm(raw_text, name)
+
+    with metrics.stage_span("rule_extraction"):
+        rule_data = extract_with_rules(raw_text)
+    missing = missing_fields(rule_data)
+    duplicate_of = check_duplicate(rule_data) if check_duplicate else None
+    if duplicate_of and DUPLICATE_POLICIES == "skip":
+        print(f"{name} duplicates {duplicate_of}; skipping LLM")
+        return {**{field: "N/A" for field in missing}, **rule_data, "DUPLICATE_OF": duplicate_of}
+    if duplicate_of:
+        rule_data["DUPLICATE_OF"] = duplicate_of
+    if not needs_llm(rule_data):
+        print(f"Rule fast path filled all required fields for {name}; skipping LLM")
+        return {**{field: "N/A" for field in missing}, **rule_data}
+
+    print(f"Rule fast path filled {len(rule_data)} fields for {name}; asking LLM for {len(missing)}")
+    with metrics.stage_span("llm"):
+        structured_data = _ask_llm(raw_text, name, fields=missing)
+    structured_data.update(rule_data)
+    return structured_data
+
+
+def _report_stage(on_stage, stage):
+    if on_stage is None:
+        return
+    try:
+        on_stage(stage)
+    except Exception as e:
+        print(f"Error reporting stage {stage}: {e}")
 
-        # Debugging: Print final structured data before saving
-        print(f"Final structured data for {os.path.basename(pdf_path)}:\n{structured_data}")
 
-        return structured_data
-    except Exception as e:
-        print(f"Error processing {pdf_path}: {e}")
-        return None
+def process_pdf(pdf_path, user_id=None, content_hash=None, on_stage=None):
+    """
+    Process a PDF and extract structured data.
+    Identical PDFs seen before are served from the extraction cache, skipping
+    text extraction and the LLM call. Pass `content_hash` when it is already
+    known (e.g. from upload ingestion) to avoid reading the file again.
+    `on_stage(stage)` is called as the text and then the fields are extracted.
+    A record whose policy, chassis or engine number was processed before is
+    returned with DUPLICATE_OF naming the earlier one (see duplicates.py).
+    """
+    name = os.path.basename(pdf_path)
+    registry = get_duplicate_registry()
+    # Keys claimed by this run never count as duplicates of it
+    owner = uuid.uuid4().hex
+
+    def check_duplicate(data):
+        return registry.claim(data, owner, name) if registry is not None else None
+
+    def forget_claims():
+        # A failed document is retried later and must not match its own keys then
+        if registry is not None:
+            registry.forget(owner)
+
+    with metrics.document_span(name) as timing:
+        try:
+            cache = get_extraction_cache()
+            # Results are cached under the default backend's version; do not mix in another backend's output
+            use_result_cache = cache is not None and backend_override() in (None, EXTRACTION_BACKEND)
+            if cache and content_hash is None:
+                content_hash = hash_pdf(pdf_path)
+
+            if use_result_cache:
+                cached_data = cache.get_result(content_hash, PIPELINE_VERSION)
+                metrics.CACHE_LOOKUPS.inc(kind="result", result="hit" if cached_data is not None else "miss")
+                if cached_data is not None:
+                    print(f"Cache hit for {name}")
+                    _report_stage(on_stage, "Cached")
+                    timing.outcome = "cache_hit"
+                    duplicate_of = check_duplicate(cached_data)
+                    if duplicate_of:
+                        _report_stage(on_stage, "Duplicate")
+                        return {**cached_data, "DUPLICATE_OF": duplicate_of}
+                    return cached_data
+
+            # Extract raw text from the PDF
+            raw_text = cache.get_text(content_hash) if cache else None
+            if cache:
+                metrics.CACHE_LOOKUPS.inc(kind="text", result="hit" if raw_text is not None else "miss")
+            # Text cut short by a timeout or error is used once but never cached, nor is what comes of it
+            interrupted = False
+            if raw_text is None:
+                with metrics.stage_span("text_extraction"):
+                    if USE_LAZY_PAGES:
+                        raw_text, complete, interrupted = extract_leading_text(pdf_path)
+                    else:
+                        raw_text, complete, interrupted = extract_text(pdf_path)
+                if cache and raw_text and complete:
+                    cache.put_text(content_hash, raw_text)
+            _report_stage(on_stage, "Text Extracted")
+
+            # Extract structured data
+            structured_data = extract_structured_data(raw_text, name, check_duplicate)
+            _report_stage(on_stage, "Fields Extracted")
+            duplicate_of = structured_data.pop("DUPLICATE_OF", None)
+            if duplicate_of and DUPLICATE_POLICIES == "skip":
+                _report_stage(on_stage, "Duplicate")
+                timing.outcome = "duplicate"
+                return {**structured_data, "DUPLICATE_OF": duplicate_of}
+
+            with metrics.stage_span("mapping_validation"):
+                # Map field variations
+                structured_data = map_field_variations(structured_data)
+
+                if USE_TYPED_RECORDS and "error" not in structured_data:
+                    # Parse once, validate on the typed values
+                    structured_data = ExtractedRecord.from_dict(structured_data).validated().to_dict()
+                else:
+                    # Validate and calculate premiums
+                    structured_data = validate_and_calculate_premiums(structured_data)
+
+                    # Validate and calculate package/liability
+                    structured_data = validate_and_calculate_package_liability(structured_data)
+
+                if NORMALIZE_DATES and "error" not in structured_data:
+                    # ISO dates, with YEAR/MONTH/DATE derived from them
+                    structured_data = normalize_dates(structured_data)
+
+            # Debugging: Print final structured data before saving
+            print(f"Final structured data for {name}:\n{structured_data}")
+
+            # Only cache successful extractions so failed LLM calls are retried next time
+            if "error" in structured_data:
+                timing.outcome = "llm_error"
+                forget_claims()
+                return structured_data
+            if use_result_cache and not interrupted:
+                cache.put_result(content_hash, PIPELINE_VERSION, structured_data)
+
+            # The LLM may have filled identifiers the rules did not find
+            duplicate_of = duplicate_of or check_duplicate(structured_data)
+            if duplicate_of:
+                _report_stage(on_stage, "Duplicate")
+                return {**structured_data, "DUPLICATE_OF": duplicate_of}
+            return structured_data
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {e}")
+            timing.outcome = "failed"
+            forget_claims()
+            return None
 
 
 def save_data_to_excel(data, output_path):
-    """Save data to an Excel file, appending it if the file already exists."""
+    """
+    Save records to the output file (Excel by default), appending them if the
+    file already exists. Parquet files cannot be appended to, so an existing
+    Parquet file is left alone and an error is reported.
+    """
     try:
-        # Convert data to a DataFrame
-        df = pd.DataFrame(data)
-
-        # Remove unwanted columns and intermediate fields
-        df.drop(columns=["OD_PREMIUM_A", "OD_PREMIUM_C"], inplace=True, errors="ignore")
-
-        # Desired column order
-        desired_order = [
-            "S_No", "YEAR", "MONTH", "DATE", "INSURANCE_COMPANY_NAME", "Broker_Name", "IMD_CODE",
-            "LOB", "PACKAGE_LIABILITY", "FUEL_TYPE", "REN_ROLL_NEW_USED", "CUSTOMER_NAME", "MOB_NO",
-            "LOCATION", "REG_NUMBER", "VEHICLE_MAKE", "VEHICLE_MODEL", "CC_GVW", "BIKE_SCOOTER",
-            "YEAR_OF_MANUFACTURE", "ENGINE_NUMBER", "CHASIS_NUMBER", "POLICY_NO", "IDV_SUM_INSURED",
-            "NCB", "RISK_START_DATE", "OD_EXPIRE_DATE", "RENEWAL_DATE",
-            "OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM",
-            "POLICY_ISSUE_DAY", "source_file"
-        ]
-
-        # Reorder columns
-        df = df.reindex(columns=desired_order, fill_value="N/A")
-
-        # Append data if the file already exists
-        if os.path.exists(output_path):
-            existing_df = pd.read_excel(output_path)
-            updated_df = pd.concat([existing_df, df], ignore_index=True)
-        else:
-            updated_df = df
-
-        # Save the updated DataFrame to an Excel file
-        updated_df.to_excel(output_path, index=False)
+        if output_format_for(output_path) == "parquet" and os.path.exists(output_path):
+            raise ValueError(f"{output_path} already exists and Parquet output cannot be appended to")
+        with open_output_writer(output_path) as writer:
+            writer.write_many(data)
         print(f"Data successfully exported to {output_path}")
     except Exception as e:
         print(f"Error saving to Excel: {e}")
 
 
-def bulk_process_to_excel(input_folder, consolidated_excel_path, user_id):
-    """Process multiple PDFs and consolidate data into an Excel file."""
+def _run_batch(input_folder, pdf_files, output_path, user_id, max_in_flight, save_records, journal, completed=None):
+    """
+    Extract `pdf_files` ((S_No, file name) pairs) and stream the records into
+    `output_path` in S_No order. Files in `completed` (journal entries by file
+    name) are not processed again; their journaled records are used instead.
+    """
+    completed = completed or {}
+
+    def process(item):
+        idx, file_name = item
+        if file_name in completed:
+            return completed[file_name]["data"]
+        print(f"Processing {file_name}...")
+        # Pass user_id to process_pdf
+        structured_data = process_pdf(os.path.join(input_folder, file_name), user_id)
+        if structured_data:
+            structured_data["S_No"] = idx
+            structured_data["source_file"] = file_name
+        if journal is not None:
+            journal.record_file(idx, file_name, structured_data)
+        return structured_data
+
+    def save(records):
+        save_records(records, user_id)
+        if journal is not None:
+            journal.record_saved(records)
+
+    writer = None
+    pending_records = []
     try:
-        all_data = []
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight or MAX_IN_FLIGHT)) as executor:
+            # map() yields results in submission order, which keeps S_No deterministic
+            for structured_data in executor.map(process, pdf_files):
+                # Skipped duplicates get no output row and are not saved
+                if structured_data and not is_skipped_duplicate(structured_data):
+                    # Rows go out as they are produced instead of being collected first
+                    if writer is None:
+                        writer = open_output_writer(output_path)
+                    writer.write(structured_data)
+
+                    # Records the journal shows as saved before an interruption are not saved twice
+                    if save_records is not None and (journal is None or structured_data["S_No"] not in journal.saved):
+                        pending_records.append(structured_data)
+                        if len(pending_records) >= RECORD_BATCH_SIZE:
+                            save(pending_records)
+                            pending_records = []
+        if save_records is not None and pending_records:
+            save(pending_records)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if journal is not None:
+        journal.record_finished()
+    if writer is not None:
+        print(f"Data successfully exported to {output_path}")
+    else:
+        print("No valid data extracted from PDFs.")
 
-        for idx, file_name in enumerate(os.listdir(input_folder), start=1):
-            if file_name.endswith(".pdf"):
-                pdf_path = os.path.join(input_folder, file_name)
-                print(f"Processing {file_name}...")
 
-                # Pass user_id to process_pdf
-                structured_data = process_pdf(pdf_path, user_id)
-                if structured_data:
-                    structured_data["S_No"] = idx
-                    structured_data["source_file"] = file_name
+def bulk_process_to_excel(input_folder, consolidated_excel_path, user_id, max_in_flight=None, save_records=None,
+                          journal_path=None):
+    """
+    Process multiple PDFs and consolidate data into an Excel file.
+    Up to `max_in_flight` files are extracted concurrently; records keep their
+    S_No from the sorted folder listing regardless of completion order.
+    When given, `save_records(records, user_id)` receives the records in
+    batches of RECORD_BATCH_SIZE (e.g. models.save_policy_records).
+    Each file's result is journaled to `journal_path` (by default next to the
+    output, unless BULK_JOURNAL is off) so resume_bulk_process() can finish
+    the batch if this run is interrupted.
+    """
+    journal = None
+    try:
+        pdf_files = [
+            (idx, file_name)
+            for idx, file_name in enumerate(sorted(os.listdir(input_folder)), start=1)
+            if file_name.endswith(".pdf")
+        ]
+        if journal_path or BULK_JOURNAL:
+            journal = BatchJournal.start(
+                journal_path or journal_path_for(consolidated_excel_path),
+                input_folder, consolidated_excel_path, user_id, [file_name for _, file_name in pdf_files],
+                existing_rows=count_kept_rows(consolidated_excel_path),
+            )
+        _run_batch(input_folder, pdf_files, consolidated_excel_path, user_id, max_in_flight, save_records, journal)
+    except Exception as e:
+        print(f"ERROR in bulk processing to Excel: {e}")
+    finally:
+        if journal is not None:
+            journal.close()
 
-                    all_data.append(structured_data)
 
-        if all_data:
-            save_data_to_excel(all_data, consolidated_excel_path)
-        else:
-            print("No valid data extracted from PDFs.")
+def resume_bulk_process(journal_path, max_in_flight=None, save_records=None):
+    """
+    Finish a bulk batch from its journal. Files with a journaled record are
+    skipped, the rest (failed ones included) are processed again, and the
+    batch's rows are rewritten in S_No order after the rows the output held
+    before the batch started. Only records the journal does not show as saved
+    are handed to `save_records`. A finished batch is not resumed.
+    """
+    journal = None
+    try:
+        journal = BatchJournal.open(journal_path)
+        if journal.finished:
+            raise ValueError("the batch already finished")
+        batch = journal.batch
+        output_path = batch["output_path"]
+        pdf_files = list(enumerate(batch["files"], start=1))
+        completed = journal.completed()
+        print(f"Resuming batch from {journal_path}: {len(completed)} of {len(pdf_files)} files already done")
+
+        # The output may hold rows from the interrupted run; every one of them is in the journal
+        truncate_output(output_path, batch.get("existing_rows", 0))
+        _run_batch(
+            batch["input_folder"], pdf_files, output_path, batch["user_id"], max_in_flight, save_records,
+            journal, completed,
+        )
     except Exception as e:
-        print(f"ERROR in bulk processing to Excel: {e}")
\ No newline at end of file
+        print(f"ERROR resuming bulk processing from {journal_path}: {e}")
+    finally:
+        if journal is not None:
+            journal.close()
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+
+# Most progress events sent per second for one job; updates in between are coalesced
+PROGRESS_MAX_RATE = float(os.getenv("PROGRESS_MAX_RATE", 2))
+
+
+class ProgressThrottle:
+    """
+    Coalesce progress updates per key (e.g. a job id) and send at most
+    `max_rate` per second for each. An update arriving too soon only marks the
+    key dirty; a timer sends one event with the latest state once the interval
+    has passed. `send(key)` builds and emits the event, so it always reflects
+    the state at send time. Final updates go out immediately.
+    """
+
+    def __init__(self, send, max_rate=PROGRESS_MAX_RATE):
+        self.send = send
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self._last_sent = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, final=False):
+        with self._lock:
+            timer = self._timers.pop(key, None) if final else self._timers.get(key)
+            if final:
+                self._last_sent.pop(key, None)
+                if timer is not None:
+                    timer.cancel()
+            elif timer is not None:
+                return  # An event is already scheduled and will carry this update
+            else:
+                wait = self._last_sent.get(key, float("-inf")) + self.min_interval - time.monotonic()
+                if wait > 0:
+                    timer = threading.Timer(wait, self._flush, [key])
+                    timer.daemon = True
+                    self._timers[key] = timer
+                    timer.start()
+                    return
+                self._last_sent[key] = time.monotonic()
+        self._send(key)
+
+    def _flush(self, key):
+        with self._lock:
+            if self._timers.get(key) is not threading.current_thread():
+                return  # Superseded by a final update
+            del self._timers[key]
+            self._last_sent[key] = time.monotonic()
+        self._send(key)
+
+    def _send(self, key):
+        try:
+            self.send(key)
+        except Exception as e:
+            print(f"Error sending progress for {key}: {e}")
@@ -0,0 +1,126 @@
+import logging
+import os
+import re
+from bisect import bisect_right
+from collections import Counter
+
+from .rule_extraction import find_labels
+from .utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 3000))
+PROMPT_LABEL_WINDOW = int(os.getenv("PROMPT_LABEL_WINDOW", 2))
+# Opening lines carry the insurer name, product (LOB) and policy type
+HEADER_LINES = 12
+
+# Words around fields that have no label table (vehicle, location, NCB...)
+CONTEXT_KEYWORDS = re.compile(
+    r"make|model|fuel|cubic|\bcc\b|gvw|manufactur|mfg|rto|location|ncb|no claim|idv|sum insured|"
+    r"registration|reg\.?\s*no|engine|chassis|premium|period|insured|policy|intermediary|broker|agent|"
+    r"own damage|liability|gst|renewal|vehicle|bike|scooter|two wheeler|private car|commercial",
+    re.IGNORECASE,
+)
+
+# Legal and service text printed on every schedule
+BOILERPLATE = re.compile(
+    r"terms and conditions|hereby|in the event|subject to|provided (?:also )?that|clause|exclusion|"
+    r"disclaimer|grievance|ombudsman|toll ?free|https?://|www\.|e-?mail us|visit us|irdai? reg|"
+    r"\bcin\b|solicitation|stamp duty|in witness whereof|signatory|void ab-initio|misrepresentation",
+    re.IGNORECASE,
+)
+_PROSE_LINE_LENGTH = 110
+
+
+def _line_scores(lines, label_lines):
+    """Relevance per line: labels and their neighbours first, then data-looking lines, then prose."""
+    near_labels = {
+        index + offset
+        for index in label_lines
+        for offset in range(-PROMPT_LABEL_WINDOW, PROMPT_LABEL_WINDOW + 1)
+    }
+    scores = []
+    for index, line in enumerate(lines):
+        if index in label_lines:
+            score = 4
+        elif index in near_labels:
+            score = 3
+        elif index < HEADER_LINES or CONTEXT_KEYWORDS.search(line):
+            score = 2
+        elif any(char.isdigit() for char in line):
+            score = 1
+        else:
+            score = 0
+        scores.append(score)
+    return scores
+
+
+def prune_text(raw_text, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Reduce `raw_text` to the lines worth sending to the LLM.
+    Repeated header/footer lines and legal boilerplate are always dropped;
+    if the rest is still over `token_budget`, lines are kept by relevance
+    (near a known field label first) until the budget is spent. Kept lines
+    stay in document order.
+    """
+    lines = [line.strip() for line in raw_text.splitlines()]
+
+    # Headers and footers repeat on every page; keep their first occurrence only
+    counts = Counter(line for line in lines if line)
+    seen = set()
+    kept = []
+    for line in lines:
+        if not line or (counts[line] > 1 and line in seen):
+            continue
+        seen.add(line)
+        kept.append(line)
+
+    # Map each label found in the text back to the line it sits on
+    line_starts = []
+    offset = 0
+    for line in kept:
+        line_starts.append(offset)
+        offset += len(line) + 1
+    label_lines = {bisect_right(line_starts, start) - 1 for start, _, _ in find_labels("\n".join(kept))}
+
+    candidates = []
+    for index, (line, score) in enumerate(zip(kept, _line_scores(kept, label_lines))):
+        is_boilerplate = BOILERPLATE.search(line) or (
+            len(line) > _PROSE_LINE_LENGTH and not any(char.isdigit() for char in line)
+        )
+        if is_boilerplate and index not in label_lines:
+            continue
+        candidates.append((index, line, score))
+
+    text = "\n".join(line for _, line, _ in candidates)
+    if count_tokens(text) <= token_budget:
+        return text
+
+    # Over budget: spend it on the most relevant lines, earliest first within a score
+    ranked = sorted(candidates, key=lambda candidate: (-candidate[2], candidate[0]))
+    chosen = []
+    used = 0
+    for index, line, score in ranked:
+        cost = count_tokens(line + "\n")
+        if used + cost > token_budget:
+            continue
+        chosen.append(index)
+        used += cost
+
+    # Per-line counts can undershoot the joined text slightly; drop the least relevant lines until it fits
+    while chosen:
+        kept_indices = set(chosen)
+        text = "\n".join(line for index, line, _ in candidates if index in kept_indices)
+        if count_tokens(text) <= token_budget:
+            return text
+        chosen.pop()
+    return ""
+
+
+def prune_for_prompt(raw_text, name="", token_budget=PROMPT_TOKEN_BUDGET):
+    """prune_text() with the before/after token counts logged for the document."""
+    before = count_tokens(raw_text)
+    pruned = prune_text(raw_text, token_budget)
+    after = count_tokens(pruned)
+    logger.info(f"Prompt text for {name or 'document'}: {before} tokens before pruning, {after} after (budget {token_budget})")
+    return pruned
@@ -0,0 +1,82 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+    A rate of 0 (or None) disables the bucket.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = (rate_per_minute or 0) / 60.0
+        self.capacity = float(capacity if capacity is not None else (rate_per_minute or 0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate_per_second > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them."""
+        if not self.enabled:
+            return
+        # A single request larger than the bucket can never fit; let it drain the bucket instead.
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together."""
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens=0):
+        self.requests.acquire(1)
+        if tokens:
+            self.tokens.acquire(tokens)
+
+
+def is_retryable_error(error):
+    """True for rate limiting (429), server errors (5xx), timeouts and dropped connections."""
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in {"RateLimitError", "ServiceUnavailableError", "Timeout", "APIConnectionError", "TryAgain"}
+
+
+def call_with_retries(func, max_retries=5, base_delay=1.0, max_delay=30.0, on_retry=None):
+    """
+    Call `func`, retrying retryable errors with exponential backoff and full jitter.
+    Non-retryable errors, and the last retryable one, are re-raised.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            attempt += 1
+            print(f"Warning: Retryable error ({e}); retry {attempt}/{max_retries} in {delay:.2f}s")
+            if on_retry is not None:
+                on_retry(e, attempt)
+            time.sleep(delay)
@@ -0,0 +1,215 @@
+import math
+from dataclasses import field, make_dataclass
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+
+import pandas as pd
+
+from .field_extraction import FIELD_SCHEMA
+from .dates import parse_date
+from .validation import PREMIUM_TOLERANCE, registration_type
+
+# Sentinels the LLM and the rules use for "not found", compared upper-cased
+MISSING_VALUES = {"", "N/A", "NOT FOUND"}
+
+
+class PackageLiability(str, Enum):
+    PACKAGE = "Package Policy"
+    LIABILITY_ONLY = "Liability Only Policy"
+
+
+class Registration(str, Enum):
+    NEW = "New"
+    OLD = "Old"
+    UNKNOWN = "Unknown"
+
+
+# Type of each schema field; the rest are text
+FIELD_TYPES = {
+    "S_No": int,
+    "IDV_SUM_INSURED": float,
+    "OD_PREMIUM": float,
+    "TP_ONLY_PREMIUM": float,
+    "NET_PREMIUM": float,
+    "TOTAL_PREMIUM": float,
+    "RISK_START_DATE": date,
+    "OD_EXPIRE_DATE": date,
+    "RENEWAL_DATE": date,
+    "POLICY_ISSUE_DAY": date,
+    "PACKAGE_LIABILITY": PackageLiability,
+    "REN_ROLL_NEW_USED": Registration,
+}
+RECORD_FIELDS = FIELD_SCHEMA + ["source_file"]
+
+
+def is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    return isinstance(value, str) and value.strip().upper() in MISSING_VALUES
+
+
+def parse_amount(value):
+    """A premium or sum insured as a float, from a number or text such as "₹4,090.00"; None if unreadable."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return float(str(value).replace("₹", "").replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def _amount(value):
+    """A parsed amount, or 0.0 for None or text kept because it did not parse (as clean_numeric_field does)."""
+    return value if isinstance(value, float) else 0.0
+
+
+def _parse_value(parser, value):
+    """`value` parsed, None when missing, or its text as extracted when it does not parse."""
+    if is_missing(value):
+        return None
+    parsed = parser(value)
+    return value if parsed is None else parsed
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        parsed = parse_date(str(value))
+        return parsed.date() if parsed else None
+
+
+def _parse_package(value):
+    if isinstance(value, PackageLiability):
+        return value
+    text = str(value).strip().lower()
+    for member in PackageLiability:
+        if member.value.lower() == text:
+            return member
+    return None
+
+
+def _parse_registration(value):
+    """
+    The rule of standardize_vehicle_registration: New or Old when the value
+    names one as a whole word; None for anything else, which keeps its text.
+    """
+    if isinstance(value, Registration):
+        return value
+    text = str(value).strip()
+    for member in Registration:
+        if member.value.lower() == text.lower():
+            return member
+    registration = registration_type(text)
+    return Registration(registration) if registration else None
+
+
+_PARSERS = {
+    int: _parse_int,
+    float: parse_amount,
+    date: _parse_date,
+    PackageLiability: _parse_package,
+    Registration: _parse_registration,
+    str: str,
+}
+# Parser for each record field, in RECORD_FIELDS order
+_FIELD_PARSERS = [_PARSERS[FIELD_TYPES.get(name, str)] for name in RECORD_FIELDS]
+
+
+def _output_value(value, missing):
+    if value is None:
+        return missing
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class _RecordMethods:
+    """Conversions and validation for the record class generated below."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Parse values given in RECORD_FIELDS order; "N/A", blanks and NaN become
+        None. A value that does not parse (an amount such as "1,234/-", a date
+        in an unknown format) keeps its extracted text, as the dict path does.
+        """
+        return cls(*(_parse_value(parser, value) for parser, value in zip(_FIELD_PARSERS, values)))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Parse an extracted record (schema keys, after map_field_variations); other keys are dropped."""
+        return cls.from_values([data.get(name) for name in RECORD_FIELDS])
+
+    def to_dict(self, missing="N/A"):
+        """
+        Plain values for the output writers, the journal and the database:
+        numbers stay numbers, dates are ISO strings, enums their text and
+        missing values `missing`.
+        """
+        return {name: _output_value(getattr(self, name), missing) for name in RECORD_FIELDS}
+
+    def validated(self):
+        """
+        Apply the premium and package/liability rules in place on the parsed
+        values (no string parsing) and return the record. Amounts kept as text
+        count as 0, as in validate_and_calculate_premiums; the registration
+        rule was applied when the record was parsed.
+        """
+        od = _amount(self.OD_PREMIUM)
+        net = _amount(self.NET_PREMIUM)
+        calculated_net = od + _amount(self.TP_ONLY_PREMIUM)
+        if net == 0 or abs(calculated_net - net) > PREMIUM_TOLERANCE:
+            self.NET_PREMIUM = net = calculated_net
+        total = _amount(self.TOTAL_PREMIUM)
+        if total == 0 or abs(total - net) > PREMIUM_TOLERANCE:
+            self.TOTAL_PREMIUM = net
+        self.PACKAGE_LIABILITY = PackageLiability.LIABILITY_ONLY if od == 0 else PackageLiability.PACKAGE
+        return self
+
+
+# One slotted attribute per schema field, typed, None when missing and the extracted text when it does not parse
+ExtractedRecord = make_dataclass(
+    "ExtractedRecord",
+    [(name, Optional[FIELD_TYPES.get(name, str)], field(default=None)) for name in RECORD_FIELDS],
+    bases=(_RecordMethods,),
+    slots=True,
+)
+ExtractedRecord.__module__ = __name__
+ExtractedRecord.__doc__ = "One extracted policy schedule with parsed premiums, dates and enums; see FIELD_TYPES."
+
+
+def records_to_frame(records):
+    """
+    DataFrame of records, one column per field; premiums are float64 with NaN
+    where missing, or object columns when a record kept an amount as text.
+    """
+    frame = pd.DataFrame({name: [getattr(record, name) for record in records] for name in RECORD_FIELDS})
+    for name, kind in FIELD_TYPES.items():
+        if kind is float and all(value is None or isinstance(value, float) for value in frame[name]):
+            frame[name] = frame[name].astype(float)
+    return frame
+
+
+def records_from_frame(frame):
+    """Records from the rows of a DataFrame, typed or as read from an output file; absent columns are missing."""
+    frame = frame.reindex(columns=RECORD_FIELDS)
+    return [ExtractedRecord.from_values(row) for row in frame.itertuples(index=False, name=None)]
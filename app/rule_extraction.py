@@ -0,0 +1,249 @@
+import os
+import re
+
+from .backends import RULES_VERSION
+from .dates import DATE_PATTERN, DERIVED_DATE_FIELDS, NORMALIZE_DATES, parse_date
+from .field_extraction import FIELD_MAPPING, FIELD_SCHEMA, FIELD_VARIATIONS, VARIATION_FIELDS
+from .label_index import LabelIndex
+from .mappings import CUSTOMER_NAME_LABELS, POLICY_NUMBER_LABELS
+from .utils import clean_numeric_field
+
+# Fields that must all be found for a document to skip the LLM entirely
+RULE_REQUIRED_FIELDS = [
+    field.strip() for field in os.getenv(
+        "RULE_REQUIRED_FIELDS",
+        "POLICY_NO,CUSTOMER_NAME,OD_PREMIUM,TP_ONLY_PREMIUM,NET_PREMIUM,TOTAL_PREMIUM,RISK_START_DATE,OD_EXPIRE_DATE",
+    ).split(",") if field.strip()
+]
+
+# Filled in later in the pipeline, never asked of the LLM
+DERIVED_FIELDS = {"S_No", "PACKAGE_LIABILITY"}
+if NORMALIZE_DATES:
+    DERIVED_FIELDS |= set(DERIVED_DATE_FIELDS)
+
+# Labels for fields the variation tables do not cover yet
+EXTRA_LABELS = {
+    "Policy No": "POLICY_NO",
+    "Policy Number": "POLICY_NO",
+    "Name of Insured": "CUSTOMER_NAME",
+    "Name of the Insured": "CUSTOMER_NAME",
+    "Name of Insured/Proposer": "CUSTOMER_NAME",
+    "Insured Name": "CUSTOMER_NAME",
+    "Agent Code": "IMD_CODE",
+    "Engine No": "ENGINE_NUMBER",
+    "Engine Number": "ENGINE_NUMBER",
+    "Chassis No": "CHASIS_NUMBER",
+    "Chassis Number": "CHASIS_NUMBER",
+    "Registration No": "REG_NUMBER",
+    "Registration Number": "REG_NUMBER",
+    "Vehicle Registration No": "REG_NUMBER",
+    "Regn. Number": "REG_NUMBER",
+    "Mobile": "MOB_NO",
+    "Mobile No": "MOB_NO",
+    "Mobile Number": "MOB_NO",
+    "Contact Number": "MOB_NO",
+    "Total IDV": "IDV_SUM_INSURED",
+    "Policy Issue Date": "POLICY_ISSUE_DAY",
+    "OD Cover Start Date": "RISK_START_DATE",
+    "OD Cover End Date": "OD_EXPIRE_DATE",
+    "Period of Insurance": "PERIOD",
+    "Period of Policy": "PERIOD",
+}
+
+# Labels that only mark where a value ends: too generic to trust, or belonging to someone else
+BOUNDARY_LABELS = ["Code", "Total", "Partner Mobile No", "Partner Mobile Number", "Agent Contact No", "Address"]
+
+AMOUNT_FIELDS = {"OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM", "IDV_SUM_INSURED"}
+DATE_FIELDS = {"POLICY_ISSUE_DAY", "RISK_START_DATE", "OD_EXPIRE_DATE"}
+CODE_FIELDS = {"POLICY_NO", "IMD_CODE", "ENGINE_NUMBER", "CHASIS_NUMBER"}
+NAME_FIELDS = {"CUSTOMER_NAME", "Broker_Name"}
+# Words that follow a customer-name label in headings and table captions, never in a name
+NAME_STOPWORDS = {"DETAILS", "DETAIL", "NAME", "ADDRESS", "DECLARED", "VEHICLE", "PERSON", "ASSURED", "PROPOSER", "VALUE"}
+NAME_TITLES = {"MR", "MR.", "MRS", "MRS.", "MS", "MS.", "SMT", "SMT.", "SHRI", "DR", "DR.", "M/S"}
+
+# Currency markers, section tags and qualifiers ("[A]", "(`)", "(rounded off)") that may sit between a label and its value
+_SEPARATOR = (
+    r"[ \t]*(?:(?:\[[A-Z0-9+ ]{1,8}[\]}]|\((?:`|₹|Rs\.?|INR|[A-Za-z0-9+ ]{1,16})\))[ \t]*){0,3}"
+    r"\.?[ \t]*[:\-]?[ \t]*(?:`|₹|Rs\.?|INR)?[ \t]*"
+)
+# Premiums closer than this agree, as in validate_and_calculate_premiums
+_PREMIUM_TOLERANCE = 1e-2
+PREMIUM_FIELDS = ["OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM"]
+
+VALUE_PATTERNS = {
+    # An amount running into letters ("4T88.83") or more digit fragments ("108 1 462.7-8") is garbled text
+    "amount": re.compile(_SEPARATOR + r"(\d[\d,]*(?:\.\d+)?)(?![\d/A-Za-z]|[ \t]+\d)"),
+    "date": re.compile(r"[ \t]*[:\-]?[ \t]*(" + DATE_PATTERN + r")", re.IGNORECASE),
+    "code": re.compile(r"[ \t]*\.?[ \t]*[:\-]?[ \t]*([A-Z0-9][A-Z0-9/\-]{4,})(?![A-Za-z0-9])"),
+    "reg": re.compile(r"[ \t]*\.?[ \t]*[:\-]?[ \t]*(NEW|[A-Z]{2}[ \t-]*\d{1,2}[ \t-]*[A-Z]{0,3}[ \t-]*\d{1,4})(?![A-Za-z0-9])"),
+    "phone": re.compile(r"[ \t]*\.?[ \t]*[:\-]?[ \t]*(?:\+91[ \t-]?)?([6-9]\d{9})(?!\d)"),
+    "name": re.compile(r"[ \t]*[:\-]?[ \t]*([A-Z][A-Za-z.&/]*(?:[ \t]+(?:[A-Z][A-Za-z.&/]*|and|of|&))*)"),
+}
+_PERIOD_WINDOW = 160
+
+
+def _build_label_index():
+    """
+    Every known plain label mapped to its field, from the variation tables,
+    EXTRA_LABELS and the customer-name labels in mappings.py, compiled into
+    one LabelIndex. Boundary labels map to None.
+    """
+    labels = {}
+    for label, field in FIELD_MAPPING.items():
+        labels[label] = field
+    for key, field in VARIATION_FIELDS.items():
+        for label in FIELD_VARIATIONS[key].split(","):
+            labels.setdefault(label.strip(), field)
+    labels.update(EXTRA_LABELS)
+    for label in CUSTOMER_NAME_LABELS:
+        labels.setdefault(label, "CUSTOMER_NAME")
+    for label in BOUNDARY_LABELS:
+        labels[label] = None
+    return LabelIndex(labels)
+
+
+LABEL_INDEX = _build_label_index()
+# The policy-number labels in mappings.py are regexes already; they only count
+# where no plain label starts at the same place
+CATCH_ALL_SCANNER = re.compile(
+    r"(?<![A-Za-z])(?:" + "|".join(POLICY_NUMBER_LABELS) + r")(?![a-z])",
+    re.IGNORECASE,
+)
+
+
+def find_labels(raw_text):
+    """All known labels in `raw_text` as (start, end, field), in document order."""
+    # Plain labels sort ahead of catch-alls that start at the same offset
+    matches = [(start, end, 1, LABEL_INDEX.fields[key]) for start, end, key in LABEL_INDEX.matches(raw_text)]
+    matches += [(match.start(), match.end(), 0, "POLICY_NO") for match in CATCH_ALL_SCANNER.finditer(raw_text)]
+    matches.sort(key=lambda match: (match[0], -match[2], -match[1]))
+    found = []
+    last_end = 0
+    for start, end, _, field in matches:
+        if start >= last_end:
+            found.append((start, end, field))
+            last_end = end
+    return found
+
+
+def _kind(field):
+    if field in AMOUNT_FIELDS:
+        return "amount"
+    if field in DATE_FIELDS:
+        return "date"
+    if field in CODE_FIELDS:
+        return "code"
+    if field in NAME_FIELDS:
+        return "name"
+    if field == "REG_NUMBER":
+        return "reg"
+    if field == "MOB_NO":
+        return "phone"
+    return None
+
+
+def _read_value(field, raw_text, start, limit):
+    """Parse the value of `field` that follows a label ending at `start`, without passing `limit`."""
+    kind = _kind(field)
+    if kind is None:
+        return None
+    match = VALUE_PATTERNS[kind].match(raw_text, start, limit)
+    if not match:
+        return None
+    value = match.group(1).strip()
+    if kind == "code" and not any(char.isdigit() for char in value):
+        return None
+    if kind == "reg":
+        value = re.sub(r"[ \t]+", "", value)
+    if kind == "name" and not _is_plausible_name(field, value):
+        return None
+    return value
+
+
+def _is_plausible_name(field, value):
+    if len(value) < 3:
+        return False
+    if field != "CUSTOMER_NAME":
+        return True
+    # Customer names are printed in capitals; mixed case after "Insured" is a caption
+    words = [word for word in value.split() if word.upper() not in NAME_TITLES]
+    return bool(words) and all(word.isupper() and word not in NAME_STOPWORDS for word in words)
+
+
+def extract_with_rules(raw_text):
+    """
+    Fill schema fields straight from known label/value pairs in `raw_text`.
+    Only the first well-formed value after each label counts, and fields that
+    cannot be read reliably are left out rather than guessed.
+    """
+    data = {}
+    labels = find_labels(raw_text)
+
+    for index, (start, end, field) in enumerate(labels):
+        if field is None:
+            continue
+        line_end = raw_text.find("\n", end)
+        line_end = len(raw_text) if line_end == -1 else line_end
+
+        if field == "PERIOD":
+            # "From <date> ... To <date>", possibly wrapped onto the next line
+            window_end = raw_text.find("\n", end + _PERIOD_WINDOW)
+            window = raw_text[end:window_end if window_end != -1 else len(raw_text)]
+            dates = re.findall(DATE_PATTERN, window, re.IGNORECASE)[:2]
+            parsed = [parse_date(date) for date in dates]
+            if len(dates) == 2 and None not in parsed and parsed[0] < parsed[1]:
+                data.setdefault("RISK_START_DATE", dates[0])
+                data.setdefault("OD_EXPIRE_DATE", dates[1])
+            continue
+
+        if field in data:
+            continue
+        # A value never runs into the next label on the same line
+        next_start = labels[index + 1][0] if index + 1 < len(labels) else len(raw_text)
+        value = _read_value(field, raw_text, end, min(line_end, next_start))
+        if value:
+            data[field] = value
+
+    # Liability-only schedules often print no own-damage figure at all
+    if "OD_PREMIUM" not in data and "TP_ONLY_PREMIUM" in data and "NET_PREMIUM" in data:
+        if abs(clean_numeric_field(data["NET_PREMIUM"]) - clean_numeric_field(data["TP_ONLY_PREMIUM"])) < 1e-2:
+            data["OD_PREMIUM"] = "0"
+    _check_premiums(data)
+    if "RENEWAL_DATE" not in data and "OD_EXPIRE_DATE" in data:
+        data["RENEWAL_DATE"] = data["OD_EXPIRE_DATE"]
+
+    return data
+
+
+def _check_premiums(data):
+    """
+    Keep the premiums read from labels only when they agree: OD + TP must
+    equal NET, and TOTAL (tax included) must not be below NET. A figure read
+    from the wrong line or from garbled text rarely passes, so the premiums
+    are otherwise dropped and left to the LLM; a lone TOTAL that disagrees is
+    dropped by itself.
+    """
+    amounts = {field: clean_numeric_field(data[field]) for field in PREMIUM_FIELDS if field in data}
+    parts = ("OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM")
+    if not all(field in amounts for field in parts) or abs(
+        amounts["OD_PREMIUM"] + amounts["TP_ONLY_PREMIUM"] - amounts["NET_PREMIUM"]
+    ) > _PREMIUM_TOLERANCE or amounts["NET_PREMIUM"] == 0:
+        for field in PREMIUM_FIELDS:
+            data.pop(field, None)
+        return
+    if "TOTAL_PREMIUM" in amounts and amounts["TOTAL_PREMIUM"] < amounts["NET_PREMIUM"] - _PREMIUM_TOLERANCE:
+        del data["TOTAL_PREMIUM"]
+
+
+def missing_fields(data):
+    """Schema fields an LLM would still have to provide for `data`."""
+    return [field for field in FIELD_SCHEMA if field not in DERIVED_FIELDS and field not in data]
+
+
+def needs_llm(data):
+    return any(field not in data for field in RULE_REQUIRED_FIELDS)
+
+
+def required_fields_located(raw_text):
+    """Whether the rules alone already read every required field from `raw_text`."""
+    return not needs_llm(extract_with_rules(raw_text))
@@ -0,0 +1,118 @@
+import os
+import time
+
+import pdfplumber
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Only needed for the pdfium engine
+    pdfium = None
+
+# Engine used to read the text layer: "pdfplumber" (layout analysis) or "pdfium" (fast, native)
+TEXT_ENGINE = os.getenv("TEXT_ENGINE", "pdfplumber")
+# Engine that re-reads pages whose text from TEXT_ENGINE is empty or garbled; empty disables the fallback
+TEXT_FALLBACK_ENGINE = os.getenv("TEXT_FALLBACK_ENGINE", "pdfplumber")
+# Below this share of readable characters a page's text is treated as garbled
+TEXT_MIN_READABLE_RATIO = float(os.getenv("TEXT_MIN_READABLE_RATIO", 0.6))
+
+_READABLE_PUNCTUATION = set(".,:;/-()[]&@#%'\"+*=_₹`")
+
+
+def looks_garbled(text, min_readable_ratio=TEXT_MIN_READABLE_RATIO):
+    """
+    Whether `text` is unusable as a page's text: empty, full of unmapped
+    glyphs ("(cid:12)", U+FFFD) or mostly characters that are neither letters,
+    digits nor common punctuation.
+    """
+    characters = "".join(text.split())
+    if not characters:
+        return True
+    if characters.count("(cid:") * 8 > len(characters) * (1 - min_readable_ratio):
+        return True
+    readable = sum(1 for ch in characters if ch.isalnum() or ch in _READABLE_PUNCTUATION)
+    return readable / len(characters) < min_readable_ratio
+
+
+class TextEngine:
+    """Reads the text layer of a PDF page by page."""
+
+    name = "base"
+
+    def iter_pages(self, pdf_path, start=0, end=None):
+        """Yield (page_number, text) for pages [start, end), in order, parsing only those pages."""
+        raise NotImplementedError
+
+
+class PdfplumberEngine(TextEngine):
+    """pdfminer layout analysis through pdfplumber: slow, but the best reading order for tables."""
+
+    name = "pdfplumber"
+
+    def iter_pages(self, pdf_path, start=0, end=None):
+        with pdfplumber.open(pdf_path) as pdf:
+            for index in range(start, len(pdf.pages) if end is None else min(end, len(pdf.pages))):
+                page = pdf.pages[index]
+                # extract_text() returns None for pages without a text layer
+                text = page.extract_text() or ""
+                # Drop the parsed layout objects before moving on
+                page.close()
+                yield index + 1, text
+
+
+class PdfiumEngine(TextEngine):
+    """
+    PDFium's own text extraction (pypdfium2, installed with pdfplumber):
+    tens of times faster, but columns in tables may come out in a different order.
+    """
+
+    name = "pdfium"
+
+    def iter_pages(self, pdf_path, start=0, end=None):
+        if pdfium is None:
+            raise RuntimeError("The pdfium text engine requires pypdfium2 to be installed")
+        document = pdfium.PdfDocument(pdf_path)
+        try:
+            for index in range(start, len(document) if end is None else min(end, len(document))):
+                page = document[index]
+                text_page = page.get_textpage()
+                try:
+                    text = text_page.get_text_range()
+                finally:
+                    text_page.close()
+                    page.close()
+                yield index + 1, text.replace("\r\n", "\n").replace("\r", "\n")
+        finally:
+            document.close()
+
+
+ENGINES = {"pdfplumber": PdfplumberEngine, "pdfium": PdfiumEngine}
+
+
+def get_text_engine(name=None):
+    name = name or TEXT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown text engine: {name}")
+    return ENGINES[name]()
+
+
+def iter_page_texts(pdf_path, start=0, end=None, engine=None, fallback=None):
+    """
+    Yield (page_number, text, seconds) for pages [start, end) from `engine`
+    (default TEXT_ENGINE). A page whose text looks empty or garbled is read
+    again with `fallback` (default TEXT_FALLBACK_ENGINE), and the fallback's
+    text is kept when it reads better.
+    """
+    engine = get_text_engine(engine)
+    fallback = TEXT_FALLBACK_ENGINE if fallback is None else fallback
+    fallback_engine = get_text_engine(fallback) if fallback and fallback != engine.name else None
+
+    began = time.perf_counter()
+    for page_number, text in engine.iter_pages(pdf_path, start, end):
+        if fallback_engine is not None and looks_garbled(text):
+            for _, fallback_text in fallback_engine.iter_pages(pdf_path, page_number - 1, page_number):
+                if not looks_garbled(fallback_text) or not text.strip():
+                    print(f"Warning: {engine.name} text of page {page_number} of {pdf_path} is unusable; "
+                          f"using {fallback_engine.name}")
+                    text = fallback_text
+        yield page_number, text, time.perf_counter() - began
+        began = time.perf_counter()
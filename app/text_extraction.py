@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from pikepdf import Pdf
+
+from .text_engines import iter_page_texts
+
+TEXT_WORKERS = int(os.getenv("TEXT_WORKERS", os.cpu_count() or 2))
+TEXT_PAGES_PER_CHUNK = int(os.getenv("TEXT_PAGES_PER_CHUNK", 4))
+TEXT_DOCUMENT_TIMEOUT = float(os.getenv("TEXT_DOCUMENT_TIMEOUT", 120))
+TEXT_TASKS_PER_CHILD = int(os.getenv("TEXT_TASKS_PER_CHILD", 50))
+
+
+class TextExtractionResult:
+    """Text of one PDF together with how long each page took to extract."""
+
+    def __init__(self, pdf_path, pages=None, error=None, timed_out=False, elapsed=0.0, page_count=None):
+        self.pdf_path = pdf_path
+        self.pages = sorted(pages or [])  # (page_number, text, seconds)
+        self.error = error
+        self.timed_out = timed_out
+        self.elapsed = elapsed
+        # Set when extraction stopped early on purpose; pages past the stop were never parsed
+        self.page_count = page_count
+
+    @property
+    def pages_skipped(self):
+        if self.page_count is None or self.error:
+            return 0
+        return max(0, self.page_count - len(self.pages))
+
+    @property
+    def text(self):
+        return "".join(text for _, text, _ in self.pages)
+
+    @property
+    def page_timings(self):
+        return [(page_number, seconds) for page_number, _, seconds in self.pages]
+
+    def summary(self):
+        slowest = max(self.page_timings, key=lambda timing: timing[1], default=(None, 0.0))
+        status = "timed out" if self.timed_out else ("failed" if self.error else "ok")
+        skipped = f", {self.pages_skipped} skipped" if self.pages_skipped else ""
+        return (
+            f"{os.path.basename(self.pdf_path)}: {len(self.pages)} pages in {self.elapsed:.2f}s ({status}{skipped}), "
+            f"slowest page {slowest[0]} took {slowest[1]:.2f}s"
+        )
+
+
+def count_pages(pdf_path):
+    """Page count from the page tree only, without any layout analysis."""
+    with Pdf.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(pdf_path, start, end, engine=None):
+    """Extract pages [start, end) of a PDF with the text engine; runs inside a worker process."""
+    return list(iter_page_texts(pdf_path, start, end, engine))
+
+
+def iter_pages(pdf_path, engine=None):
+    """
+    Yield (page_number, text, seconds) one page at a time, in order. Pages are
+    only parsed as they are consumed, so a caller that stops iterating never
+    pays for the rest of the document.
+    """
+    return iter_page_texts(pdf_path, engine=engine)
+
+
+def extract_leading_pages(pdf_path, is_complete=None, max_pages=0):
+    """
+    Extract pages in order until `is_complete(text so far)` is true or
+    `max_pages` pages (0 for no cap) have been read. The result's
+    `pages_skipped` says how many pages were never parsed.
+    """
+    began = time.perf_counter()
+    pages = []
+    try:
+        page_count = count_pages(pdf_path)
+        for page in iter_pages(pdf_path):
+            pages.append(page)
+            if max_pages and len(pages) >= max_pages:
+                break
+            if is_complete is not None and is_complete("".join(text for _, text, _ in pages)):
+                break
+    except Exception as e:
+        return TextExtractionResult(pdf_path, pages, error=str(e), elapsed=time.perf_counter() - began)
+    return TextExtractionResult(pdf_path, pages, elapsed=time.perf_counter() - began, page_count=page_count)
+
+
+class TextExtractionPool:
+    """
+    Extract PDF text on a pool of worker processes.
+    Large PDFs are split into page ranges that run in parallel, and calls from
+    several threads share the same workers, so a batch fans out across files.
+    Workers are replaced after `tasks_per_child` tasks, and a document that
+    exceeds `timeout` has its workers killed and replaced so it cannot stall
+    the rest of the batch.
+    """
+
+    def __init__(self, max_workers=TEXT_WORKERS, pages_per_chunk=TEXT_PAGES_PER_CHUNK,
+                 timeout=TEXT_DOCUMENT_TIMEOUT, tasks_per_child=TEXT_TASKS_PER_CHILD):
+        self.max_workers = max_workers
+        self.pages_per_chunk = pages_per_chunk
+        self.timeout = timeout
+        self.tasks_per_child = tasks_per_child
+        self._executor = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, max_tasks_per_child=self.tasks_per_child
+                )
+                self._generation += 1
+            return self._executor, self._generation
+
+    def recycle(self, generation=None):
+        """Kill the current workers; the next submission starts a fresh pool."""
+        with self._lock:
+            if self._executor is None or (generation is not None and generation != self._generation):
+                return
+            executor, self._executor = self._executor, None
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, pdf_path, ranges):
+        for attempt in range(2):
+            executor, generation = self._get_executor()
+            try:
+                futures = {
+                    executor.submit(extract_page_range, pdf_path, start, end): (start, end)
+                    for start, end in ranges
+                }
+                return futures, generation
+            except (BrokenProcessPool, RuntimeError):
+                # The pool was recycled or broken under us; start a fresh one and resubmit
+                if attempt:
+                    raise
+                self.recycle(generation)
+
+    def extract(self, pdf_path):
+        """Extract one PDF, waiting at most `timeout` seconds for all of its pages."""
+        began = time.perf_counter()
+        try:
+            page_count = count_pages(pdf_path)
+        except Exception as e:
+            return TextExtractionResult(pdf_path, error=str(e), elapsed=time.perf_counter() - began)
+
+        ranges = [
+            (start, min(start + self.pages_per_chunk, page_count))
+            for start in range(0, page_count, self.pages_per_chunk)
+        ]
+        deadline = time.monotonic() + self.timeout
+        pages = []
+        retried = False
+
+        while ranges:
+            futures, generation = self._submit(pdf_path, ranges)
+            done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+            ranges = []
+            for future in done:
+                try:
+                    pages.extend(future.result())
+                except BrokenProcessPool:
+                    # A worker died or another document's timeout recycled the pool; run this range again
+                    ranges.append(futures[future])
+                except Exception as e:
+                    return TextExtractionResult(pdf_path, pages, error=str(e), elapsed=time.perf_counter() - began)
+
+            if pending:
+                print(f"Warning: Text extraction timed out after {self.timeout}s for {pdf_path}; recycling workers")
+                self.recycle(generation)
+                return TextExtractionResult(
+                    pdf_path, pages, error="timeout", timed_out=True, elapsed=time.perf_counter() - began
+                )
+            if ranges:
+                if retried:
+                    return TextExtractionResult(
+                        pdf_path, pages, error="worker pool failed", elapsed=time.perf_counter() - began
+                    )
+                self.recycle(generation)
+                retried = True
+
+        return TextExtractionResult(pdf_path, pages, elapsed=time.perf_counter() - began)
+
+    def extract_leading(self, pdf_path, is_complete=None, max_pages=0):
+        """
+        extract_leading_pages() on one worker, under the same timeout.
+        Pages are read one after another so the stop condition can be checked
+        in between; `is_complete` must be a module-level (picklable) function.
+        """
+        began = time.perf_counter()
+        for attempt in range(2):
+            executor, generation = self._get_executor()
+            try:
+                future = executor.submit(extract_leading_pages, pdf_path, is_complete, max_pages)
+            except (BrokenProcessPool, RuntimeError):
+                self.recycle(generation)
+                continue
+            done, _ = wait([future], timeout=max(0.0, self.timeout - (time.perf_counter() - began)))
+            if not done:
+                print(f"Warning: Text extraction timed out after {self.timeout}s for {pdf_path}; recycling workers")
+                self.recycle(generation)
+                return TextExtractionResult(pdf_path, error="timeout", timed_out=True, elapsed=time.perf_counter() - began)
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                # A worker died or another document's timeout recycled the pool; run it again
+                self.recycle(generation)
+        return TextExtractionResult(pdf_path, error="worker pool failed", elapsed=time.perf_counter() - began)
+
+    def extract_many(self, pdf_paths):
+        """Extract several PDFs at once; results come back in the order of `pdf_paths`."""
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers * 2)) as threads:
+            return list(threads.map(self.extract, pdf_paths))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_text_extraction_pool():
+    """The process-wide extraction pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TextExtractionPool()
+        return _pool
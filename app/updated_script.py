@@ -1,8 +1,7 @@
 import pdfplumber
 import json
 import os
-from openai import OpenAIError
-from openai import ChatCompletion
+from app.field_extraction import complete_prompt
 
 
 PROMPT_TEMPLATE = """
@@ -39,22 +38,17 @@ def extract_text_with_pdfplumber(pdf_path):
 
 # Step 2: Extract Fields with AI
 def extract_with_ai(raw_text):
-    """Extract structured data from raw text using OpenAI's GPT model."""
+    """Extract structured data from raw text with the configured chat backend."""
     prompt = PROMPT_TEMPLATE.format(raw_text=raw_text)
 
     try:
-        response = ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        ai_content = response.choices[0].message.content.strip()
+        ai_content = complete_prompt(prompt)
         data = json.loads(ai_content)
         return data
-    except OpenAIError as e:
-        return {"error": str(e)}
     except json.JSONDecodeError:
         return {"error": "Invalid JSON response from AI."}
+    except Exception as e:
+        return {"error": str(e)}
 
 # Step 3: Process PDF End-to-End
 def process_pdf(pdf_path, output_folder="output_data"):
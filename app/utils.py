@@ -1,3 +1,11 @@
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+_ENCODINGS = {}
+
+
 def clean_numeric_field(value):
     """Remove currency symbols, commas, and whitespace from a numeric field."""
     try:
@@ -5,4 +13,16 @@ def clean_numeric_field(value):
             return float(value.replace('₹', '').replace(',', '').strip())
         return float(value)
     except ValueError:
-        return 0.0  
\ No newline at end of file
+        return 0.0  
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Count prompt tokens with tiktoken when installed, otherwise estimate about four characters per token."""
+    if tiktoken is None:
+        return max(1, len(text) // 4)
+    if model not in _ENCODINGS:
+        try:
+            _ENCODINGS[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _ENCODINGS[model] = tiktoken.get_encoding("cl100k_base")
+    return len(_ENCODINGS[model].encode(text))
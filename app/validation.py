@@ -0,0 +1,129 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .dates import NORMALIZE_DATES, normalize_dates_frame
+from .output_writers import open_output_writer, read_output
+
+# Premiums closer than this are the same amount, as in validate_and_calculate_premiums
+PREMIUM_TOLERANCE = 1e-2
+# Fields validate_frame() may correct, in report column order
+CORRECTED_FIELDS = ["NET_PREMIUM", "TOTAL_PREMIUM", "PACKAGE_LIABILITY", "REN_ROLL_NEW_USED"]
+# Registration types are whole words, so "Renewal" is not "New" and "Rollover" is not "Old"
+NEW_REGISTRATION = re.compile(r"\bnew\b", re.IGNORECASE)
+OLD_REGISTRATION = re.compile(r"\b(?:old|used)\b", re.IGNORECASE)
+# Copied into the report so each row can be traced back to its document
+REPORT_KEYS = ["S_No", "source_file", "POLICY_NO"]
+
+
+def _column(frame, name, default=0):
+    if name in frame:
+        return frame[name]
+    return pd.Series(default, index=frame.index, dtype=object)
+
+
+def _is_number(values):
+    return values.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+def registration_type(value):
+    """"New" or "Old" when `value` names one of them, otherwise None."""
+    text = "" if value is None else str(value)
+    if NEW_REGISTRATION.search(text):
+        return "New"
+    if OLD_REGISTRATION.search(text):
+        return "Old"
+    return None
+
+
+def parse_amounts(values):
+    """
+    Column counterpart of clean_numeric_field: strip rupee signs, commas and
+    whitespace and parse as floats; anything unparseable (N/A, blanks) is 0.0.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float).fillna(0.0)
+    text = values.astype(str).str.replace("₹", "", regex=False).str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(text, errors="coerce").fillna(0.0).astype(float)
+
+
+def validate_frame(frame):
+    """
+    Apply the per-record premium, package/liability and registration rules
+    (validate_and_calculate_premiums, validate_and_calculate_package_liability,
+    standardize_vehicle_registration) to a whole DataFrame of records at once.
+    Returns (validated copy, report); the report has one row per record with
+    a flag for each field in CORRECTED_FIELDS and their names in "corrected".
+    """
+    frame = frame.copy()
+    od = parse_amounts(_column(frame, "OD_PREMIUM"))
+    tp = parse_amounts(_column(frame, "TP_ONLY_PREMIUM"))
+    net = parse_amounts(_column(frame, "NET_PREMIUM"))
+    total = parse_amounts(_column(frame, "TOTAL_PREMIUM"))
+    report = pd.DataFrame({key: frame[key] for key in REPORT_KEYS if key in frame}, index=frame.index)
+
+    calculated_net = od + tp
+    net_fixed = (net == 0) | ((calculated_net - net).abs() > PREMIUM_TOLERANCE)
+    frame["NET_PREMIUM"] = _column(frame, "NET_PREMIUM").where(~net_fixed, calculated_net)
+    report["NET_PREMIUM"] = net_fixed
+
+    # The record path compares a non-zero TOTAL_PREMIUM with NET_PREMIUM as
+    # stored, which only succeeds once NET_PREMIUM is a number; next to an
+    # extracted string it leaves TOTAL_PREMIUM as it is there, and so it does here
+    net_value = net.where(~net_fixed, calculated_net)
+    total_fixed = (total == 0) | (
+        _is_number(frame["NET_PREMIUM"]) & ((total - net_value).abs() > PREMIUM_TOLERANCE)
+    )
+    frame["TOTAL_PREMIUM"] = _column(frame, "TOTAL_PREMIUM").where(~total_fixed, frame["NET_PREMIUM"])
+    report["TOTAL_PREMIUM"] = total_fixed
+
+    package = pd.Series(np.where(od == 0, "Liability Only Policy", "Package Policy"), index=frame.index)
+    report["PACKAGE_LIABILITY"] = _column(frame, "PACKAGE_LIABILITY", "N/A") != package
+    frame["PACKAGE_LIABILITY"] = package
+
+    # Values that name neither registration type (N/A, Rollover, Unknown) are left as they are
+    registration = _column(frame, "REN_ROLL_NEW_USED", "N/A")
+    text = registration.fillna("").astype(str)
+    is_new = text.str.contains(NEW_REGISTRATION)
+    is_old = ~is_new & text.str.contains(OLD_REGISTRATION)
+    standardized = registration.where(~is_new, "New").where(~is_old, "Old")
+    report["REN_ROLL_NEW_USED"] = (is_new | is_old) & (registration != standardized)
+    frame["REN_ROLL_NEW_USED"] = standardized
+
+    corrected = pd.Series("", index=frame.index)
+    for field in CORRECTED_FIELDS:
+        corrected = corrected + np.where(report[field], "," + field, "")
+    report["corrected"] = corrected.str.lstrip(",")
+
+    counts = {field: int(report[field].sum()) for field in CORRECTED_FIELDS if report[field].any()}
+    if counts:
+        print(f"Validated {len(frame)} records, corrected: {counts}")
+    return frame, report
+
+
+def revalidate_output(path, output_path=None, report_path=None, iso_dates=NORMALIZE_DATES):
+    """
+    Validate every record of an output file in one pass, normalizing its
+    dates too when `iso_dates` is set. Registration values the pipeline
+    already standardized are kept; only free text is rewritten. The validated records
+    go to `output_path` (default <name>.validated<ext>) in the same format and
+    the per-record report to `report_path` (default <name>.validation.csv).
+    Returns the report.
+    """
+    stem, extension = os.path.splitext(path)
+    output_path = output_path or f"{stem}.validated{extension}"
+    report_path = report_path or f"{stem}.validation.csv"
+
+    frame, report = validate_frame(read_output(path))
+    if iso_dates:
+        frame = normalize_dates_frame(frame)
+    # Writers append to an existing file; the result must hold this run only
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    with open_output_writer(output_path) as writer:
+        writer.write_many(frame.to_dict("records"))
+    report.to_csv(report_path, index=False)
+    print(f"Revalidated {len(frame)} records from {path} into {output_path}; report saved to {report_path}")
+    return report
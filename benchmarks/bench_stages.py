@@ -0,0 +1,219 @@
+"""
+Stage-level benchmark over the PDFs in test_pdfs/.
+
+Every stage of the pipeline is timed on its own so a change can be traced to
+the stage it affects. The LLM call is mocked with a configurable latency.
+
+    python -m benchmarks.bench_stages                    # compare with the stored baseline
+    python -m benchmarks.bench_stages --save-baseline    # record a new baseline
+    python -m benchmarks.bench_stages --llm-latency 0.5 --repeat 5
+
+Exits with status 1 when a stage is slower, or uses more memory, than the
+baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.field_extraction import FIELD_SCHEMA, build_prompt, extract_with_ai, map_field_variations
+from app.preprocessing import (
+    extract_text_with_engine,
+    save_data_to_excel,
+    standardize_vehicle_registration,
+    validate_and_calculate_package_liability,
+    validate_and_calculate_premiums,
+    validate_and_standardize_dates,
+)
+from app.prompt_budget import prune_text
+from app.rule_extraction import extract_with_rules
+from app.validation import validate_frame
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(REPO_ROOT, "test_pdfs")
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+# Differences below this many seconds per document (one millisecond) are treated as noise
+MIN_TIME_DELTA = 0.001
+MIN_MEMORY_DELTA = 256 * 1024
+
+
+def fake_llm_response(raw_text):
+    """A plausible LLM reply for `raw_text`: whatever the label rules find, N/A for the rest."""
+    data = {field: "N/A" for field in FIELD_SCHEMA}
+    data.update(extract_with_rules(raw_text))
+    return json.dumps(data)
+
+
+class StageRecorder:
+    """Times each stage and, when tracing, the peak memory it allocated on top of what was already live."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peak_memory = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            live = tracemalloc.get_traced_memory()[0]
+        began = time.perf_counter()
+        with patch("builtins.print"):  # The pipeline logs with print(); keep the report readable
+            yield
+        self.seconds[name] = time.perf_counter() - began
+        if self.trace_memory:
+            self.peak_memory[name] = tracemalloc.get_traced_memory()[1] - live
+
+
+def run_stages(pdf_paths, llm_latency, save_rows, recorder):
+    """Run every stage once over the corpus, recording each one in `recorder`."""
+    with recorder.stage("extract_text"):
+        texts = [extract_text_with_engine(path) for path in pdf_paths]
+
+    with recorder.stage("build_prompt"):
+        prompts = [build_prompt(prune_text(text)) for text in texts]
+
+    replies = iter([fake_llm_response(text) for text in texts])
+
+    def fake_create(**kwargs):
+        if llm_latency:
+            time.sleep(llm_latency)
+        return {"choices": [{"message": {"content": next(replies)}}]}
+
+    with patch("app.backends.openai.ChatCompletion.create", side_effect=fake_create):
+        with recorder.stage("extract_with_ai"):
+            records = [extract_with_ai(prompt) for prompt in prompts]
+
+    with recorder.stage("map_field_variations"):
+        records = [map_field_variations(record) for record in records]
+
+    unvalidated = [dict(record) for record in records]
+    with recorder.stage("validate"):
+        for record in records:
+            validate_and_calculate_premiums(record)
+            validate_and_calculate_package_liability(record)
+            validate_and_standardize_dates(record)
+            standardize_vehicle_registration(record)
+
+    with recorder.stage("validate_frame"):
+        validate_frame(pd.DataFrame(unvalidated))
+
+    rows = [dict(records[index % len(records)], S_No=index + 1) for index in range(save_rows or len(records))]
+    with tempfile.TemporaryDirectory() as tmp:
+        with recorder.stage("save_data_to_excel"):
+            save_data_to_excel(rows, os.path.join(tmp, "benchmark.xlsx"))
+
+
+def peak_memory(pdf_paths, save_rows):
+    """Peak memory per stage, from one extra run under tracemalloc (which is too slow to time)."""
+    recorder = StageRecorder(trace_memory=True)
+    tracemalloc.start()
+    try:
+        run_stages(pdf_paths, 0, save_rows, recorder)
+    finally:
+        tracemalloc.stop()
+    return recorder.peak_memory
+
+
+def benchmark(corpus, repeat, llm_latency, save_rows, measure_memory=True):
+    pdf_paths = sorted(
+        os.path.join(corpus, name) for name in os.listdir(corpus) if name.lower().endswith(".pdf")
+    )
+    if not pdf_paths:
+        raise SystemExit(f"No PDFs found in {corpus}")
+
+    runs = []
+    for _ in range(repeat):
+        recorder = StageRecorder()
+        run_stages(pdf_paths, llm_latency, save_rows, recorder)
+        runs.append(recorder.seconds)
+    memory = peak_memory(pdf_paths, save_rows) if measure_memory else {}
+
+    results = {}
+    for stage in runs[0]:
+        seconds = statistics.median(run[stage] for run in runs)
+        items = save_rows if stage == "save_data_to_excel" and save_rows else len(pdf_paths)
+        results[stage] = {
+            "seconds": seconds,
+            "seconds_per_item": seconds / items,
+            "items_per_second": items / seconds if seconds else float("inf"),
+            "peak_memory_bytes": memory.get(stage),
+        }
+    return {"documents": len(pdf_paths), "llm_latency": llm_latency, "stages": results}
+
+
+def find_regressions(results, baseline, threshold):
+    """Stages whose time per item or peak memory grew by more than `threshold` over the baseline."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        old_time, new_time = previous["seconds_per_item"], current["seconds_per_item"]
+        if new_time > old_time * (1 + threshold) and new_time - old_time > MIN_TIME_DELTA:
+            regressions.append(f"{stage}: {old_time * 1000:.1f} ms -> {new_time * 1000:.1f} ms per item")
+        old_memory, new_memory = previous.get("peak_memory_bytes"), current["peak_memory_bytes"]
+        if old_memory is None or new_memory is None:
+            continue
+        if new_memory > old_memory * (1 + threshold) and new_memory - old_memory > MIN_MEMORY_DELTA:
+            regressions.append(f"{stage}: peak memory {old_memory / 2**20:.1f} MB -> {new_memory / 2**20:.1f} MB")
+    return regressions
+
+
+def print_report(results):
+    print(f"{results['documents']} documents, mocked LLM latency {results['llm_latency']}s")
+    print(f"{'stage':<22}{'total s':>10}{'ms/item':>10}{'items/s':>10}{'peak MB':>10}")
+    for stage, result in results["stages"].items():
+        memory = "-" if result["peak_memory_bytes"] is None else f"{result['peak_memory_bytes'] / 2**20:.2f}"
+        print(
+            f"{stage:<22}{result['seconds']:>10.3f}{result['seconds_per_item'] * 1000:>10.2f}"
+            f"{result['items_per_second']:>10.1f}{memory:>10}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="folder of PDFs to run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the median is reported")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the mocked LLM call takes")
+    parser.add_argument("--save-rows", type=int, default=0, help="rows written by the save stage (default: one per PDF)")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the (slow) tracemalloc pass")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.corpus, max(1, args.repeat), args.llm_latency, args.save_rows, not args.skip_memory)
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print(f"No stage regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Speed and field-level accuracy of each text engine over the PDFs in test_pdfs/.
+
+Every engine extracts every PDF (without the fallback, so each engine is
+measured on its own, then once more with the fallback as configured). The
+label rules are run on each text and the fields they read are compared with
+the expected values: those in --expected when given (a JSON file of
+{"file.pdf": {"FIELD": "value"}}), otherwise what the reference engine's text
+yields.
+
+    python -m benchmarks.compare_text_engines
+    python -m benchmarks.compare_text_engines --engines pdfium --reference pdfplumber --json report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+from app.rule_extraction import extract_with_rules
+from app.text_engines import ENGINES, TEXT_FALLBACK_ENGINE, iter_page_texts, looks_garbled
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(REPO_ROOT, "test_pdfs")
+
+
+def _normalize(value):
+    return " ".join(str(value).split()).upper()
+
+
+def field_accuracy(fields, expected):
+    """(matching fields, expected fields): how many expected values `fields` reproduces."""
+    matches = sum(1 for field, value in expected.items() if _normalize(fields.get(field, "")) == _normalize(value))
+    return matches, len(expected)
+
+
+def run_engine(pdf_paths, engine, fallback=""):
+    """Text, seconds, garbled page count and rule fields for every PDF, in order."""
+    runs = []
+    for path in pdf_paths:
+        began = time.perf_counter()
+        with patch("builtins.print"):  # Fallback warnings would drown the report
+            try:
+                pages = list(iter_page_texts(path, engine=engine, fallback=fallback))
+                error = None
+            except Exception as e:
+                pages, error = [], str(e)
+        seconds = time.perf_counter() - began
+        text = "".join(page_text for _, page_text, _ in pages)
+        runs.append({
+            "file": os.path.basename(path),
+            "seconds": seconds,
+            "pages": len(pages),
+            "garbled_pages": sum(1 for _, page_text, _ in pages if looks_garbled(page_text)),
+            "error": error,
+            "fields": extract_with_rules(text),
+        })
+    return runs
+
+
+def compare(corpus, engines, reference, expected=None, fallback=TEXT_FALLBACK_ENGINE):
+    pdf_paths = sorted(
+        os.path.join(corpus, name) for name in os.listdir(corpus) if name.lower().endswith(".pdf")
+    )
+    if not pdf_paths:
+        raise SystemExit(f"No PDFs found in {corpus}")
+
+    variants = [(engine, "") for engine in engines]
+    variants += [(engine, fallback) for engine in engines if fallback and fallback != engine]
+    runs = {variant: run_engine(pdf_paths, *variant) for variant in variants}
+    source = "--expected" if expected is not None else reference
+    if expected is None:
+        reference_runs = runs.get((reference, "")) or run_engine(pdf_paths, reference)
+        expected = {run["file"]: run["fields"] for run in reference_runs}
+
+    report = {"documents": len(pdf_paths), "reference": source, "engines": {}}
+    for (engine, variant_fallback), engine_runs in runs.items():
+        matched = total = 0
+        for run in engine_runs:
+            run["matched"], run["expected"] = field_accuracy(run["fields"], expected.get(run["file"], {}))
+            matched += run["matched"]
+            total += run["expected"]
+        seconds = sum(run["seconds"] for run in engine_runs)
+        name = f"{engine}+{variant_fallback}" if variant_fallback else engine
+        report["engines"][name] = {
+            "seconds": seconds,
+            "pages_per_second": sum(run["pages"] for run in engine_runs) / seconds if seconds else float("inf"),
+            "garbled_pages": sum(run["garbled_pages"] for run in engine_runs),
+            "field_accuracy": matched / total if total else None,
+            "documents": [{key: value for key, value in run.items() if key != "fields"} for run in engine_runs],
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['documents']} documents, fields compared with {report['reference']}")
+    print(f"{'engine':<24}{'total s':>10}{'pages/s':>10}{'garbled':>10}{'accuracy':>10}")
+    for name, result in report["engines"].items():
+        accuracy = "-" if result["field_accuracy"] is None else f"{result['field_accuracy']:.1%}"
+        print(
+            f"{name:<24}{result['seconds']:>10.2f}{result['pages_per_second']:>10.1f}"
+            f"{result['garbled_pages']:>10}{accuracy:>10}"
+        )
+
+    names = list(report["engines"])
+    print()
+    print(f"{'document':<40}" + "".join(f"{name[:18]:>20}" for name in names))
+    for index, document in enumerate(report["engines"][names[0]]["documents"]):
+        cells = []
+        for name in names:
+            run = report["engines"][name]["documents"][index]
+            cells.append(f"{run['seconds']:.2f}s {run['matched']}/{run['expected']}")
+        print(f"{document['file'][:38]:<40}" + "".join(f"{cell:>20}" for cell in cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="folder of PDFs to run")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES), help="engines to compare")
+    parser.add_argument("--reference", default="pdfplumber", choices=list(ENGINES),
+                        help="engine whose fields count as correct when --expected is not given")
+    parser.add_argument("--expected", help="JSON file of expected field values per PDF")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    expected = None
+    if args.expected:
+        with open(args.expected) as f:
+            expected = json.load(f)
+
+    report = compare(args.corpus, args.engines, args.reference, expected)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Add premium rollup tables and upload indexes
+
+Revision ID: c4d2a7f9e1b3
+Revises: 6cf8b2d8c6a9
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d2a7f9e1b3'
+down_revision = '6cf8b2d8c6a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_premium_rollup',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('uploads', sa.Integer(), nullable=False),
+        sa.Column('total_premium', sa.Float(), nullable=False),
+        sa.Column('total_commission', sa.Float(), nullable=False),
+        sa.Column('net_premium', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table(
+        'daily_premium_rollup',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('uploads', sa.Integer(), nullable=False),
+        sa.Column('total_premium', sa.Float(), nullable=False),
+        sa.Column('total_commission', sa.Float(), nullable=False),
+        sa.Column('net_premium', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.create_index('ix_upload_user_id', ['user_id'], unique=False)
+        batch_op.create_index('ix_upload_upload_date', ['upload_date'], unique=False)
+        batch_op.create_index('ix_upload_user_id_upload_date', ['user_id', 'upload_date'], unique=False)
+
+    # Backfill from existing uploads; afterwards the application keeps the rollups current
+    op.execute("""
+        INSERT INTO user_premium_rollup (user_id, uploads, total_premium, total_commission, net_premium)
+        SELECT user_id, COUNT(id), COALESCE(SUM(total_premium), 0), COALESCE(SUM(commission), 0),
+               COALESCE(SUM(total_premium - commission), 0)
+        FROM upload GROUP BY user_id
+    """)
+    op.execute("""
+        INSERT INTO daily_premium_rollup (day, uploads, total_premium, total_commission, net_premium)
+        SELECT DATE(upload_date), COUNT(id), COALESCE(SUM(total_premium), 0), COALESCE(SUM(commission), 0),
+               COALESCE(SUM(total_premium - commission), 0)
+        FROM upload WHERE upload_date IS NOT NULL GROUP BY DATE(upload_date)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.drop_index('ix_upload_user_id_upload_date')
+        batch_op.drop_index('ix_upload_upload_date')
+        batch_op.drop_index('ix_upload_user_id')
+
+    op.drop_table('daily_premium_rollup')
+    op.drop_table('user_premium_rollup')
@@ -0,0 +1,76 @@
+"""Add policy_record table
+
+Revision ID: d7b3e5a1c9f2
+Revises: c4d2a7f9e1b3
+Create Date: 2026-10-18 11:02:17.554190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b3e5a1c9f2'
+down_revision = 'c4d2a7f9e1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'policy_record',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('upload_id', sa.Integer(), nullable=False),
+        sa.Column('source_file', sa.String(length=255), nullable=True),
+        sa.Column('s_no', sa.Integer(), nullable=True),
+        sa.Column('year', sa.String(length=20), nullable=True),
+        sa.Column('month', sa.String(length=20), nullable=True),
+        sa.Column('date', sa.String(length=20), nullable=True),
+        sa.Column('insurance_company_name', sa.String(length=255), nullable=True),
+        sa.Column('broker_name', sa.String(length=255), nullable=True),
+        sa.Column('imd_code', sa.String(length=100), nullable=True),
+        sa.Column('lob', sa.String(length=100), nullable=True),
+        sa.Column('package_liability', sa.String(length=100), nullable=True),
+        sa.Column('fuel_type', sa.String(length=50), nullable=True),
+        sa.Column('ren_roll_new_used', sa.String(length=50), nullable=True),
+        sa.Column('customer_name', sa.String(length=255), nullable=True),
+        sa.Column('mob_no', sa.String(length=50), nullable=True),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('reg_number', sa.String(length=50), nullable=True),
+        sa.Column('vehicle_make', sa.String(length=100), nullable=True),
+        sa.Column('vehicle_model', sa.String(length=255), nullable=True),
+        sa.Column('cc_gvw', sa.String(length=50), nullable=True),
+        sa.Column('bike_scooter', sa.String(length=50), nullable=True),
+        sa.Column('year_of_manufacture', sa.String(length=20), nullable=True),
+        sa.Column('engine_number', sa.String(length=100), nullable=True),
+        sa.Column('chasis_number', sa.String(length=100), nullable=True),
+        sa.Column('policy_no', sa.String(length=100), nullable=True),
+        sa.Column('idv_sum_insured', sa.Float(), nullable=True),
+        sa.Column('ncb', sa.String(length=20), nullable=True),
+        sa.Column('risk_start_date', sa.String(length=20), nullable=True),
+        sa.Column('od_expire_date', sa.String(length=20), nullable=True),
+        sa.Column('renewal_date', sa.String(length=20), nullable=True),
+        sa.Column('od_premium', sa.Float(), nullable=True),
+        sa.Column('tp_only_premium', sa.Float(), nullable=True),
+        sa.Column('net_premium', sa.Float(), nullable=True),
+        sa.Column('total_premium', sa.Float(), nullable=True),
+        sa.Column('policy_issue_day', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['upload_id'], ['upload.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('policy_record', schema=None) as batch_op:
+        batch_op.create_index('ix_policy_record_user_id', ['user_id'], unique=False)
+        batch_op.create_index('ix_policy_record_upload_id', ['upload_id'], unique=False)
+        batch_op.create_index('ix_policy_record_policy_no', ['policy_no'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('policy_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_policy_record_policy_no')
+        batch_op.drop_index('ix_policy_record_upload_id')
+        batch_op.drop_index('ix_policy_record_user_id')
+
+    op.drop_table('policy_record')
@@ -0,0 +1,46 @@
+"""Add output_artifact table
+
+Revision ID: e5c1f8a3b2d4
+Revises: d7b3e5a1c9f2
+Create Date: 2026-10-18 14:21:40.318822
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1f8a3b2d4'
+down_revision = 'd7b3e5a1c9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'output_artifact',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=36), nullable=True),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('etag', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_accessed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('filename'),
+    )
+    with op.batch_alter_table('output_artifact', schema=None) as batch_op:
+        batch_op.create_index('ix_output_artifact_user_id', ['user_id'], unique=False)
+        batch_op.create_index('ix_output_artifact_job_id', ['job_id'], unique=False)
+        batch_op.create_index('ix_output_artifact_last_accessed_at', ['last_accessed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('output_artifact', schema=None) as batch_op:
+        batch_op.drop_index('ix_output_artifact_last_accessed_at')
+        batch_op.drop_index('ix_output_artifact_job_id')
+        batch_op.drop_index('ix_output_artifact_user_id')
+
+    op.drop_table('output_artifact')
@@ -0,0 +1,70 @@
+"""Add policy_key table for duplicate detection
+
+Revision ID: f2a9c4e7d1b6
+Revises: e5c1f8a3b2d4
+Create Date: 2026-10-18 17:05:12.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c4e7d1b6'
+down_revision = 'e5c1f8a3b2d4'
+branch_labels = None
+depends_on = None
+
+
+# As in app/duplicates.py when this revision was written
+_KEY_COLUMNS = {'POLICY_NO': 'policy_no', 'CHASIS_NUMBER': 'chasis_number', 'ENGINE_NUMBER': 'engine_number'}
+_MISSING = {'', 'N/A', 'NOT FOUND', 'NA', 'NONE'}
+_MIN_KEY_LENGTH = 6
+
+
+def _policy_keys(row):
+    keys = []
+    for field, column in _KEY_COLUMNS.items():
+        value = getattr(row, column)
+        if value is None or str(value).strip().upper() in _MISSING:
+            continue
+        key = ''.join(char for char in str(value).upper() if char.isalnum())
+        if len(key) >= _MIN_KEY_LENGTH:
+            keys.append((field, key))
+    return keys
+
+
+def upgrade():
+    policy_key = op.create_table(
+        'policy_key',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('policy_record_id', sa.Integer(), nullable=False),
+        sa.Column('field', sa.String(length=20), nullable=False),
+        sa.Column('value', sa.String(length=100), nullable=False),
+        sa.ForeignKeyConstraint(['policy_record_id'], ['policy_record.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('policy_key', schema=None) as batch_op:
+        batch_op.create_index('ix_policy_key_policy_record_id', ['policy_record_id'], unique=False)
+        batch_op.create_index('ix_policy_key_field_value', ['field', 'value'], unique=False)
+
+    # Register the policies stored before this table existed
+    connection = op.get_bind()
+    stored = connection.execute(sa.text(
+        'SELECT id, policy_no, chasis_number, engine_number FROM policy_record'
+    ))
+    rows = [
+        {'policy_record_id': row.id, 'field': field, 'value': value[:100]}
+        for row in stored
+        for field, value in _policy_keys(row)
+    ]
+    if rows:
+        op.bulk_insert(policy_key, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('policy_key', schema=None) as batch_op:
+        batch_op.drop_index('ix_policy_key_field_value')
+        batch_op.drop_index('ix_policy_key_policy_record_id')
+
+    op.drop_table('policy_key')
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from app import metrics
+from app.artifacts import ArtifactStore
+from app.models import db, OutputArtifact, User
+
+
+class TestArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp.name, "output")
+        self.upload_dir = os.path.join(self.tmp.name, "uploads")
+        os.makedirs(self.output_dir)
+        os.makedirs(self.upload_dir)
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.owner = User(username='owner', password='x', role='user')
+        self.other = User(username='other', password='x', role='user')
+        self.admin = User(username='admin', password='x', role='admin')
+        db.session.add_all([self.owner, self.other, self.admin])
+        db.session.commit()
+        self.store = ArtifactStore(self.output_dir, self.upload_dir, timedelta(days=7), timedelta(hours=24))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        self.tmp.cleanup()
+
+    def write(self, directory, name, content=b"0123456789", age=None):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        if age is not None:
+            stamp = (datetime.utcnow() - age).timestamp()
+            os.utime(path, (stamp, stamp))
+        return path
+
+    def test_downloads_are_owner_only_and_conditional(self):
+        artifact = self.store.register(self.write(self.output_dir, "out.xlsx"), self.owner.id, "job-1")
+
+        self.assertIsNone(self.store.get("out.xlsx", self.other))
+        self.assertIsNotNone(self.store.get("out.xlsx", self.admin))
+        self.assertIsNotNone(self.store.get("out.xlsx", self.owner))
+
+        with self.app.test_request_context(headers={"If-None-Match": f'"{artifact.etag}"'}):
+            self.assertEqual(self.store.send(artifact).status_code, 304)
+        with self.app.test_request_context(headers={"Range": "bytes=2-5"}):
+            response = self.store.send(artifact)
+            response.direct_passthrough = False
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.get_data(), b"2345")
+            self.assertIn("Last-Modified", response.headers)
+            response.close()
+
+    def test_sweep_applies_retention(self):
+        old = self.store.register(self.write(self.output_dir, "old.xlsx"), self.owner.id)
+        self.store.register(self.write(self.output_dir, "fresh.xlsx"), self.owner.id)
+        old.last_accessed_at = datetime.utcnow() - timedelta(days=8)
+        db.session.commit()
+        self.write(self.output_dir, "legacy.xlsx", age=timedelta(days=30))
+        self.write(self.output_dir, "recent.csv.journal.jsonl", age=timedelta(hours=1))
+        orphan = os.path.join(self.upload_dir, "orphan")
+        running = os.path.join(self.upload_dir, "running")
+        for directory in (orphan, running):
+            os.makedirs(directory)
+            stamp = (datetime.utcnow() - timedelta(days=2)).timestamp()
+            os.utime(directory, (stamp, stamp))
+
+        removed = self.store.sweep(active_dirs=[running])
+
+        self.assertEqual(removed, {"artifacts": 1, "untracked_outputs": 1, "temp_dirs": 1})
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["fresh.xlsx", "recent.csv.journal.jsonl"])
+        self.assertEqual(os.listdir(self.upload_dir), ["running"])
+        self.assertEqual([a.filename for a in OutputArtifact.query.all()], ["fresh.xlsx"])
+        self.assertEqual(metrics.DISK_FILES.value(area="outputs"), 2)
+        self.assertEqual(metrics.DISK_BYTES.value(area="outputs"), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
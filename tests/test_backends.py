@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from unittest.mock import patch
+
+from app.backends import RULES_VERSION, OpenAICompatibleBackend, RulesBackend, use_backend
+from app.field_extraction import complete_prompt, extract_with_ai
+from tests.test_rate_limit import FakeOpenAIHandler
+
+SCHEDULE = (
+    "PolicyRef No. 201520070124700944100000\nInsured AMIT KUMAR SHUKLA\n"
+    "TOTAL LIABILITY PREMIUM ` 3,466.00\nNet Premium ` 3,466.00\n"
+)
+
+
+class TestBackends(unittest.TestCase):
+    def test_rules_backend_runs_offline(self):
+        with patch("app.backends.openai.ChatCompletion.create") as mock_openai, use_backend("rules"):
+            data = extract_with_ai(SCHEDULE, fields=["POLICY_NO", "NET_PREMIUM", "VEHICLE_MAKE"])
+
+        mock_openai.assert_not_called()
+        self.assertEqual(data, {"POLICY_NO": "201520070124700944100000", "NET_PREMIUM": "3,466.00", "VEHICLE_MAKE": "N/A"})
+
+    def test_openai_compatible_backend_retries_over_its_own_session(self):
+        FakeOpenAIHandler.failures = 1
+        FakeOpenAIHandler.requests_seen = 0
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            backend = OpenAICompatibleBackend(base_url=f"http://127.0.0.1:{server.server_port}/v1", timeout=5)
+            with patch("app.rate_limit.time.sleep"):
+                content = complete_prompt("Extract the policy number", backend=backend)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn("201520070124700944100000", content)
+        self.assertEqual(FakeOpenAIHandler.requests_seen, 2)
+
+    def test_rules_backend_selectable_by_config(self):
+        # EXTRACTION_VERSION is computed at import, so the backend must be chosen in a fresh interpreter
+        env = {**os.environ, "EXTRACTION_BACKEND": "rules"}
+        result = subprocess.run(
+            [sys.executable, "-c", "import app.preprocessing as p; print(p.PIPELINE_VERSION)"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(result.stdout.strip().startswith(f"rules:{RULES_VERSION}:"))
+
+    def test_rules_backend_does_not_chat(self):
+        with self.assertRaises(NotImplementedError):
+            RulesBackend().chat("prompt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+from benchmarks.bench_stages import find_regressions
+
+
+def results(seconds_per_item, peak_memory_bytes):
+    return {"stages": {"extract_text": {"seconds_per_item": seconds_per_item, "peak_memory_bytes": peak_memory_bytes}}}
+
+
+class TestBenchmarkRegressions(unittest.TestCase):
+    def test_threshold_and_noise_floor(self):
+        baseline = results(0.100, 10 * 2**20)
+
+        self.assertEqual(find_regressions(results(0.115, 11 * 2**20), baseline, 0.2), [])
+        self.assertEqual(len(find_regressions(results(0.200, 20 * 2**20), baseline, 0.2)), 2)
+        # A large relative change on a sub-millisecond stage is noise
+        self.assertEqual(find_regressions(results(0.0009, None), results(0.0001, None), 0.2), [])
+        # Anything from a millisecond up is not
+        self.assertEqual(len(find_regressions(results(0.0025, None), results(0.001, None), 0.2)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.cache import ExtractionCache
+
+
+class TestExtractionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ExtractionCache(os.path.join(self.tmp.name, "cache.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_results_are_keyed_by_hash_and_version(self):
+        self.cache.put_text("abc", "PolicyRef No. 123")
+        self.cache.put_result("abc", "v1", {"POLICY_NO": "123"})
+
+        self.assertEqual(self.cache.get_text("abc"), "PolicyRef No. 123")
+        self.assertEqual(self.cache.get_result("abc", "v1"), {"POLICY_NO": "123"})
+        self.assertIsNone(self.cache.get_result("abc", "v2"))
+
+        removed = self.cache.invalidate_version("v1")
+        self.assertEqual(removed, 1)
+        self.assertIsNone(self.cache.get_result("abc", "v1"))
+        # Raw text survives a prompt/model version change
+        self.assertEqual(self.cache.get_text("abc"), "PolicyRef No. 123")
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["text_hits"], 2)
+        self.assertEqual(stats["result_hits"], 1)
+        self.assertEqual(stats["result_misses"], 2)
+
+    def test_size_and_ttl_eviction(self):
+        self.cache.max_bytes = 25
+        self.cache.put_text("old", "x" * 20)
+        self.cache.put_text("new", "y" * 20)
+        self.assertIsNone(self.cache.get_text("old"))
+        self.assertEqual(self.cache.get_text("new"), "y" * 20)
+
+        self.cache.ttl_seconds = 0
+        with patch("app.cache.time.time", return_value=10 ** 10):
+            self.assertIsNone(self.cache.get_text("new"))
+
+
+    def test_running_total_follows_every_write(self):
+        self.cache.put_text("a", "x" * 10)
+        self.cache.put_text("a", "x" * 4)
+        self.cache.put_result("a", "v1", {"POLICY_NO": "P1"})
+        self.cache.put_ocr("page", "abc")
+        self.cache.invalidate_version("v1")
+        self.assertEqual(self.cache.stats()["total_bytes"], 7)
+
+        self.cache.max_bytes = 5
+        with patch("app.cache.EVICTION_BATCH", 1):
+            self.cache.put_ocr("page2", "de")
+        self.assertEqual(self.cache.stats()["total_bytes"], 5)
+        self.assertIsNone(self.cache.get_text("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from datetime import date
+import pandas as pd
+from app.dates import DateNormalizer, date_shape, normalize_dates, normalize_dates_frame
+
+
+class TestDateNormalizer(unittest.TestCase):
+    def test_parses_insurer_formats(self):
+        normalizer = DateNormalizer()
+
+        self.assertEqual(normalizer.parse("02/12/2024", "BAJAJ ALLIANZ"), date(2024, 12, 2))
+        self.assertEqual(normalizer.parse("04-Dec-2024 00:00 hrs", "TATA AIG"), date(2024, 12, 4))
+        self.assertEqual(normalizer.parse("2024-12-02 00:00:00"), date(2024, 12, 2))
+        self.assertIsNone(normalizer.parse("N/A"))
+
+    def test_format_detected_once_per_insurer_and_shape(self):
+        normalizer = DateNormalizer()
+        normalizer.parse("02/12/2024", "Bajaj Allianz")
+        normalizer.parse("15/01/2025", "BAJAJ  ALLIANZ")
+        normalizer.parse("4 Dec 2024", "Bajaj Allianz")
+
+        self.assertEqual(normalizer._formats, {
+            ("BAJAJ ALLIANZ", date_shape("02/12/2024")): "%d/%m/%Y",
+            ("BAJAJ ALLIANZ", date_shape("4 Dec 2024")): "%d %b %Y",
+        })
+
+    def test_parse_many_matches_parse(self):
+        values = ["02/12/2024", "31/12/2024", "99/99/2024", "04-Dec-2024", "", None, "Dec 4, 2024"]
+        insurers = ["UNITED INDIA"] * len(values)
+
+        self.assertEqual(
+            DateNormalizer().parse_many(values, insurers),
+            [DateNormalizer().parse(value, insurer) for value, insurer in zip(values, insurers)],
+        )
+
+    def test_normalize_dates_derives_booking_fields(self):
+        record = {
+            "INSURANCE_COMPANY_NAME": "LIBERTY",
+            "RISK_START_DATE": "04/12/2024",
+            "OD_EXPIRE_DATE": "03/12/2025",
+            "RENEWAL_DATE": "N/A",
+            "POLICY_ISSUE_DAY": "02-Dec-2024",
+            "YEAR": "N/A",
+        }
+        expected = {
+            "INSURANCE_COMPANY_NAME": "LIBERTY",
+            "RISK_START_DATE": "2024-12-04",
+            "OD_EXPIRE_DATE": "2025-12-03",
+            "RENEWAL_DATE": "2025-12-03",
+            "POLICY_ISSUE_DAY": "2024-12-02",
+            "YEAR": "2024",
+            "MONTH": "DEC",
+            "DATE": "2024-12-02",
+        }
+
+        frame = normalize_dates_frame(pd.DataFrame([dict(record)]))
+        self.assertEqual(normalize_dates(dict(record), DateNormalizer()), expected)
+        self.assertEqual(frame.to_dict("records"), [expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
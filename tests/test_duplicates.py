@@ -0,0 +1,153 @@
+import unittest
+from flask import Flask
+from app.duplicates import BloomFilter, DuplicateRegistry, normalize_key, policy_keys, policy_period
+from app.models import db, User, PolicyKey, PolicyRecord, find_policy_duplicate, iter_policy_keys, save_policy_records
+
+
+def record(policy_no, chassis="N/A", engine="N/A", **fields):
+    return {"POLICY_NO": policy_no, "CHASIS_NUMBER": chassis, "ENGINE_NUMBER": engine, **fields}
+
+
+class TestDuplicateRegistry(unittest.TestCase):
+    def test_policy_keys_normalize_and_skip_placeholders(self):
+        self.assertEqual(normalize_key("og-25 1316/0001"), "OG2513160001")
+        self.assertEqual(
+            policy_keys(record("OG-25-1316-0001", chassis="N/A", engine="NEW")),
+            [("POLICY_NO", "OG2513160001")],
+        )
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for index in range(1000):
+            bloom.add(f"key{index}")
+        self.assertTrue(all(f"key{index}" in bloom for index in range(1000)))
+        false_positives = sum(f"other{index}" in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_claim_flags_any_shared_identifier(self):
+        registry = DuplicateRegistry()
+        self.assertIsNone(registry.claim(record("P-100001", chassis="MA1TA2XYZ", RISK_START_DATE="04/12/2024"), "run1", "a.pdf"))
+        self.assertEqual(
+            registry.claim(record("P-999999", chassis="ma1ta2 xyz", RISK_START_DATE="2024-12-04"), "run2", "b.pdf"),
+            "a.pdf (CHASIS_NUMBER MA1TA2XYZ)",
+        )
+        # A run rechecking its own keys, e.g. after the LLM filled more fields, is not a duplicate
+        self.assertIsNone(registry.claim(record("P-100001", engine="ENG12345"), "run1", "a.pdf"))
+
+        registry.forget("run1")
+        self.assertIsNone(registry.claim(record("P-100001"), "run3", "a.pdf"))
+
+    def test_renewal_of_the_same_vehicle_is_not_a_duplicate(self):
+        this_year = record("P-100001", chassis="MA1TA2XYZ", engine="ENG12345",
+                           RISK_START_DATE="04/12/2024", OD_EXPIRE_DATE="03/12/2025")
+        renewal = record("P-200002", chassis="MA1TA2XYZ", engine="ENG12345",
+                         RISK_START_DATE="04/12/2025", OD_EXPIRE_DATE="03/12/2026")
+        self.assertEqual(policy_period(this_year), ("2024-12-04", "2025-12-03"))
+
+        registry = DuplicateRegistry()
+        self.assertIsNone(registry.claim(this_year, "run1", "2024.pdf"))
+        self.assertIsNone(registry.claim(renewal, "run2", "2025.pdf"))
+        # Another copy of the renewal matches the renewal, not the policy it renewed
+        self.assertEqual(
+            registry.claim({**renewal, "POLICY_NO": "N/A", "RISK_START_DATE": "N/A"}, "run3", "copy.pdf"),
+            "2025.pdf (CHASIS_NUMBER MA1TA2XYZ)",
+        )
+        # Without either date a vehicle match cannot be told from a renewal
+        self.assertIsNone(registry.claim(record("P-300003", chassis="MA1TA2XYZ"), "run4", "undated.pdf"))
+
+        # The rules missed the dates; the recheck once the LLM filled them records the period
+        registry.forget("run4")
+        self.assertIsNone(registry.claim(record("P-400004", engine="ENG99999"), "run5", "late.pdf"))
+        self.assertIsNone(registry.claim(record("P-400004", engine="ENG99999", RISK_START_DATE="01/01/2025"), "run5", "late.pdf"))
+        self.assertEqual(
+            registry.claim(record("P-500005", engine="ENG99999", RISK_START_DATE="01-01-2025"), "run6", "again.pdf"),
+            "late.pdf (ENGINE_NUMBER ENG99999)",
+        )
+
+    def test_lookup_confirms_stored_keys_and_release_defers_to_it(self):
+        stored = {("POLICY_NO", "P100001"): "old.pdf stored 2025-01-03"}
+        lookups = []
+
+        def lookup(keys, period):
+            lookups.append(keys)
+            for key in keys:
+                if key in stored:
+                    return (*key, stored[key])
+            return None
+
+        def load(after_id):
+            return [(key_id, *key) for key_id, key in enumerate(stored, start=1) if key_id > after_id]
+
+        registry = DuplicateRegistry(lookup=lookup, load=load)
+        self.assertEqual(registry.claim(record("P100001"), "run1", "a.pdf"), "old.pdf stored 2025-01-03 (POLICY_NO P100001)")
+        # Keys missing from the loaded filter never reach the database
+        lookups.clear()
+        self.assertIsNone(registry.claim(record("P200002"), "run2", "b.pdf"))
+        self.assertEqual(lookups, [])
+
+        registry.release([record("P200002")])
+        stored[("POLICY_NO", "P200002")] = "b.pdf stored 2025-01-04"
+        self.assertEqual(registry.claim(record("P200002"), "run3", "c.pdf"), "b.pdf stored 2025-01-04 (POLICY_NO P200002)")
+
+    def test_keys_stored_by_other_processes_join_the_filter(self):
+        stored = []
+        registry = DuplicateRegistry(
+            lookup=lambda keys, period: next(((*key, "other.pdf") for key in keys if key in stored), None),
+            load=lambda after_id: [(key_id, *key) for key_id, key in enumerate(stored, start=1) if key_id > after_id],
+            refresh_seconds=0,
+        )
+        self.assertIsNone(registry.claim(record("P100001"), "run1", "a.pdf"))
+        registry.forget("run1")
+        # Saved by another worker or the CLI after this filter was loaded
+        stored.append(("POLICY_NO", "P300003"))
+        self.assertEqual(registry.claim(record("P300003"), "run2", "b.pdf"), "other.pdf (POLICY_NO P300003)")
+
+    def test_lookup_runs_outside_the_lock(self):
+        locked = []
+        registry = DuplicateRegistry(lookup=lambda keys, period: locked.append(registry._lock.locked()))
+        self.assertIsNone(registry.claim(record("P100001"), "run1", "a.pdf"))
+        self.assertEqual(locked, [False])
+
+
+class TestPolicyKeys(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.user = User(username='agent', password='x', role='user')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_saved_records_are_found_and_duplicates_not_stored(self):
+        saved = save_policy_records([
+            record("P-100001", chassis="MA1TA2XYZ", TOTAL_PREMIUM=1000.0, source_file="a.pdf",
+                   RISK_START_DATE="04/12/2024", OD_EXPIRE_DATE="03/12/2025"),
+            record("P-100001", TOTAL_PREMIUM=1000.0, source_file="b.pdf", DUPLICATE_OF="a.pdf (POLICY_NO P100001)"),
+        ], self.user.id)
+
+        self.assertEqual(saved, 1)
+        self.assertEqual(PolicyRecord.query.count(), 1)
+        keys = list(iter_policy_keys())
+        self.assertEqual(sorted(key[1:] for key in keys), [("CHASIS_NUMBER", "MA1TA2XYZ"), ("POLICY_NO", "P100001")])
+        self.assertEqual(list(iter_policy_keys(after_id=keys[-1][0])), [])
+        keys = [("POLICY_NO", "X00000"), ("CHASIS_NUMBER", "MA1TA2XYZ")]
+        field, value, description = find_policy_duplicate(keys, ("2024-12-04", None))
+        self.assertEqual((field, value), ("CHASIS_NUMBER", "MA1TA2XYZ"))
+        self.assertTrue(description.startswith("a.pdf stored "))
+        # The next year's policy of the same vehicle is a renewal
+        self.assertIsNone(find_policy_duplicate(keys, ("2025-12-04", "2026-12-03")))
+        self.assertEqual(find_policy_duplicate([("POLICY_NO", "P100001")], ("2025-12-04", None))[:2], ("POLICY_NO", "P100001"))
+        self.assertIsNone(find_policy_duplicate([("POLICY_NO", "X00000")]))
+        self.assertEqual(PolicyKey.query.count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
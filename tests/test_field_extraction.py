@@ -1,12 +1,12 @@
 import unittest
 from unittest.mock import patch
 import json
-from app.field_extraction import extract_with_ai
+from app.field_extraction import extract_with_ai, map_field_variations
 
 
 class TestFieldExtraction(unittest.TestCase):
 
-    @patch("app.field_extraction.openai.ChatCompletion.create")
+    @patch("app.backends.openai.ChatCompletion.create")
     def test_extract_with_ai(self, mock_openai):
         # Mock API response
         mock_openai.return_value = {
@@ -52,7 +52,7 @@ class TestFieldExtraction(unittest.TestCase):
         self.assertEqual(extracted_data["customer_name"], "AMIT KUMAR SHUKLA")
         self.assertEqual(extracted_data["total_premium"], "4090.00")
 
-    @patch("app.field_extraction.openai.ChatCompletion.create")
+    @patch("app.backends.openai.ChatCompletion.create")
     def test_error_handling(self, mock_openai):
         # Mock API error response
         mock_openai.return_value = {
@@ -75,6 +75,23 @@ class TestFieldExtraction(unittest.TestCase):
         # Assertions
         self.assertIn("error", extracted_data)
 
+    def test_map_field_variations(self):
+        data = map_field_variations({
+            "Total": "100",
+            "TOTAL PREMIUM": "4,090.00",
+            "Net Own Damage Premium (A)": "1,045.00",
+            "policy_no": "D178074533",
+            "NET_PREMIUM": "3,466.00",
+            "Net Premium": "9,999.00",
+        })
+
+        self.assertEqual(data, {
+            "TOTAL_PREMIUM": "4,090.00",
+            "OD_PREMIUM": "1,045.00",
+            "POLICY_NO": "D178074533",
+            "NET_PREMIUM": "3,466.00",
+        })
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import io
+import os
+import tempfile
+import unittest
+from app.cache import hash_pdf
+from app.ingestion import UploadIngestor
+
+PDF = b"%PDF-1.7\n1 0 obj\n<< /Type /Catalog >>\nendobj\nxref\n0 1\ntrailer\n<< /Root 1 0 R >>\nstartxref\n45\n%%EOF\n"
+
+
+class TestUploadIngestion(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_valid_pdf_is_written_and_hashed_in_one_pass(self):
+        ingestor = UploadIngestor(self.tmp.name)
+        ingested = ingestor.ingest(io.BytesIO(PDF), "policy.pdf")
+
+        self.assertTrue(ingested.is_valid)
+        self.assertEqual(ingested.size, len(PDF))
+        self.assertEqual(ingested.content_hash, hash_pdf(ingested.path))
+
+    def test_rejected_files_are_removed(self):
+        ingestor = UploadIngestor(self.tmp.name)
+        not_pdf = ingestor.ingest(io.BytesIO(b"<html></html>"), "page.pdf")
+        truncated = ingestor.ingest(io.BytesIO(PDF[:60]), "truncated.pdf")
+        bad_offset = ingestor.ingest(io.BytesIO(PDF.replace(b"startxref\n45", b"startxref\n9999")), "offset.pdf")
+
+        for ingested in (not_pdf, truncated, bad_offset):
+            self.assertFalse(ingested.is_valid)
+            self.assertFalse(os.path.exists(ingested.path))
+
+    def test_size_limits(self):
+        ingestor = UploadIngestor(self.tmp.name, max_file_bytes=len(PDF) + 10, max_batch_bytes=len(PDF) * 3)
+        self.assertTrue(ingestor.ingest(io.BytesIO(PDF), "a.pdf").is_valid)
+
+        too_big = ingestor.ingest(io.BytesIO(PDF + b" " * 50), "big.pdf")
+        self.assertIn("larger than", too_big.error)
+        self.assertFalse(os.path.exists(too_big.path))
+
+        self.assertTrue(ingestor.ingest(io.BytesIO(PDF), "b.pdf").is_valid)
+        self.assertTrue(ingestor.ingest(io.BytesIO(PDF), "c.pdf").is_valid)
+        self.assertEqual(ingestor.ingest(io.BytesIO(PDF), "d.pdf").error, "upload batch size limit reached")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import csv
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from app.jobs import Job, JobManager
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = JobManager(max_workers=3)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    @patch("app.jobs.process_pdf")
+    def test_job_processes_every_file_in_order(self, mock_process_pdf):
+        mock_process_pdf.side_effect = lambda path, user_id, **kwargs: {"POLICY_NO": os.path.basename(path)}
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "out.csv")
+            files = [f"/uploads/file_{i}.pdf" for i in range(5)]
+
+            job = self.manager.submit(files, output_path, user_id=1)
+            self.assertTrue(job.wait(5))
+
+            self.assertEqual(job.status, "completed")
+            self.assertEqual(job.processed_files, 5)
+            with open(output_path, newline="") as f:
+                saved = list(csv.DictReader(f))
+            self.assertEqual([row["S_No"] for row in saved], ["1", "2", "3", "4", "5"])
+            self.assertEqual(saved[0]["source_file"], "file_0.pdf")
+            self.assertIs(self.manager.get(job.id), job)
+
+    @patch("app.jobs.open_output_writer")
+    @patch("app.jobs.process_pdf")
+    def test_failed_files_are_reported(self, mock_process_pdf, mock_open_writer):
+        mock_process_pdf.return_value = None
+        events = []
+        self.manager.on_progress = lambda job, file_name, status: events.append(status)
+
+        job = self.manager.submit(["/uploads/bad.pdf"], "/nonexistent/out.xlsx", user_id=1)
+        self.assertTrue(job.wait(5))
+
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.results[0]["status"], "failed")
+        mock_open_writer.assert_not_called()
+        self.assertEqual(events, ["Failed", "Processing Failed"])
+
+    @patch("app.jobs.process_pdf")
+    def test_stage_progress_is_reported(self, mock_process_pdf):
+        def process(path, user_id, on_stage=None, **kwargs):
+            on_stage("Text Extracted")
+            on_stage("Fields Extracted")
+            return {"POLICY_NO": "1"}
+
+        mock_process_pdf.side_effect = process
+        events = []
+        self.manager.on_progress = lambda job, file_name, status: events.append(status)
+        with tempfile.TemporaryDirectory() as tmp:
+            job = self.manager.submit(["/uploads/a.pdf"], os.path.join(tmp, "out.csv"), user_id=1)
+            self.assertTrue(job.wait(5))
+
+        self.assertEqual(
+            events, ["Text Extracted", "Fields Extracted", "Processed", "Written", "Processed Successfully"]
+        )
+        snapshot = job.progress_snapshot()
+        self.assertEqual(snapshot["stages"]["Written"], 1)
+        self.assertEqual(snapshot["files"], [
+            {"file_name": "a.pdf", "status": "Written"}, {"file_name": "out.csv", "status": "Processed Successfully"}
+        ])
+
+    def test_full_snapshot_leaves_the_pending_changes(self):
+        job = Job("job", 1, ["/uploads/a.pdf", "/uploads/b.pdf"], "out.csv")
+        job.record_progress("a.pdf", "Text Extracted")
+        job.record_progress("b.pdf", "Text Extracted")
+
+        self.assertEqual([entry["file_name"] for entry in job.full_snapshot()["files"]], ["a.pdf", "b.pdf"])
+        self.assertEqual([entry["file_name"] for entry in job.progress_snapshot()["files"]], ["a.pdf", "b.pdf"])
+        self.assertEqual(job.progress_snapshot()["files"], [])
+        # A late watcher still sees every file
+        self.assertEqual(len(job.full_snapshot()["files"]), 2)
+
+    @patch("app.jobs.process_pdf", return_value=None)
+    def test_finished_jobs_are_forgotten_after_retention(self, mock_process_pdf):
+        self.manager.retention_seconds = 60
+        job = self.manager.submit(["/uploads/a.pdf"], "out.csv", user_id=1)
+        self.assertTrue(job.wait(5))
+        self.assertIs(self.manager.get(job.id), job)
+
+        job.finished_at -= timedelta(seconds=61)
+        self.assertIsNone(self.manager.get(job.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
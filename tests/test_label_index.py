@@ -0,0 +1,46 @@
+import unittest
+from app.label_index import LabelIndex, normalize_label
+from app.rule_extraction import find_labels
+
+
+class TestLabelIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LabelIndex({
+            "Total": "TOTAL_PREMIUM",
+            "Total Premium": "TOTAL_PREMIUM",
+            "Total OD Premium – A": "OD_PREMIUM",
+            "Net Own Damage Premium(a)": "OD_PREMIUM",
+            "Code": None,
+        })
+
+    def test_normalized_lookup(self):
+        self.assertEqual(normalize_label("Net Own Damage Premium (A)"), normalize_label("Net Own Damage Premium(a)"))
+        self.assertEqual(self.index.get("NET OWN DAMAGE PREMIUM (A)"), "OD_PREMIUM")
+        self.assertEqual(self.index.get("total od premium - a"), "OD_PREMIUM")
+        self.assertIsNone(self.index.get("Premium"))
+
+    def test_scan_prefers_longest_label(self):
+        text = "Total Premium 4,090.00\nTOTAL OD PREMIUM - A 1,045.00\nTotal 100"
+        found = [(text[start:end], field) for start, end, field in self.index.scan(text)]
+
+        self.assertEqual(found, [
+            ("Total Premium", "TOTAL_PREMIUM"),
+            ("TOTAL OD PREMIUM - A", "OD_PREMIUM"),
+            ("Total", "TOTAL_PREMIUM"),
+        ])
+
+    def test_scan_respects_word_boundaries(self):
+        text = "Barcode 123 Totally Net Own Damage Premium (a) 5 Code: 9"
+        found = [(text[start:end], field) for start, end, field in self.index.scan(text)]
+
+        self.assertEqual(found, [("Net Own Damage Premium (a)", "OD_PREMIUM"), ("Code", None)])
+
+    def test_find_labels_keeps_policy_number_patterns(self):
+        text = "PolicyRef No. 2015200701 Agent Code IMD1115515"
+        found = [(text[start:end], field) for start, end, field in find_labels(text)]
+
+        self.assertEqual(found, [("PolicyRef No.", "POLICY_NO"), ("Agent Code", "IMD_CODE")])
+
+
+if __name__ == "__main__":
+    unittest.main()
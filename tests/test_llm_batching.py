@@ -0,0 +1,63 @@
+import json
+import re
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from app.field_extraction import parse_batch_response
+from app.llm_batching import LLMBatcher
+
+
+def reply(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def batched_reply(**kwargs):
+    """Answer a batched prompt with each document's own text as its POLICY_NO."""
+    prompt = kwargs["messages"][0]["content"]
+    documents = re.findall(r"=== Document (\w+) ===\n\s*(.+)", prompt)
+    if not documents:
+        return reply(json.dumps({"POLICY_NO": "single"}))
+    return reply(json.dumps([{"document_id": document_id, "POLICY_NO": text.strip()} for document_id, text in documents]))
+
+
+class TestLLMBatching(unittest.TestCase):
+    def extract_all(self, batcher, texts):
+        with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+            return list(executor.map(batcher.extract, texts))
+
+    @patch("app.backends.openai.ChatCompletion.create")
+    def test_documents_share_one_request(self, mock_openai):
+        mock_openai.side_effect = batched_reply
+        batcher = LLMBatcher(max_documents=3, wait_seconds=5)
+
+        results = self.extract_all(batcher, ["P-1", "P-2", "P-3"])
+
+        self.assertEqual(mock_openai.call_count, 1)
+        self.assertEqual([result["POLICY_NO"] for result in results], ["P-1", "P-2", "P-3"])
+
+    @patch("app.backends.openai.ChatCompletion.create")
+    def test_malformed_reply_falls_back_to_single_calls(self, mock_openai):
+        mock_openai.side_effect = [reply("not json")] + [reply(json.dumps({"POLICY_NO": "single"}))] * 2
+        batcher = LLMBatcher(max_documents=2, wait_seconds=5)
+
+        results = self.extract_all(batcher, ["P-1", "P-2"])
+
+        self.assertEqual(mock_openai.call_count, 3)
+        self.assertEqual([result["POLICY_NO"] for result in results], ["single", "single"])
+
+    @patch("app.backends.openai.ChatCompletion.create")
+    def test_oversized_document_is_sent_alone(self, mock_openai):
+        mock_openai.side_effect = batched_reply
+        batcher = LLMBatcher(token_budget=10, wait_seconds=5)
+
+        self.assertEqual(batcher.extract("P-1 " * 100), {"POLICY_NO": "single"})
+
+    def test_parse_drops_unknown_ids(self):
+        content = json.dumps([{"document_id": "doc1", "POLICY_NO": "A"}, {"document_id": "doc9", "POLICY_NO": "B"}])
+        self.assertEqual(parse_batch_response(content, ["doc1", "doc2"]), {"doc1": {"POLICY_NO": "A"}})
+        with self.assertRaises(ValueError):
+            parse_batch_response('{"POLICY_NO": "A"}', ["doc1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import json
+import unittest
+from app.metrics import Counter, Histogram, Registry, document_span, stage_span, count, STAGE_SECONDS
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus_text_format(self):
+        registry = Registry()
+        pages = Counter("pages_total", "Pages.", registry=registry)
+        seconds = Histogram("stage_seconds", "Stage time.", ["stage"], buckets=(0.1, 1), registry=registry)
+        pages.inc(3)
+        seconds.observe(0.05, stage="llm")
+        seconds.observe(0.5, stage="llm")
+
+        text = registry.render()
+        self.assertIn("# TYPE pages_total counter\npages_total 3", text)
+        self.assertIn('stage_seconds_bucket{stage="llm",le="0.1"} 1', text)
+        self.assertIn('stage_seconds_bucket{stage="llm",le="+Inf"} 2', text)
+        self.assertIn('stage_seconds_count{stage="llm"} 2', text)
+
+    def test_document_span_logs_stage_timings(self):
+        before = STAGE_SECONDS.count(stage="text_extraction")
+        with self.assertLogs("app.metrics", level="INFO") as logs:
+            with document_span("policy.pdf") as timing:
+                with stage_span("text_extraction"):
+                    count("pages", 2)
+                timing.outcome = "cache_hit"
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["document"], "policy.pdf")
+        self.assertEqual(record["outcome"], "cache_hit")
+        self.assertIn("text_extraction", record["stages"])
+        self.assertEqual(record["counts"], {"pages": 2})
+        self.assertEqual(STAGE_SECONDS.count(stage="text_extraction"), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
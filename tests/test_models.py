@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime
+from flask import Flask
+from app.models import db, User, Upload, PolicyRecord, UserPremiumRollup, DailyPremiumRollup, rebuild_premium_rollups, save_policy_records
+
+
+class TestPremiumRollups(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.user = User(username='agent', password='x', role='user')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def add_upload(self, total_premium, upload_date=None):
+        upload = Upload(user_id=self.user.id, filename='p.pdf', total_premium=total_premium, upload_date=upload_date)
+        upload.save_to_db()
+        return upload
+
+    def rollups(self):
+        user = db.session.get(UserPremiumRollup, self.user.id)
+        days = {row.day: (row.uploads, row.total_premium) for row in DailyPremiumRollup.query.all()}
+        return (user.uploads, user.total_premium, user.total_commission), days
+
+    def test_rollups_follow_upload_changes(self):
+        first = self.add_upload(1000.0, datetime(2025, 1, 3, 10))
+        self.add_upload(500.0, datetime(2025, 1, 4, 9))
+        self.add_upload(None, datetime(2025, 1, 4, 11))
+
+        user, days = self.rollups()
+        self.assertEqual(user, (3, 1500.0, 600.0))
+        self.assertEqual(days[datetime(2025, 1, 4).date()], (2, 500.0))
+
+        first.total_premium = 2000.0
+        first.calculate_commission()
+        db.session.commit()
+        self.assertEqual(self.rollups()[0], (3, 2500.0, 1000.0))
+
+        db.session.delete(first)
+        db.session.commit()
+        user, days = self.rollups()
+        self.assertEqual(user, (2, 500.0, 200.0))
+        self.assertEqual(days[datetime(2025, 1, 3).date()], (0, 0.0))
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.add_upload(1000.0, datetime(2025, 1, 3, 10))
+        self.add_upload(250.0)
+        incremental = self.rollups()
+
+        db.session.query(UserPremiumRollup).delete()
+        db.session.commit()
+        self.assertEqual(rebuild_premium_rollups(), (1, 2))
+
+        user, days = self.rollups()
+        self.assertEqual(user, incremental[0])
+        self.assertEqual(days, {day: values for day, values in incremental[1].items() if values[0]})
+
+    def test_policy_records_saved_in_bulk(self):
+        records = [
+            {"S_No": 1, "POLICY_NO": "P1", "TOTAL_PREMIUM": "4,090.00", "CUSTOMER_NAME": "AMIT", "NCB": "N/A", "source_file": "a.pdf"},
+            {"S_No": 2, "POLICY_NO": "P2", "TOTAL_PREMIUM": 1000.0, "source_file": "b.pdf"},
+        ]
+        self.assertEqual(save_policy_records(records, self.user.id), 2)
+
+        policies = PolicyRecord.query.order_by(PolicyRecord.s_no).all()
+        self.assertEqual([policy.policy_no for policy in policies], ["P1", "P2"])
+        self.assertEqual(policies[0].total_premium, 4090.0)
+        self.assertIsNone(policies[0].ncb)
+        self.assertEqual(policies[0].upload.filename, "a.pdf")
+        self.assertAlmostEqual(policies[0].upload.commission, 1636.0)
+        self.assertAlmostEqual(policies[0].upload.net_premium, 2454.0)
+        self.assertEqual(self.rollups()[0], (2, 5090.0, 2036.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pypdfium2 as pdfium
+
+from app.cache import ExtractionCache
+from app.ocr import OCRPool, image_only_pages, ocr_scanned_pages
+
+SAMPLE_PDF = "test_pdfs/sample_policy.pdf"
+
+
+class TestOCR(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # A one-page "scan": the first sample page as a bare image
+        document = pdfium.PdfDocument(SAMPLE_PDF)
+        image = document[0].render(scale=0.5, grayscale=True).to_pil()
+        document.close()
+        self.scanned_pdf = os.path.join(self.tmp.name, "scan.pdf")
+        image.save(self.scanned_pdf)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_pages_without_text_but_with_images_are_detected(self):
+        self.assertEqual(list(image_only_pages(self.scanned_pdf, [(1, "", 0.1)])), [1])
+        # The sample's first page carries images too, but it has a text layer
+        self.assertEqual(image_only_pages(SAMPLE_PDF, [(1, "Policy Schedule", 0.1), (2, "Terms", 0.1)]), {})
+
+    def test_scanned_pages_are_recognized_once_per_page_hash(self):
+        cache = ExtractionCache(os.path.join(self.tmp.name, "cache.db"))
+        pool = MagicMock()
+        pool.ocr.return_value = {1: ("POLICY NO 123", 0.5)}
+
+        with patch("app.ocr.ocr_available", return_value=True), patch("builtins.print"):
+            first, complete = ocr_scanned_pages(self.scanned_pdf, [(1, " \n", 0.1)], cache, pool)
+            second, _ = ocr_scanned_pages(self.scanned_pdf, [(1, "", 0.1)], cache, pool)
+
+        self.assertEqual(first, [(1, "POLICY NO 123", 0.1)])
+        self.assertTrue(complete)
+        self.assertEqual(second, first)
+        pool.ocr.assert_called_once_with(self.scanned_pdf, [1])
+        self.assertEqual(cache.stats()["ocr_entries"], 1)
+
+    def test_pages_the_pool_misses_leave_the_text_incomplete(self):
+        pool = MagicMock()
+        pool.ocr.return_value = {}  # Timed out
+
+        with patch("app.ocr.ocr_available", return_value=True), patch("builtins.print"):
+            pages, complete = ocr_scanned_pages(self.scanned_pdf, [(1, "", 0.1)], None, pool)
+
+        self.assertEqual(pages, [(1, "", 0.1)])
+        self.assertFalse(complete)
+
+    def test_text_pages_never_reach_ocr(self):
+        pool = MagicMock()
+        pages = [(1, "Policy Schedule", 0.1)]
+        with patch("app.ocr.ocr_available", return_value=True):
+            self.assertEqual(ocr_scanned_pages(SAMPLE_PDF, pages, None, pool), (pages, True))
+        pool.ocr.assert_not_called()
+
+
+    @patch("app.ocr.ProcessPoolExecutor")
+    def test_timeout_waits_for_other_documents_before_recycling(self, mock_executor_class):
+        pool = OCRPool()
+        executor = pool._acquire_executor()
+        self.assertIs(pool._acquire_executor(), executor)
+
+        with patch("builtins.print"):
+            pool._release_executor(executor, timed_out=True)
+            # Another document still has pages on the workers
+            executor.shutdown.assert_not_called()
+            pool._release_executor(executor, timed_out=False)
+
+        executor.shutdown.assert_called_once()
+        self.assertIsNone(pool._executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from app.output_writers import OUTPUT_COLUMNS, count_kept_rows, open_output_writer, pq, truncate_output
+from app.preprocessing import save_data_to_excel
+
+
+class TestOutputWriters(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_xlsx_rows_follow_schema_and_append(self):
+        output_path = self.path("out.xlsx")
+        save_data_to_excel([{"S_No": 1, "POLICY_NO": "P1", "OD_PREMIUM_A": 5}], output_path)
+        save_data_to_excel([{"S_No": 2, "POLICY_NO": "P2"}], output_path)
+
+        df = pd.read_excel(output_path, keep_default_na=False)
+        self.assertEqual(list(df.columns), OUTPUT_COLUMNS)
+        self.assertEqual(list(df["POLICY_NO"]), ["P1", "P2"])
+        self.assertEqual(df.loc[0, "CUSTOMER_NAME"], "N/A")
+
+    def test_csv_appends_without_repeating_header(self):
+        output_path = self.path("out.csv")
+        for policy_no in ["P1", "P2"]:
+            with open_output_writer(output_path) as writer:
+                writer.write({"POLICY_NO": policy_no})
+
+        df = pd.read_csv(output_path)
+        self.assertEqual(list(df.columns), OUTPUT_COLUMNS)
+        self.assertEqual(list(df["POLICY_NO"]), ["P1", "P2"])
+
+    def test_appends_follow_an_older_header(self):
+        old_columns = OUTPUT_COLUMNS[:-1]
+        for name in ["old.csv", "old.xlsx"]:
+            output_path = self.path(name)
+            with open_output_writer(output_path, columns=old_columns) as writer:
+                writer.write({"POLICY_NO": "P1", "source_file": "a.pdf"})
+            with patch("builtins.print"), open_output_writer(output_path) as writer:
+                writer.write({"POLICY_NO": "P2", "source_file": "b.pdf", "DUPLICATE_OF": "a.pdf"})
+
+            df = pd.read_csv(output_path) if name.endswith(".csv") else pd.read_excel(output_path)
+            self.assertEqual(list(df.columns), old_columns)
+            self.assertEqual(list(df["source_file"]), ["a.pdf", "b.pdf"])
+
+    def test_truncate_keeps_header_and_leading_rows(self):
+        for name in ["out.csv", "out.xlsx"]:
+            output_path = self.path(name)
+            self.assertEqual(count_kept_rows(output_path), 0)
+            with open_output_writer(output_path) as writer:
+                writer.write_many({"POLICY_NO": policy_no} for policy_no in ["P1", "P2", "P3"])
+            self.assertEqual(count_kept_rows(output_path), 3)
+
+            truncate_output(output_path, 2)
+            df = pd.read_csv(output_path) if name.endswith(".csv") else pd.read_excel(output_path)
+            self.assertEqual(list(df.columns), OUTPUT_COLUMNS)
+            self.assertEqual(list(df["POLICY_NO"]), ["P1", "P2"])
+
+            truncate_output(output_path, 0)
+            self.assertFalse(os.path.exists(output_path))
+
+    @unittest.skipIf(pq is None, "pyarrow is not installed")
+    def test_existing_parquet_is_not_overwritten(self):
+        output_path = self.path("out.parquet")
+        save_data_to_excel([{"POLICY_NO": "P1"}], output_path)
+        with patch("builtins.print"):
+            save_data_to_excel([{"POLICY_NO": "P2"}], output_path)
+
+        self.assertEqual(list(pd.read_parquet(output_path)["POLICY_NO"]), ["P1"])
+
+    @unittest.skipIf(pq is None, "pyarrow is not installed")
+    def test_parquet_row_groups(self):
+        output_path = self.path("out.parquet")
+        with open_output_writer(output_path) as writer:
+            writer.row_group_size = 2
+            writer.write_many({"S_No": index, "POLICY_NO": f"P{index}"} for index in range(5))
+
+        self.assertEqual(pq.ParquetFile(output_path).metadata.num_row_groups, 3)
+        self.assertEqual(list(pd.read_parquet(output_path)["S_No"]), ["0", "1", "2", "3", "4"])
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            open_output_writer(self.path("out.xlsx"), output_format="json")
+
+
+if __name__ == "__main__":
+    unittest.main()
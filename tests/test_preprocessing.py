@@ -1,7 +1,13 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import os
-from app.preprocessing import process_pdf
+import random
+import tempfile
+import time
+import pandas as pd
+from app.journal import BatchJournal
+from app.text_extraction import TextExtractionResult
+from app.preprocessing import process_pdf, bulk_process_to_excel, resume_bulk_process
 
 class TestPreprocessing(unittest.TestCase):
     @patch("app.preprocessing.extract_text_with_pdfplumber")
@@ -28,4 +34,107 @@ class TestPreprocessing(unittest.TestCase):
         process_pdf(pdf_path, output_json_path, output_excel_path)
 
         self.assertTrue(os.path.exists(output_json_path))
-        mock_save_to_excel.assert_called_once()
\ No newline at end of file
+        mock_save_to_excel.assert_called_once()
+
+    @patch("app.preprocessing.USE_LAZY_PAGES", False)
+    @patch("app.preprocessing.extract_structured_data", return_value={"POLICY_NO": "P-100001"})
+    @patch("app.preprocessing.get_text_extraction_pool")
+    @patch("app.preprocessing.get_extraction_cache")
+    def test_timed_out_text_and_its_result_are_not_cached(self, mock_get_cache, mock_get_pool, mock_extract):
+        cache = mock_get_cache.return_value
+        cache.get_result.return_value = None
+        cache.get_text.return_value = None
+        mock_get_pool.return_value.extract.return_value = TextExtractionResult(
+            "a.pdf", pages=[(1, "Policy No P-100001", 0.1)], error="timeout", timed_out=True
+        )
+
+        with patch("app.preprocessing.USE_TEXT_PROCESS_POOL", True), \
+                patch("app.preprocessing.get_duplicate_registry", return_value=None), patch("builtins.print"):
+            data = process_pdf("a.pdf", content_hash="abc")
+
+        mock_extract.assert_called_once()
+        self.assertEqual(mock_extract.call_args[0][0], "Policy No P-100001")
+        self.assertEqual(data["POLICY_NO"], "P-100001")
+        cache.put_text.assert_not_called()
+        cache.put_result.assert_not_called()
+
+    @patch("app.preprocessing.process_pdf")
+    def test_bulk_process_keeps_order_when_concurrent(self, mock_process_pdf):
+        def slow_process(pdf_path, user_id):
+            time.sleep(random.uniform(0, 0.05))
+            return {"POLICY_NO": os.path.basename(pdf_path)}
+
+        mock_process_pdf.side_effect = slow_process
+        with tempfile.TemporaryDirectory() as input_folder:
+            for name in ["c.pdf", "a.pdf", "notes.txt", "b.pdf"]:
+                open(os.path.join(input_folder, name), "w").close()
+
+            output_path = os.path.join(input_folder, "out.csv")
+            bulk_process_to_excel(input_folder, output_path, user_id=1, max_in_flight=3)
+            saved = pd.read_csv(output_path)
+
+        self.assertEqual(list(saved["source_file"]), ["a.pdf", "b.pdf", "c.pdf"])
+        self.assertEqual(list(saved["S_No"]), [1, 2, 3])
+
+    @patch("app.preprocessing.process_pdf")
+    def test_resume_skips_journaled_files_and_rebuilds_output(self, mock_process_pdf):
+        mock_process_pdf.side_effect = lambda pdf_path, user_id: {"POLICY_NO": os.path.basename(pdf_path)}
+        saved_batches = []
+        with tempfile.TemporaryDirectory() as input_folder:
+            output_path = os.path.join(input_folder, "out.csv")
+            journal_path = os.path.join(input_folder, "out.journal.jsonl")
+            # An interrupted run: a.pdf saved, b.pdf extracted, c.pdf never finished, one partial row on disk
+            with BatchJournal.start(journal_path, input_folder, output_path, 7, ["a.pdf", "b.pdf", "c.pdf"]) as journal:
+                journal.record_file(1, "a.pdf", {"POLICY_NO": "a", "S_No": 1, "source_file": "a.pdf"})
+                journal.record_saved([{"S_No": 1}])
+                journal.record_file(2, "b.pdf", {"POLICY_NO": "b", "S_No": 2, "source_file": "b.pdf"})
+            with open(journal_path, "a") as f:
+                f.write('{"type": "file", "index": 3, "file_na')
+            with open(output_path, "w") as f:
+                f.write("S_No,POLICY_NO\n1,a\n")
+
+            resume_bulk_process(journal_path, save_records=lambda records, user_id: saved_batches.append(
+                (user_id, [record["S_No"] for record in records])))
+            saved = pd.read_csv(output_path)
+            resumed = BatchJournal.open(journal_path)
+            resumed.close()
+
+        mock_process_pdf.assert_called_once_with(os.path.join(input_folder, "c.pdf"), 7)
+        self.assertEqual(list(saved["POLICY_NO"]), ["a", "b", "c.pdf"])
+        self.assertEqual(list(saved["S_No"]), [1, 2, 3])
+        self.assertEqual(saved_batches, [(7, [2, 3])])
+        self.assertTrue(resumed.finished)
+
+    @patch("builtins.print")
+    @patch("app.preprocessing.process_pdf")
+    def test_resume_keeps_rows_from_earlier_batches(self, mock_process_pdf, mock_print):
+        interrupted = []
+
+        def process(pdf_path, user_id):
+            # The second batch is interrupted at e.pdf the first time round
+            if pdf_path.endswith("e.pdf") and not interrupted:
+                interrupted.append(pdf_path)
+                raise RuntimeError("worker lost")
+            return {"POLICY_NO": os.path.basename(pdf_path)}
+
+        mock_process_pdf.side_effect = process
+        with tempfile.TemporaryDirectory() as root:
+            output_path = os.path.join(root, "out.csv")
+            for folder, names in [("first", ["a.pdf", "b.pdf"]), ("second", ["c.pdf", "d.pdf", "e.pdf"])]:
+                os.mkdir(os.path.join(root, folder))
+                for name in names:
+                    open(os.path.join(root, folder, name), "w").close()
+                bulk_process_to_excel(os.path.join(root, folder), output_path, user_id=1, max_in_flight=1)
+
+            journal_path = output_path + ".journal.jsonl"
+            resume_bulk_process(journal_path)
+            saved = pd.read_csv(output_path)
+            # The batch is finished now, so a second resume must leave the output alone
+            mock_process_pdf.reset_mock()
+            resume_bulk_process(journal_path)
+            saved_again = pd.read_csv(output_path)
+
+        self.assertEqual(list(saved["source_file"]), ["a.pdf", "b.pdf", "c.pdf", "d.pdf", "e.pdf"])
+        self.assertEqual(list(saved["S_No"]), [1, 2, 1, 2, 3])
+        mock_process_pdf.assert_not_called()
+        self.assertEqual(list(saved_again["source_file"]), list(saved["source_file"]))
@@ -0,0 +1,42 @@
+import threading
+import time
+import unittest
+from app.progress import ProgressThrottle
+
+
+class TestProgressThrottle(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.state = {"job": 0}
+        self.delivered = threading.Event()
+
+        def send(key):
+            self.sent.append((key, self.state[key]))
+            self.delivered.set()
+
+        self.throttle = ProgressThrottle(send, max_rate=20)
+
+    def test_bursts_are_coalesced_into_the_latest_state(self):
+        for value in range(1, 51):
+            self.state["job"] = value
+            self.throttle.update("job")
+
+        # The first update goes out at once; the other 49 become one trailing event
+        self.assertEqual(self.sent, [("job", 1)])
+        self.delivered.clear()
+        self.assertTrue(self.delivered.wait(1))
+        self.assertEqual(self.sent, [("job", 1), ("job", 50)])
+
+    def test_final_update_is_sent_immediately_and_cancels_the_pending_one(self):
+        self.throttle.update("job")
+        self.state["job"] = 5
+        self.throttle.update("job")
+        self.state["job"] = 6
+        self.throttle.update("job", final=True)
+
+        time.sleep(0.1)
+        self.assertEqual(self.sent, [("job", 0), ("job", 6)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from app.prompt_budget import prune_text
+from app.utils import count_tokens
+
+FOOTER = "Registered Office: 10th Floor, Tower A, Mumbai 400013"
+
+SCHEDULE = "\n".join([
+    "LIBERTY GENERAL INSURANCE LIMITED",
+    "PolicyRef No. 201520070124700944100000",
+    "Insured AMIT KUMAR SHUKLA",
+    FOOTER,
+    "Net Premium ` 3,466.00",
+    "In the event of any dispute the matter shall be referred to arbitration as per the applicable law.",
+    FOOTER,
+    "TOTAL POLICY PREMIUM ` 4,090.00",
+] + [f"Note {index}: 123 assorted schedule text that is not near any label" for index in range(200)])
+
+
+class TestPromptBudget(unittest.TestCase):
+    def test_drops_repeated_lines_and_boilerplate(self):
+        pruned = prune_text(SCHEDULE, token_budget=100000)
+        self.assertEqual(pruned.count(FOOTER), 1)
+        self.assertNotIn("arbitration", pruned)
+        self.assertIn("Insured AMIT KUMAR SHUKLA", pruned)
+
+    def test_keeps_labelled_lines_within_budget(self):
+        pruned = prune_text(SCHEDULE, token_budget=60)
+        self.assertLessEqual(count_tokens(pruned), 60)
+        for line in ("PolicyRef No. 201520070124700944100000", "Net Premium ` 3,466.00", "TOTAL POLICY PREMIUM ` 4,090.00"):
+            self.assertIn(line, pruned)
+        # Kept lines stay in document order
+        self.assertLess(pruned.index("PolicyRef"), pruned.index("TOTAL POLICY PREMIUM"))
+
+
+if __name__ == "__main__":
+    unittest.main()
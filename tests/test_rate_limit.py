@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import openai
+
+from app.field_extraction import extract_with_ai
+from app.rate_limit import TokenBucket, call_with_retries, is_retryable_error
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the chat completions endpoint; fails the first `failures` requests."""
+
+    failures = 0
+    requests_seen = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        cls = type(self)
+        cls.requests_seen += 1
+        if cls.requests_seen <= cls.failures:
+            body = {"error": {"message": "Rate limit reached", "type": "requests"}}
+            self._reply(429, body)
+            return
+        content = json.dumps({"POLICY_NO": "201520070124700944100000", "TOTAL_PREMIUM": "4090.00"})
+        self._reply(200, {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        })
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_token_bucket_throttles_past_capacity(self):
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)  # 10 per second
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_only_429_and_5xx_are_retried(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            error = Exception("server error")
+            error.http_status = 503 if len(calls) < 3 else 400
+            raise error
+
+        with self.assertRaises(Exception):
+            call_with_retries(flaky, max_retries=5, base_delay=0)
+        self.assertEqual(len(calls), 3)
+        self.assertFalse(is_retryable_error(ValueError("bad json")))
+
+    def test_extract_with_ai_retries_against_fake_endpoint(self):
+        FakeOpenAIHandler.failures = 2
+        FakeOpenAIHandler.requests_seen = 0
+        server = HTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with patch.object(openai, "api_base", f"http://127.0.0.1:{server.server_port}/v1"), \
+                    patch.object(openai, "api_key", "test-key"), \
+                    patch("app.field_extraction.LLM_BACKOFF_BASE", 0.01):
+                data = extract_with_ai("PolicyRef No. 201520070124700944100000")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(data["POLICY_NO"], "201520070124700944100000")
+        self.assertEqual(FakeOpenAIHandler.requests_seen, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import copy
+import unittest
+from datetime import date
+from unittest.mock import patch
+from app.preprocessing import (
+    standardize_vehicle_registration,
+    validate_and_calculate_package_liability,
+    validate_and_calculate_premiums,
+)
+from app.records import ExtractedRecord, PackageLiability, Registration, records_from_frame, records_to_frame
+
+EXTRACTED = {
+    "S_No": "3",
+    "CUSTOMER_NAME": "AMIT KUMAR SHUKLA",
+    "POLICY_NO": "201520070124700944100000",
+    "OD_PREMIUM": "N/A",
+    "TP_ONLY_PREMIUM": "₹3,466.00",
+    "NET_PREMIUM": "3,466.00",
+    "TOTAL_PREMIUM": "4,090.00",
+    "RISK_START_DATE": "04/12/2024",
+    "OD_EXPIRE_DATE": "03-12-2025",
+    "REN_ROLL_NEW_USED": "Rollover",
+    "LOCATION": "Not Found",
+    "unexpected": "dropped",
+}
+
+
+class TestExtractedRecord(unittest.TestCase):
+    def test_parses_extracted_strings(self):
+        record = ExtractedRecord.from_dict(EXTRACTED)
+
+        self.assertEqual(record.S_No, 3)
+        self.assertEqual(record.TP_ONLY_PREMIUM, 3466.0)
+        self.assertIsNone(record.OD_PREMIUM)
+        self.assertIsNone(record.LOCATION)
+        self.assertEqual(record.RISK_START_DATE, date(2024, 12, 4))
+        self.assertEqual(record.OD_EXPIRE_DATE, date(2025, 12, 3))
+        self.assertEqual(record.REN_ROLL_NEW_USED, "Rollover")
+        self.assertNotIsInstance(record.REN_ROLL_NEW_USED, Registration)
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_validated_matches_record_path(self):
+        expected = copy.deepcopy(EXTRACTED)
+        for key in ("NET_PREMIUM", "TOTAL_PREMIUM"):
+            expected[key] = float(expected[key].replace(",", ""))
+        with patch("builtins.print"):
+            validate_and_calculate_package_liability(validate_and_calculate_premiums(expected))
+
+        record = ExtractedRecord.from_dict(EXTRACTED).validated()
+
+        self.assertEqual(record.NET_PREMIUM, expected["NET_PREMIUM"])
+        self.assertEqual(record.TOTAL_PREMIUM, expected["TOTAL_PREMIUM"])
+        self.assertEqual(record.PACKAGE_LIABILITY, PackageLiability.LIABILITY_ONLY)
+        self.assertEqual(record.PACKAGE_LIABILITY.value, expected["PACKAGE_LIABILITY"])
+
+    def test_to_dict_and_frame_round_trip(self):
+        record = ExtractedRecord.from_dict(EXTRACTED).validated()
+        row = record.to_dict()
+
+        self.assertEqual(row["RISK_START_DATE"], "2024-12-04")
+        self.assertEqual(row["PACKAGE_LIABILITY"], "Liability Only Policy")
+        self.assertEqual(row["OD_PREMIUM"], "N/A")
+        self.assertEqual(ExtractedRecord.from_dict(row), record)
+
+        frame = records_to_frame([record, ExtractedRecord(S_No=4)])
+        self.assertEqual(str(frame["TOTAL_PREMIUM"].dtype), "float64")
+        self.assertEqual(records_from_frame(frame), [record, ExtractedRecord(S_No=4)])
+
+    def test_registration_matches_record_path(self):
+        for value in ["Renewal", "Rollover", "Unknown", "Brand New", "used vehicle", "OLD"]:
+            expected = {"REN_ROLL_NEW_USED": value}
+            with patch("builtins.print"):
+                standardize_vehicle_registration(expected)
+
+            record = ExtractedRecord.from_dict({"REN_ROLL_NEW_USED": value}).validated()
+
+            self.assertEqual(record.to_dict()["REN_ROLL_NEW_USED"], expected["REN_ROLL_NEW_USED"], value)
+
+    def test_unparseable_values_keep_their_text(self):
+        extracted = {**EXTRACTED, "OD_PREMIUM": "1,234/-", "RISK_START_DATE": "4th Dec 2024"}
+        expected = copy.deepcopy(extracted)
+        with patch("builtins.print"):
+            validate_and_calculate_package_liability(validate_and_calculate_premiums(expected))
+
+        record = ExtractedRecord.from_dict(extracted).validated()
+        row = record.to_dict()
+
+        self.assertEqual(row["OD_PREMIUM"], "1,234/-")
+        self.assertEqual(row["RISK_START_DATE"], "4th Dec 2024")
+        self.assertEqual(row["NET_PREMIUM"], float(expected["NET_PREMIUM"].replace(",", "")))
+        self.assertEqual(row["PACKAGE_LIABILITY"], expected["PACKAGE_LIABILITY"])
+        self.assertEqual(records_from_frame(records_to_frame([record])), [record])
+
+
+if __name__ == "__main__":
+    unittest.main()
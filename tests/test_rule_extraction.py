@@ -0,0 +1,108 @@
+import glob
+import os
+import unittest
+from unittest.mock import patch
+from app.rule_extraction import extract_with_rules, missing_fields, needs_llm
+from app.preprocessing import extract_structured_data, extract_text_with_pdfplumber
+
+LIBERTY_SCHEDULE = """LIBERTY GENERAL INSURANCE LIMITED
+PolicyRef No. 201520070124700944100000 Period of Insurance From: 00:00 Hrs of 04/12/2024
+Geographical Area India To: Midnight of 03/12/2025
+Insured AMIT KUMAR SHUKLA Policy Issued on 02/12/2024
+Contact Number 9889272917 Covernote Date 02/12/2024
+Agent Name Heute and Morgen Insurance Broker Pvt Ltd
+Agent Code IMD1115515 Agent Contact No 9935858888
+TOTAL LIABILITY PREMIUM ` 3,466.00
+Net Premium ` 3,466.00
+TOTAL POLICY PREMIUM ` 4,090.00
+"""
+
+
+class TestRuleExtraction(unittest.TestCase):
+    def test_reads_labelled_values(self):
+        data = extract_with_rules(LIBERTY_SCHEDULE)
+
+        self.assertEqual(data["POLICY_NO"], "201520070124700944100000")
+        self.assertEqual(data["CUSTOMER_NAME"], "AMIT KUMAR SHUKLA")
+        self.assertEqual(data["IMD_CODE"], "IMD1115515")
+        self.assertEqual(data["MOB_NO"], "9889272917")
+        self.assertEqual(data["RISK_START_DATE"], "04/12/2024")
+        self.assertEqual(data["OD_EXPIRE_DATE"], "03/12/2025")
+        self.assertEqual(data["POLICY_ISSUE_DAY"], "02/12/2024")
+        self.assertEqual(data["TP_ONLY_PREMIUM"], "3,466.00")
+        self.assertEqual(data["NET_PREMIUM"], "3,466.00")
+        # "Total Policy Premium" is matched in full rather than as "Policy Premium" or "Total"
+        self.assertEqual(data["TOTAL_PREMIUM"], "4,090.00")
+        # Liability-only schedule: no OD figure, and net equals the liability premium
+        self.assertEqual(data["OD_PREMIUM"], "0")
+        self.assertFalse(needs_llm(data))
+
+    def test_unlabelled_text_needs_llm(self):
+        data = extract_with_rules("Thank you for choosing us. Premium Details (`) to follow.")
+        self.assertEqual(data, {})
+        self.assertTrue(needs_llm(data))
+        self.assertNotIn("S_No", missing_fields(data))
+
+    @patch("app.preprocessing.extract_with_ai")
+    def test_llm_skipped_when_rules_fill_required_fields(self, mock_extract_with_ai):
+        data = extract_structured_data(LIBERTY_SCHEDULE)
+        mock_extract_with_ai.assert_not_called()
+        self.assertEqual(data["POLICY_NO"], "201520070124700944100000")
+        self.assertEqual(data["VEHICLE_MAKE"], "N/A")
+
+    @patch("app.preprocessing.extract_with_ai")
+    def test_llm_asked_only_for_missing_fields(self, mock_extract_with_ai):
+        mock_extract_with_ai.return_value = {"OD_PREMIUM": "1,200.00", "POLICY_NO": "LLM-VALUE"}
+        text = LIBERTY_SCHEDULE.replace("TOTAL LIABILITY PREMIUM", "Liability")
+
+        data = extract_structured_data(text)
+
+        requested = mock_extract_with_ai.call_args.kwargs["fields"]
+        self.assertIn("TP_ONLY_PREMIUM", requested)
+        self.assertNotIn("POLICY_NO", requested)
+        self.assertEqual(data["POLICY_NO"], "201520070124700944100000")
+        self.assertEqual(data["OD_PREMIUM"], "1,200.00")
+
+
+    def test_garbled_amounts_are_rejected(self):
+        data = extract_with_rules(
+            "Own Damage Premium (`) 4T88.83 Basic Third-Party Liability (`) 4487.00\n"
+            "Net Premium (`) 108 1 462.7-8 1,187 50 3416\nFinal Premium (`) 0 12799.20\n"
+        )
+        for field in ("OD_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM"):
+            self.assertNotIn(field, data)
+
+    def test_premiums_that_disagree_are_left_to_the_llm(self):
+        data = extract_with_rules(LIBERTY_SCHEDULE.replace("Net Premium ` 3,466.00", "Net Premium ` 3,100.00"))
+        for field in ("OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM"):
+            self.assertNotIn(field, data)
+        self.assertTrue(needs_llm(data))
+
+        # A total below the net premium is dropped on its own
+        data = extract_with_rules(LIBERTY_SCHEDULE.replace("4,090.00", "0"))
+        self.assertEqual(data["NET_PREMIUM"], "3,466.00")
+        self.assertNotIn("TOTAL_PREMIUM", data)
+
+
+class TestRuleExtractionOnSchedules(unittest.TestCase):
+    """Premiums the rules read from the sample schedules; wrong figures here would skip the LLM."""
+
+    def premiums(self, name):
+        path = next(path for path in glob.glob(os.path.join("test_pdfs", "*.pdf")) if os.path.basename(path).startswith(name))
+        with patch("builtins.print"):
+            data = extract_with_rules(extract_text_with_pdfplumber(path))
+        return {field: data.get(field) for field in ("OD_PREMIUM", "TP_ONLY_PREMIUM", "NET_PREMIUM", "TOTAL_PREMIUM")}
+
+    def test_rounded_off_total_is_read_instead_of_a_sample_claim(self):
+        self.assertEqual(self.premiums("ASHARAM"), {
+            "OD_PREMIUM": "1,115.00", "TP_ONLY_PREMIUM": "6,063.00", "NET_PREMIUM": "7,178.00", "TOTAL_PREMIUM": "8,470.00",
+        })
+
+    def test_garbled_schedules_leave_premiums_to_the_llm(self):
+        for name in ("DG_20301", "DG_4WAG"):
+            with self.subTest(name=name):
+                self.assertEqual(set(self.premiums(name).values()), {None})
+
+
+if __name__ == "__main__":
+    unittest.main()
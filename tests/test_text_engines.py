@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import patch
+from app.text_engines import ENGINES, TextEngine, get_text_engine, iter_page_texts, looks_garbled
+
+SAMPLE_PDF = "test_pdfs/sample_policy.pdf"
+
+
+class GarbledEngine(TextEngine):
+    name = "garbled"
+
+    def iter_pages(self, pdf_path, start=0, end=None):
+        for page_number in range(start + 1, (end or 3) + 1):
+            yield page_number, "(cid:3)(cid:4)(cid:5)(cid:6)" if page_number == 2 else f"page {page_number}"
+
+
+class TestTextEngines(unittest.TestCase):
+    def test_looks_garbled(self):
+        self.assertTrue(looks_garbled("  \n "))
+        self.assertTrue(looks_garbled("(cid:12)(cid:7)(cid:9) Policy"))
+        self.assertTrue(looks_garbled("����ab"))
+        self.assertFalse(looks_garbled("Policy No: 2015/200/01, Premium ₹ 1,234.00"))
+
+    def test_engines_read_the_same_document(self):
+        for name in ENGINES:
+            pages = list(get_text_engine(name).iter_pages(SAMPLE_PDF, 0, 2))
+            self.assertEqual([page for page, _ in pages], [1, 2], name)
+            self.assertIn("201520070124700944100000", pages[0][1], name)
+
+    def test_garbled_pages_fall_back(self):
+        with patch.dict(ENGINES, {"garbled": GarbledEngine}), patch("builtins.print"):
+            pages = list(iter_page_texts(SAMPLE_PDF, engine="garbled", fallback="pdfium"))
+            unfixed = list(iter_page_texts(SAMPLE_PDF, engine="garbled", fallback=""))
+
+        self.assertEqual(pages[0][1], "page 1")
+        self.assertFalse(looks_garbled(pages[1][1]))
+        self.assertEqual(pages[2][1], "page 3")
+        self.assertTrue(looks_garbled(unfixed[1][1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from app.preprocessing import extract_text_with_pdfplumber
+from app.rule_extraction import required_fields_located
+from app.text_extraction import TextExtractionPool, extract_leading_pages
+
+SAMPLE_PDF = "test_pdfs/sample_policy.pdf"
+
+
+class TestTextExtractionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = TextExtractionPool(max_workers=2, pages_per_chunk=1, timeout=60)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_page_ranges_match_serial_extraction(self):
+        result = self.pool.extract(SAMPLE_PDF)
+
+        self.assertIsNone(result.error)
+        self.assertEqual(result.text, extract_text_with_pdfplumber(SAMPLE_PDF))
+        self.assertEqual([page for page, _ in result.page_timings], [1, 2, 3])
+
+    def test_timeout_recycles_workers(self):
+        self.pool.timeout = 0.001
+        result = self.pool.extract(SAMPLE_PDF)
+        self.assertTrue(result.timed_out)
+
+        # The next document gets a fresh pool and completes normally
+        self.pool.timeout = 60
+        results = self.pool.extract_many([SAMPLE_PDF, "test_pdfs/SAROJ INS.pdf"])
+        self.assertEqual([r.error for r in results], [None, None])
+        self.assertIn("201520070124700944100000", results[0].text)
+
+    def test_unreadable_file_reports_error(self):
+        result = self.pool.extract("test_pdfs/DEC-24 MIS.xlsx")
+        self.assertIsNotNone(result.error)
+        self.assertEqual(result.text, "")
+
+    def test_leading_pages_run_on_a_worker(self):
+        result = self.pool.extract_leading(SAMPLE_PDF, required_fields_located, max_pages=3)
+
+        self.assertIsNone(result.error)
+        self.assertEqual([page for page, _ in result.page_timings], [1])
+        self.assertEqual(result.pages_skipped, 2)
+
+
+class TestLeadingPages(unittest.TestCase):
+    def test_stops_at_page_cap(self):
+        result = extract_leading_pages(SAMPLE_PDF, max_pages=2)
+
+        self.assertEqual(result.pages_skipped, 1)
+        self.assertTrue(extract_text_with_pdfplumber(SAMPLE_PDF).startswith(result.text))
+        self.assertIn("1 skipped", result.summary())
+
+    def test_stops_once_required_fields_are_located(self):
+        result = extract_leading_pages(SAMPLE_PDF, required_fields_located)
+
+        self.assertEqual(len(result.pages), 1)
+        self.assertTrue(required_fields_located(result.text))
+
+    def test_reads_every_page_when_fields_are_never_located(self):
+        result = extract_leading_pages(SAMPLE_PDF, lambda text: False)
+
+        self.assertEqual(result.pages_skipped, 0)
+        self.assertEqual(result.text, extract_text_with_pdfplumber(SAMPLE_PDF))
+
+
+if __name__ == "__main__":
+    unittest.main()
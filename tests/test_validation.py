@@ -0,0 +1,80 @@
+import copy
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from app.preprocessing import (
+    save_data_to_excel,
+    standardize_vehicle_registration,
+    validate_and_calculate_package_liability,
+    validate_and_calculate_premiums,
+)
+from app.validation import parse_amounts, revalidate_output, validate_frame
+
+RECORDS = [
+    # Consistent extraction: nothing to correct but the derived fields
+    {"S_No": 1, "OD_PREMIUM": "1,045.00", "TP_ONLY_PREMIUM": "₹ 3,466.00", "NET_PREMIUM": "4,511.00",
+     "TOTAL_PREMIUM": "5,323.00", "PACKAGE_LIABILITY": "Package Policy", "REN_ROLL_NEW_USED": "New"},
+    # Missing NET_PREMIUM is recalculated and TOTAL_PREMIUM follows it
+    {"S_No": 2, "OD_PREMIUM": "N/A", "TP_ONLY_PREMIUM": "3,466.00", "NET_PREMIUM": "N/A",
+     "TOTAL_PREMIUM": "4,090.00", "PACKAGE_LIABILITY": "N/A", "REN_ROLL_NEW_USED": "Rollover"},
+    {"S_No": 3, "OD_PREMIUM": 500, "TP_ONLY_PREMIUM": 0, "NET_PREMIUM": 500.0,
+     "TOTAL_PREMIUM": "", "PACKAGE_LIABILITY": "N/A", "REN_ROLL_NEW_USED": "used"},
+]
+
+
+class TestValidation(unittest.TestCase):
+    def test_parse_amounts(self):
+        amounts = parse_amounts(pd.Series(["₹ 1,045.50", "N/A", "", 12, None]))
+
+        self.assertEqual(list(amounts), [1045.5, 0.0, 0.0, 12.0, 0.0])
+
+    def test_matches_record_path(self):
+        expected = copy.deepcopy(RECORDS)
+        with patch("builtins.print"):
+            for record in expected:
+                validate_and_calculate_premiums(record)
+                validate_and_calculate_package_liability(record)
+                standardize_vehicle_registration(record)
+            frame, report = validate_frame(pd.DataFrame(RECORDS))
+
+        self.assertEqual(frame.to_dict("records"), expected)
+        self.assertEqual(list(report["corrected"]), [
+            "",
+            "NET_PREMIUM,TOTAL_PREMIUM,PACKAGE_LIABILITY",
+            "TOTAL_PREMIUM,PACKAGE_LIABILITY,REN_ROLL_NEW_USED",
+        ])
+        self.assertEqual(list(report["S_No"]), [1, 2, 3])
+
+    def test_registration_matches_whole_words(self):
+        values = ["Renewal", "Rollover", "N/A", "Unknown", "Brand New", "USED", "Old", "New"]
+        expected = ["Renewal", "Rollover", "N/A", "Unknown", "New", "Old", "Old", "New"]
+        records = [{"REN_ROLL_NEW_USED": value} for value in values]
+        with patch("builtins.print"):
+            for record in records:
+                standardize_vehicle_registration(record)
+            frame, report = validate_frame(pd.DataFrame({"REN_ROLL_NEW_USED": values}))
+
+        self.assertEqual([record["REN_ROLL_NEW_USED"] for record in records], expected)
+        self.assertEqual(list(frame["REN_ROLL_NEW_USED"]), expected)
+        self.assertEqual(list(report["REN_ROLL_NEW_USED"]), [False, False, False, False, True, True, False, False])
+
+    def test_revalidate_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "month.csv")
+            with patch("builtins.print"):
+                save_data_to_excel(RECORDS, path)
+                report = revalidate_output(path)
+
+            validated = pd.read_csv(os.path.join(tmp, "month.validated.csv"), keep_default_na=False)
+            saved_report = pd.read_csv(os.path.join(tmp, "month.validation.csv"), keep_default_na=False)
+
+        self.assertEqual(list(validated["NET_PREMIUM"]), ["4,511.00", "3466.0", "500.0"])
+        self.assertEqual(list(validated["PACKAGE_LIABILITY"]), ["Package Policy", "Liability Only Policy", "Package Policy"])
+        self.assertEqual(list(validated["REN_ROLL_NEW_USED"]), ["New", "Rollover", "Old"])
+        self.assertEqual(list(saved_report["corrected"]), list(report["corrected"]))
+
+
+if __name__ == "__main__":
+    unittest.main()